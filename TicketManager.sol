@@ -22,6 +22,19 @@ contract TicketManager is ERC721, Ownable {
         return newItemId;
     }
 
+    function safeMintBatch(address[] memory to, string[] memory uris) public onlyOwner returns (uint256[] memory) {
+        require(to.length == uris.length, "TicketManager: to and uris length mismatch");
+        uint256[] memory newItemIds = new uint256[](to.length);
+        for (uint256 i = 0; i < to.length; i++) {
+            _ticketIds.increment();
+            uint256 newItemId = _ticketIds.current();
+            _safeMint(to[i], newItemId);
+            _setTokenURI(newItemId, uris[i]);
+            newItemIds[i] = newItemId;
+        }
+        return newItemIds;
+    }
+
     function _setTokenURI(uint256 tokenId, string memory _tokenURI) internal virtual {
         require(_exists(tokenId), "ERC721URIStorage: URI set for nonexistent token");
         _tokenURIs[tokenId] = _tokenURI;
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+
+
+class AppContext:
+    """
+    Recursos pesados de la aplicación (web3, ABI del contrato, cuenta firmante)
+    que se crean la primera vez que se usan y no al importar main.py.
+
+    Importar web3 cuesta más que todo el resto de la API junto; así los workers
+    y la recolección de pytest arrancan sin pagarlo, y la API arranca aunque no
+    haya PRIVATE_KEY: el error aparece solo al intentar firmar una transacción.
+    El lifespan de la app cierra los recursos con `aclose`.
+    """
+
+    def __init__(self, rpc_url: str, pool_size: int, timeout: float, abi_path: str = "TicketManager.abi"):
+        self.rpc_url = rpc_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.abi_path = abi_path
+        self._lock = threading.RLock()
+        self._async_w3 = None
+        self._async_sessions = {}
+
+    def _init_once(self, attr: str, factory):
+        value = self.__dict__.get(attr)
+        if value is None:
+            with self._lock:
+                value = self.__dict__.get(attr)
+                if value is None:
+                    value = factory()
+                    self.__dict__[attr] = value
+        return value
+
+    @property
+    def w3(self):
+        # Un único provider por proceso: la sesión HTTP mantiene conexiones keep-alive
+        # con el nodo RPC en lugar de abrir una nueva por cada request.
+        def build():
+            from web3_provider import create_w3
+            return create_w3(self.rpc_url, self.pool_size, self.timeout)
+        return self._init_once("_w3", build)
+
+    @property
+    def contract_registry(self):
+        # ABI y dirección del contrato se cargan una vez; los contratos se cachean por instancia de Web3
+        def build():
+            from contract_registry import ContractRegistry
+            return ContractRegistry(self.abi_path)
+        return self._init_once("_contract_registry", build)
+
+    @property
+    def private_key(self) -> str:
+        def build():
+            private_key = os.getenv("PRIVATE_KEY")
+            if not private_key:
+                raise ValueError("No PRIVATE_KEY set for the application")
+            return private_key
+        return self._init_once("_private_key", build)
+
+    @property
+    def account_address(self) -> str:
+        def build():
+            from web3_provider import account_address
+            return account_address(self.private_key)
+        return self._init_once("_account_address", build)
+
+    @property
+    def nonce_manager(self):
+        def build():
+            from nonce_manager import NonceManager
+            return NonceManager(self.account_address)
+        return self._init_once("_nonce_manager", build)
+
+    async def async_w3(self):
+        # Variante para handlers async; cada event loop necesita su propia sesión aiohttp
+        from web3_provider import create_async_session, create_async_w3
+        if self._async_w3 is None:
+            self._async_w3 = create_async_w3(self.rpc_url)
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(id(loop))
+        if session is None or session.closed:
+            session = create_async_session(self.pool_size, self.timeout)
+            self._async_sessions[id(loop)] = session
+            await self._async_w3.provider.cache_async_session(session)
+        return self._async_w3
+
+    async def aclose(self):
+        for session in self._async_sessions.values():
+            if not session.closed:
+                await session.close()
+        self._async_sessions.clear()
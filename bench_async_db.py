@@ -0,0 +1,131 @@
+"""
+Prueba de carga: el mismo listado de eventos servido por un handler síncrono
+(Session en el threadpool, como antes) y por uno async (AsyncSession).
+
+Uso: python bench_async_db.py [--workers 1] [--concurrency 64] [--duration 10]
+
+Usa DATABASE_URL (PostgreSQL) y levanta uvicorn con el mismo número de workers
+para cada camino, uno después del otro para que los pools no compitan por las
+conexiones. Con --latency-ms cada request suma un pg_sleep que simula la
+latencia de red hasta una base remota. Crea eventos de prueba con nombre
+`bench-*` y los borra al final.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from fast_json import RowsJSONResponse
+from main import Event, EVENT_OUT_COLUMNS, EVENT_OUT_FIELDS, SessionLocal, get_db, get_sync_db
+
+PAGE = select(*EVENT_OUT_COLUMNS).order_by(Event.date, Event.id).limit(100)
+LATENCY = select(func.pg_sleep(float(os.getenv("BENCH_LATENCY_MS", "0")) / 1000))
+
+bench_app = FastAPI()
+
+@bench_app.get("/sync/events")
+def sync_events(db: Session = Depends(get_sync_db)):
+    db.execute(LATENCY)
+    return RowsJSONResponse(db.execute(PAGE).all(), EVENT_OUT_FIELDS)
+
+@bench_app.get("/async/events")
+async def async_events(db: AsyncSession = Depends(get_db)):
+    await db.execute(LATENCY)
+    return RowsJSONResponse((await db.execute(PAGE)).all(), EVENT_OUT_FIELDS)
+
+
+def fill_events(total: int):
+    start = datetime(2026, 1, 1)
+    with SessionLocal() as db:
+        db.execute(insert(Event), [
+            {
+                "name": f"bench-{i}", "description": "Evento de carga", "date": start + timedelta(hours=i),
+                "location": f"Sala {i % 50}", "price": 10.0 + i % 90, "total_tickets": 100,
+                "category": "Música", "total_revenue": 0.0, "is_funds_withdrawn": False,
+            }
+            for i in range(total)
+        ])
+        db.commit()
+
+
+def drop_events():
+    with SessionLocal() as db:
+        db.execute(delete(Event).where(Event.name.like("bench-%")))
+        db.commit()
+
+
+async def hammer(url: str, concurrency: int, duration: float) -> tuple[int, list[float]]:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        async def user():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.get(url)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+    return len(latencies), sorted(latencies)
+
+
+def wait_ready(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--events", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    fill_events(args.events)
+    print(f"workers={args.workers} concurrencia={args.concurrency} duración={args.duration:.0f}s "
+          f"latencia={args.latency_ms:.0f} ms")
+    print(f"{'handler':>8} {'req/s':>10} {'p50':>10} {'p99':>10}")
+    try:
+        for path in ("sync", "async"):
+            url = f"http://127.0.0.1:{args.port}/{path}/events"
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "bench_async_db:bench_app",
+                 "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"],
+                env={**os.environ, "BENCH_LATENCY_MS": str(args.latency_ms)}
+            )
+            try:
+                wait_ready(url)
+                asyncio.run(hammer(url, args.concurrency, 1))  # calentar el pool
+                count, latencies = asyncio.run(hammer(url, args.concurrency, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            print(f"{path:>8} {count / args.duration:>10.1f} {p50:>7.1f} ms {p99:>7.1f} ms")
+    finally:
+        drop_events()
+
+
+if __name__ == "__main__":
+    main_bench()
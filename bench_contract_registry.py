@@ -0,0 +1,74 @@
+"""
+Microbenchmark: construir el contrato en cada request frente a usar el registro.
+
+Uso: python bench_contract_registry.py [iteraciones]
+No necesita un nodo RPC: solo mide la construcción del contrato y la
+codificación de las llamadas a ownerOf y safeMint.
+"""
+import json
+import os
+import sys
+import timeit
+
+from web3 import Web3
+
+from contract_registry import ContractRegistry
+
+ADDRESS = "0x000000000000000000000000000000000000dEaD"
+WALLET = "0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf"
+TOKEN_URI = "https://api.ticketera.com/metadata/tickets/1"
+
+
+def per_request(w3: Web3):
+    # Flujo anterior: leer el entorno y reconstruir el contrato en cada request
+    with open("TicketManager.abi", "r") as f:
+        abi = json.load(f)
+    os.environ.get("CONTRACT_ADDRESS")
+    contract = w3.eth.contract(address=ADDRESS, abi=abi)
+    contract.functions.ownerOf(1)._encode_transaction_data()
+    contract.functions.safeMint(WALLET, TOKEN_URI)._encode_transaction_data()
+    contract.events.Transfer()
+
+
+def per_request_cached_abi(w3: Web3, abi):
+    # Flujo anterior con el ABI ya cargado al importar main.py
+    os.environ.get("CONTRACT_ADDRESS")
+    contract = w3.eth.contract(address=ADDRESS, abi=abi)
+    contract.functions.ownerOf(1)._encode_transaction_data()
+    contract.functions.safeMint(WALLET, TOKEN_URI)._encode_transaction_data()
+    contract.events.Transfer()
+
+
+def registry_lookup(w3: Web3, registry: ContractRegistry):
+    ticket_manager = registry.get(w3, ADDRESS)
+    ticket_manager.owner_of(1)._encode_transaction_data()
+    ticket_manager.safe_mint(WALLET, TOKEN_URI)._encode_transaction_data()
+    ticket_manager.transfer
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    os.environ.setdefault("CONTRACT_ADDRESS", ADDRESS)
+    w3 = Web3()
+    registry = ContractRegistry("TicketManager.abi")
+    with open("TicketManager.abi", "r") as f:
+        abi = json.load(f)
+
+    cases = [
+        ("ABI leído + contrato por request", lambda: per_request(w3)),
+        ("contrato por request (ABI en memoria)", lambda: per_request_cached_abi(w3, abi)),
+        ("registro de contratos", lambda: registry_lookup(w3, registry)),
+    ]
+    results = {}
+    for name, fn in cases:
+        fn()  # calentar
+        results[name] = min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e6
+        print(f"{name:40s} {results[name]:9.1f} µs/request")
+
+    baseline = results["contrato por request (ABI en memoria)"]
+    print(f"Ahorro por request: {baseline - results['registro de contratos']:.1f} µs "
+          f"({baseline / results['registro de contratos']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
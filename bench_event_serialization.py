@@ -0,0 +1,88 @@
+"""
+Benchmark: serializar el listado de eventos con objetos ORM + EventOut frente a
+tuplas de columnas codificadas con orjson.
+
+Uso: python bench_event_serialization.py [tamaños...]   (por defecto 1000 10000 100000)
+Usa una base SQLite temporal, así que no necesita PostgreSQL.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+from main import Event, EventOut, EVENT_OUT_COLUMNS, EVENT_OUT_FIELDS, SessionLocal, engine  # noqa: E402
+from fast_json import RowsJSONResponse  # noqa: E402
+from migrate import upgrade  # noqa: E402
+
+
+def fill_events(total: int):
+    db = SessionLocal()
+    db.query(Event).delete()
+    start = datetime(2026, 1, 1)
+    rows = [
+        {
+            "name": f"Evento {i}", "description": "Descripción del evento " * 4,
+            "date": start + timedelta(hours=i), "location": f"Sala {i % 50}", "price": 10.0 + i % 90,
+            "total_tickets": 100, "category": ("Música", "Teatro", "Deportes")[i % 3],
+            "total_revenue": 0.0, "is_funds_withdrawn": False,
+        }
+        for i in range(total)
+    ]
+    for i in range(0, total, 10000):
+        db.execute(insert(Event), rows[i:i + 10000])
+    db.commit()
+    db.close()
+
+
+def orm_path() -> bytes:
+    # Camino anterior: objetos ORM, validación con EventOut y encoder estándar de FastAPI
+    db = SessionLocal()
+    try:
+        events = db.query(Event).all()
+        validated = [EventOut.model_validate(event) for event in events]
+        return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+    finally:
+        db.close()
+
+
+def tuple_path() -> bytes:
+    db = SessionLocal()
+    try:
+        rows = db.query(*EVENT_OUT_COLUMNS).all()
+        return RowsJSONResponse(rows, EVENT_OUT_FIELDS).body
+    finally:
+        db.close()
+
+
+def measure(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main_bench():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    upgrade(engine)
+    print(f"{'eventos':>8} {'ORM + EventOut':>16} {'tuplas + orjson':>16} {'mejora':>8}")
+    for size in sizes:
+        fill_events(size)
+        assert json.loads(orm_path()) == json.loads(tuple_path())
+        repeat = 5 if size <= 10000 else 2
+        orm_ms = measure(orm_path, repeat)
+        tuple_ms = measure(tuple_path, repeat)
+        print(f"{size:>8} {orm_ms:>13.1f} ms {tuple_ms:>13.1f} ms {orm_ms / tuple_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main_bench()
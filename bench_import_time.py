@@ -0,0 +1,86 @@
+"""
+Benchmark: tiempo de importar main.py, medido con `python -X importtime`.
+
+Uso: python bench_import_time.py [--runs 5] [--budget-ms 2000] [--top 15]
+
+Importa main en un proceso nuevo por corrida, sin PRIVATE_KEY, y toma la
+mediana. Termina con código 1 si la mediana supera el presupuesto
+(IMPORT_BUDGET_MS o --budget-ms) o si al importar se cargó alguno de los
+módulos que deben esperar al primer uso (web3 y sus clientes HTTP).
+Sin DATABASE_URL usa una base SQLite temporal.
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+LAZY_MODULES = ("web3", "eth_account", "aiohttp", "requests")
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_main(env: dict) -> tuple[dict[str, tuple[int, int]], set[str]]:
+    """
+    Devuelve {módulo: (propio_us, acumulado_us)} para main y los módulos que
+    importa directamente, y el conjunto de todos los módulos cargados.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"No se pudo importar main:\n{result.stderr[-2000:]}")
+    # importtime escribe cada módulo después de sus dependencias, con más sangría
+    children, modules, loaded = {}, {}, set()
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        name, depth, times = match[4], len(match[3]), (int(match[1]), int(match[2]))
+        loaded.add(name)
+        if depth == 3:
+            children[name] = times
+        elif depth == 1:
+            if name == "main":
+                modules = {**children, "main": times}
+            children = {}
+    return modules, loaded
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "2000")))
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    env = {key: value for key, value in os.environ.items() if key != "PRIVATE_KEY"}
+    env.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+    runs = [import_main(env) for _ in range(args.runs)]
+
+    totals = [modules["main"][1] / 1000 for modules, _ in runs]
+    median = statistics.median(totals)
+    last, loaded = runs[-1]
+    print(f"{'módulo':<32} {'acumulado':>12}")
+    ranked = sorted((name for name in last if name != "main"), key=lambda name: last[name][1], reverse=True)
+    for name in ranked[:args.top]:
+        print(f"{name:<32} {last[name][1] / 1000:>9.1f} ms")
+    print(f"{'main (propio)':<32} {last['main'][0] / 1000:>9.1f} ms")
+    print(f"\nimport main: mediana {median:.1f} ms en {args.runs} corridas "
+          f"(mín {min(totals):.1f}, máx {max(totals):.1f}); presupuesto {args.budget_ms:.0f} ms")
+
+    eager = {name.split(".")[0] for name in loaded} & set(LAZY_MODULES)
+    failed = False
+    if eager:
+        print(f"Se importan al cargar main y deberían esperar al primer uso: {', '.join(sorted(eager))}")
+        failed = True
+    if median > args.budget_ms:
+        print("Fuera de presupuesto")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_bench())
@@ -0,0 +1,112 @@
+"""
+Prueba de carga: latencia de endpoints que no tienen que ver con el login
+(`GET /events` y `GET /`) mientras una ola de logins hashea con bcrypt.
+
+Uso: python bench_login_flood.py [--logins 32] [--duration 10] [--workers-hash 0 2]
+
+Usa DATABASE_URL (con las migraciones aplicadas) y levanta uvicorn una vez por
+cada valor de --workers-hash: 0 es bcrypt en el threadpool de la API, como
+antes; N > 0 es el pool de N procesos. Crea un usuario `bench-login-*` y lo
+borra al final.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete, select
+
+from main import RefreshToken, SessionLocal, TokenFamily, User
+
+PROBES = ("/events?limit=20", "/")
+
+
+async def flood(base_url: str, email: str, password: str, logins: int, duration: float):
+    """Devuelve (logins por segundo, {probe: latencias ordenadas})."""
+    deadline = time.perf_counter() + duration
+    probe_latencies = {probe: [] for probe in PROBES}
+    done = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 limits=httpx.Limits(max_connections=logins + len(PROBES))) as client:
+        async def login():
+            nonlocal done
+            while time.perf_counter() < deadline:
+                response = await client.post("/auth/login", data={"username": email, "password": password})
+                if response.status_code == 200:
+                    done += 1
+
+        async def probe(path: str):
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                (await client.get(path)).raise_for_status()
+                probe_latencies[path].append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(*(login() for _ in range(logins)), *(probe(path) for path in PROBES))
+    return done / duration, {path: sorted(latencies) for path, latencies in probe_latencies.items()}
+
+
+def percentile(latencies: list[float], fraction: float) -> float:
+    return latencies[min(int(len(latencies) * fraction), len(latencies) - 1)] * 1000
+
+
+def wait_ready(url: str, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url).raise_for_status()
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("uvicorn no respondió a tiempo")
+
+
+def main_bench():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=32, help="logins concurrentes")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--workers-hash", type=int, nargs="+", default=[0, max(1, (os.cpu_count() or 2) // 2)])
+    parser.add_argument("--port", type=int, default=8766)
+    args = parser.parse_args()
+
+    email, password = f"bench-login-{uuid.uuid4().hex[:8]}@example.com", "clave-de-prueba"
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"logins concurrentes={args.logins} duración={args.duration:.0f}s")
+    print(f"{'hash':>10} {'logins/s':>9} " + " ".join(f"{path + ' p50/p99':>30}" for path in PROBES))
+    try:
+        for workers in args.workers_hash:
+            server = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+                # Sin límites de requests: el flood sale de una sola IP
+                env={**os.environ, "PASSWORD_HASH_WORKERS": str(workers), "RATE_LIMIT_ENABLED": "false"}
+            )
+            try:
+                wait_ready(base_url + "/")
+                httpx.post(base_url + "/auth/register", json={"email": email, "password": password}, timeout=60)
+                asyncio.run(flood(base_url, email, password, 1, 1))  # arrancar los procesos del pool
+                rate, latencies = asyncio.run(flood(base_url, email, password, args.logins, args.duration))
+            finally:
+                server.terminate()
+                server.wait()
+            label = "threadpool" if workers <= 0 else f"{workers} proc"
+            print(f"{label:>10} {rate:>9.1f} " + " ".join(
+                f"{percentile(latencies[path], 0.5):>11.1f} ms / {percentile(latencies[path], 0.99):>8.1f} ms"
+                for path in PROBES
+            ))
+    finally:
+        with SessionLocal() as db:
+            users = select(User.id).where(User.email.like("bench-login-%"))
+            families = select(TokenFamily.id).where(TokenFamily.user_id.in_(users))
+            db.execute(delete(RefreshToken).where(RefreshToken.family_id.in_(families)))
+            db.execute(delete(TokenFamily).where(TokenFamily.user_id.in_(users)))
+            db.execute(delete(User).where(User.id.in_(users)))
+            db.commit()
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,77 @@
+"""
+Benchmark del índice de recomendaciones (`recommender.EventIndex`) con un
+catálogo sintético, sin base de datos.
+
+Uso: python bench_recommendations.py [--events 100000] [--queries 2000] [--updates 500]
+
+Mide la construcción completa, la latencia de `similar` (p50/p99) y el costo
+de aplicar ediciones de forma incremental.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from recommender import EventIndex
+
+WORDS = [f"palabra{i}" for i in range(5000)]
+CATEGORIES = ["Música", "Teatro", "Deportes", "Conferencias", "Cine", "Danza", "Arte", "Gastronomía"]
+CITIES = [f"Ciudad {i}" for i in range(300)]
+
+
+def fake_event(rng: random.Random, event_id: int) -> tuple:
+    # Vocabulario con distribución de Zipf: pocas palabras muy comunes y muchas raras
+    words = lambda n: " ".join(WORDS[min(int(rng.paretovariate(1.1)) - 1, len(WORDS) - 1)] for _ in range(n))
+    return (event_id, words(4), words(rng.randint(10, 40)), rng.choice(CATEGORIES), rng.choice(CITIES))
+
+
+def percentile(samples: list[float], fraction: float) -> float:
+    return samples[min(int(len(samples) * fraction), len(samples) - 1)] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    catalog = {event_id: fake_event(rng, event_id) for event_id in range(1, args.events + 1)}
+    load_events = lambda ids: list(catalog.values()) if ids is None else [catalog[i] for i in ids if i in catalog]
+    index = EventIndex(load_events, max_age=float("inf"), min_rebuild_changes=args.events)
+
+    started = time.perf_counter()
+    index.similar(1, args.k)
+    print(f"construcción: {time.perf_counter() - started:.2f} s, {index.status()['terms']} términos")
+
+    latencies = []
+    for event_id in rng.sample(range(1, args.events + 1), args.queries):
+        started = time.perf_counter()
+        index.similar(event_id, args.k)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"similar(k={args.k}): p50 {percentile(latencies, 0.5):.2f} ms, p99 {percentile(latencies, 0.99):.2f} ms")
+
+    edited = rng.sample(range(1, args.events + 1), args.updates)
+    for event_id in edited:
+        catalog[event_id] = fake_event(rng, event_id)
+    index.invalidate(edited)
+    started = time.perf_counter()
+    index.similar(edited[0], args.k)
+    elapsed = time.perf_counter() - started
+    print(f"{args.updates} ediciones incrementales: {elapsed * 1000:.1f} ms ({elapsed / args.updates * 1e6:.0f} us por evento)")
+
+    latencies = []
+    for event_id in rng.sample(range(1, args.events + 1), args.queries):
+        started = time.perf_counter()
+        index.similar(event_id, args.k)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    print(f"tras las ediciones: p50 {percentile(latencies, 0.5):.2f} ms, p99 {percentile(latencies, 0.99):.2f} ms")
+    print(f"mediana de candidatos por consulta: {statistics.median(len(index.similar(i, args.events)) for i in range(1, 51))}")
+
+
+if __name__ == "__main__":
+    main()
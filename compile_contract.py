@@ -1,5 +1,9 @@
 from solcx import compile_source, install_solc, get_installed_solc_versions
 import json
+import os
+
+# El ABI y el bytecode salen siempre juntos de TicketManager.sol: no editar uno a mano
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Instalar solc 0.8.0 si no está instalado
 if '0.8.0' not in get_installed_solc_versions():
@@ -7,29 +11,26 @@ if '0.8.0' not in get_installed_solc_versions():
     install_solc('0.8.0')
     print("solc instalado.")
 
-with open("TicketManager.sol", "r") as f:
+with open(os.path.join(BASE_DIR, "TicketManager.sol"), "r") as f:
     contract_source_code = f.read()
 
-# Permitir importaciones desde la carpeta 'contracts'
-allowed_paths = [
-    "D:/Ruben/ticketera-ia-blockchain/backend/contracts"
-]
-
+# Las importaciones "./contracts/..." se resuelven desde la carpeta del backend
 compiled_sol = compile_source(
     contract_source_code,
     output_values=['abi', 'bin'],
     solc_version='0.8.0',
-    allow_paths=allowed_paths
+    base_path=BASE_DIR,
+    allow_paths=[os.path.join(BASE_DIR, "contracts")]
 )
 
 contract_interface = compiled_sol["<stdin>:TicketManager"]
 
 # Guardar ABI
-with open("TicketManager.abi", "w") as f:
+with open(os.path.join(BASE_DIR, "TicketManager.abi"), "w") as f:
     json.dump(contract_interface['abi'], f)
 
 # Guardar bytecode
-with open("TicketManager.bin", "w") as f:
+with open(os.path.join(BASE_DIR, "TicketManager.bin"), "w") as f:
     f.write(contract_interface['bin'])
 
 print("Contrato compilado exitosamente. ABI y bytecode guardados.")
\ No newline at end of file
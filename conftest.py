@@ -0,0 +1,18 @@
+import os
+
+import pytest
+
+# Los tests registran y compran desde la misma IP; test_rate_limit prueba los límites aparte
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+# Registra los overrides de dependencias de test_main (sesión async y web3 de
+# prueba) aunque se ejecute un solo archivo de pruebas que no lo importe.
+import test_main  # noqa: E402,F401
+import migrate  # noqa: E402
+from main import engine  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def migrated_database():
+    # main.py ya no crea las tablas al importarse
+    migrate.upgrade(engine)
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+import time
+import weakref
+
+from web3 import Web3
+
+
+class TicketManagerHandles:
+    """Contrato TicketManager ya construido con sus funciones y eventos más usados."""
+
+    def __init__(self, contract):
+        self.contract = contract
+        self.safe_mint = contract.functions.safeMint
+        # Los ABI anteriores a safeMintBatch no la incluyen
+        self.safe_mint_batch = getattr(contract.functions, "safeMintBatch", None)
+        self.owner_of = contract.functions.ownerOf
+        self.transfer = contract.events.Transfer()
+
+
+class ContractRegistry:
+    """
+    Lee una sola vez el ABI de TicketManager y la dirección del contrato, y
+    cachea los objetos de contrato por instancia de Web3 para no reconstruirlos
+    en cada request.
+
+    Cada `reload_interval` segundos comprueba si el archivo del ABI o la
+    variable CONTRACT_ADDRESS cambiaron y, en ese caso, recarga todo.
+    """
+
+    def __init__(self, abi_path: str = "TicketManager.abi", reload_interval: float = 5.0):
+        self.abi_path = abi_path
+        self.reload_interval = reload_interval
+        self.abi = None
+        self.address = None
+        self._abi_mtime = None
+        self._raw_address = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._contracts = weakref.WeakKeyDictionary()
+        self.load()
+
+    def load(self):
+        with open(self.abi_path, "r") as f:
+            abi = json.load(f)
+        raw_address = os.environ.get("CONTRACT_ADDRESS")
+        with self._lock:
+            self.abi = abi
+            self._abi_mtime = os.path.getmtime(self.abi_path)
+            self._raw_address = raw_address
+            self.address = Web3.to_checksum_address(raw_address) if raw_address else None
+            self._contracts = weakref.WeakKeyDictionary()
+            self._next_check = time.monotonic() + self.reload_interval
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        if (os.path.getmtime(self.abi_path) != self._abi_mtime
+                or os.environ.get("CONTRACT_ADDRESS") != self._raw_address):
+            self.load()
+            return True
+        return False
+
+    def get(self, w3: Web3, address: str | None = None) -> TicketManagerHandles:
+        self.reload_if_changed()
+        address = address or self.address
+        contracts = self._contracts.get(w3)
+        if contracts is None:
+            with self._lock:
+                contracts = self._contracts.setdefault(w3, {})
+        handles = contracts.get(address)
+        if handles is None:
+            handles = TicketManagerHandles(w3.eth.contract(address=address, abi=self.abi))
+            contracts[address] = handles
+        return handles
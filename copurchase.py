@@ -0,0 +1,197 @@
+"""
+Modelo item-item de co-compra para GET /users/me/recommendations.
+
+Uso:
+    python copurchase.py build [--output DIR] [--neighbors 50]
+
+Lee `tickets` (evento x wallet que lo compró) y, para cada evento, guarda sus
+`--neighbors` eventos más comprados por las mismas wallets, con similitud
+coseno sobre los compradores. Se construye fuera de la API, con un job
+programado (por ejemplo, cada hora con cron), y se escribe como arrays `.npy`
+en una carpeta por versión; `current.json` apunta a la última y se reemplaza
+de forma atómica. La API abre los arrays con mmap, así que todos los workers
+comparten las mismas páginas en memoria, y cambia de versión sola cuando
+`current.json` cambia.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import Column, Integer, MetaData, String, Table, create_engine, select
+
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "copurchase")
+MANIFEST = "current.json"
+ARRAYS = ("event_ids", "indptr", "neighbors", "scores", "popular_events")
+# Wallets con más compras (revendedores) aportarían pares cuadráticos y poca señal
+MAX_EVENTS_PER_WALLET = 200
+MAX_POPULAR = 1000
+
+tickets = Table(
+    "tickets", MetaData(),
+    Column("event_id", Integer),
+    Column("owner_wallet_address", String),
+)
+
+
+def build_arrays(purchases, neighbors: int = 50) -> dict[str, np.ndarray]:
+    """`purchases`: pares (event_id, wallet). Repetidos cuentan una vez."""
+    by_wallet: dict[str, set[int]] = {}
+    for event_id, wallet in purchases:
+        if event_id is not None and wallet:
+            by_wallet.setdefault(wallet.lower(), set()).add(event_id)
+    event_ids = np.array(sorted({event_id for events in by_wallet.values() for event_id in events}), dtype=np.int64)
+    n_events = len(event_ids)
+
+    firsts, seconds, buyers = [], [], np.zeros(n_events, dtype=np.int64)
+    for events in by_wallet.values():
+        rows = np.searchsorted(event_ids, sorted(events)[:MAX_EVENTS_PER_WALLET])
+        buyers[rows] += 1
+        if len(rows) > 1:
+            # Todos los pares ordenados (a, b) con a != b de esta wallet
+            a, b = np.repeat(rows, len(rows)), np.tile(rows, len(rows))
+            keep = a != b
+            firsts.append(a[keep])
+            seconds.append(b[keep])
+
+    if firsts:
+        pair_keys, counts = np.unique(np.concatenate(firsts) * n_events + np.concatenate(seconds), return_counts=True)
+        a, b = pair_keys // n_events, pair_keys % n_events
+        similarity = counts / np.sqrt(buyers[a] * buyers[b])
+        # Por fila, de mayor a menor similitud (empates por id), y solo los primeros `neighbors`
+        order = np.lexsort((b, -similarity, a))
+        a, b, similarity = a[order], b[order], similarity[order]
+        starts = np.searchsorted(a, np.arange(n_events))
+        keep = np.arange(len(a)) - starts[a] < neighbors
+        a, b, similarity = a[keep], b[keep], similarity[keep]
+    else:
+        a = b = np.empty(0, dtype=np.int64)
+        similarity = np.empty(0)
+
+    return {
+        "event_ids": event_ids,
+        "indptr": np.searchsorted(a, np.arange(n_events + 1)).astype(np.int64),
+        "neighbors": event_ids[b],
+        "scores": similarity.astype(np.float32),
+        "popular_events": event_ids[np.lexsort((event_ids, -buyers))][:MAX_POPULAR],
+    }
+
+
+def save_model(directory: str, arrays: dict[str, np.ndarray], keep: int = 2) -> str:
+    """Escribe una versión nueva, la publica en `current.json` y borra las viejas salvo las últimas `keep`."""
+    version = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    os.makedirs(os.path.join(directory, version))
+    for name in ARRAYS:
+        np.save(os.path.join(directory, version, f"{name}.npy"), arrays[name])
+    manifest = {"version": version, "built_at": datetime.utcnow().isoformat(), "events": len(arrays["event_ids"])}
+    tmp = os.path.join(directory, f"{MANIFEST}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, os.path.join(directory, MANIFEST))
+    # Un worker puede seguir leyendo la versión anterior hasta que note el cambio
+    versions = sorted(entry for entry in os.listdir(directory) if os.path.isdir(os.path.join(directory, entry)))
+    for old in versions[:-keep]:
+        shutil.rmtree(os.path.join(directory, old), ignore_errors=True)
+    return version
+
+
+class CoPurchaseModel:
+    def __init__(self, directory: str, version: str):
+        self.version = version
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(directory, version, f"{name}.npy"), mmap_mode="r"))
+
+    def recommend(self, history: list[int], k: int) -> list[int]:
+        """Eventos comprados junto con los de `history`, de más a menos afines, sin los de `history`."""
+        history = np.unique(np.asarray(history, dtype=np.int64))
+        rows = np.searchsorted(self.event_ids, history)
+        found = rows < len(self.event_ids)
+        found[found] = self.event_ids[rows[found]] == history[found]
+        rows = rows[found]
+        if not len(rows):
+            return []
+        positions = np.concatenate([np.arange(self.indptr[row], self.indptr[row + 1]) for row in rows])
+        neighbors, scores = self.neighbors[positions], self.scores[positions]
+        keep = ~np.isin(neighbors, history)
+        candidates, inverse = np.unique(neighbors[keep], return_inverse=True)
+        totals = np.bincount(inverse, weights=scores[keep], minlength=len(candidates))
+        # Orden estable: con igual puntaje, primero el id menor
+        return candidates[np.argsort(-totals, kind="stable")[:k]].tolist()
+
+    def popular(self, k: int, exclude=()) -> list[int]:
+        """Los eventos con más compradores, para quien no tiene historial."""
+        popular = np.asarray(self.popular_events)
+        if len(exclude):
+            popular = popular[~np.isin(popular, np.fromiter(exclude, dtype=np.int64))]
+        return popular[:k].tolist()
+
+
+class CoPurchaseRecommender:
+    """Da el modelo vigente y lo recarga si `current.json` cambió (se revisa cada `check_interval` segundos)."""
+
+    def __init__(self, directory: str, check_interval: float = 30.0):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._model: CoPurchaseModel | None = None
+        self._manifest_mtime = None
+        self._next_check = 0.0
+
+    def load(self) -> CoPurchaseModel | None:
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.stat(manifest_path).st_mtime_ns
+            except FileNotFoundError:
+                self._model, self._manifest_mtime = None, None
+                return None
+            if mtime != self._manifest_mtime:
+                with open(manifest_path) as f:
+                    version = json.load(f)["version"]
+                self._model = CoPurchaseModel(self.directory, version)
+                self._manifest_mtime = mtime
+            return self._model
+
+    @property
+    def model(self) -> CoPurchaseModel | None:
+        if time.monotonic() >= self._next_check:
+            return self.load()
+        return self._model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Modelo de co-compra para recomendaciones")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    build_parser = subcommands.add_parser("build", help="construye y publica una versión nueva del modelo")
+    build_parser.add_argument("--output", default=None, help="carpeta del modelo (por defecto COPURCHASE_MODEL_DIR)")
+    build_parser.add_argument("--neighbors", type=int, default=50, help="vecinos guardados por evento")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv(encoding='utf-8', override=True)
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set.")
+    output = args.output or os.getenv("COPURCHASE_MODEL_DIR", DEFAULT_MODEL_DIR)
+    engine = create_engine(database_url)
+    try:
+        started = time.perf_counter()
+        with engine.connect() as conn:
+            purchases = conn.execute(select(tickets.c.event_id, tickets.c.owner_wallet_address)).all()
+        arrays = build_arrays(purchases, args.neighbors)
+        version = save_model(output, arrays)
+        print(f"Versión {version}: {len(arrays['event_ids'])} eventos, {len(arrays['neighbors'])} vecinos, "
+              f"{len(purchases)} tickets en {time.perf_counter() - started:.1f} s")
+        return 0
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Por hilo y por greenlet: con el engine async varias corrutinas esperan en el mismo hilo
+_measuring = ContextVar("pool_measuring", default=False)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que además mide cuánto esperan los hilos por una conexión."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _do_get(self):
+        # QueuePool._do_get se llama a sí mismo al reintentar: medir solo la llamada externa
+        if _measuring.get():
+            return super()._do_get()
+        token = _measuring.set(True)
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            _measuring.reset(token)
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """Variante para el engine async (asyncpg/aiosqlite)."""
+
+
+def pool_status(pool) -> dict:
+    status = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "timeout": pool.timeout(),
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        status.update(pool.stats())
+    return status
@@ -0,0 +1,117 @@
+import itertools
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class ReplicaSet:
+    """
+    Réplicas de lectura de la base, cada una con su engine async.
+
+    `round_robin` las reparte en orden; `least_latency` elige la de menor
+    latencia media por consulta (media móvil exponencial medida en cada
+    ejecución), y prueba primero las que aún no tienen mediciones.
+    """
+
+    SELECTIONS = ("round_robin", "least_latency")
+
+    def __init__(self, engines: list, selection: str = "round_robin", smoothing: float = 0.2):
+        if selection not in self.SELECTIONS:
+            raise ValueError(f"Selección de réplica desconocida: {selection}")
+        self.engines = list(engines)
+        self.selection = selection
+        self.smoothing = smoothing
+        self._sessionmakers = [
+            async_sessionmaker(engine, autoflush=False, expire_on_commit=False) for engine in self.engines
+        ]
+        self._latencies: list[float | None] = [None] * len(self.engines)
+        self._lock = threading.Lock()
+        self._cycle = itertools.cycle(range(len(self.engines)))
+        for index, engine in enumerate(self.engines):
+            self._watch(index, engine)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.engines)
+
+    def _watch(self, index: int, engine):
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def _start(conn, cursor, statement, parameters, context, executemany):
+            conn.info["replica_query_start"] = time.perf_counter()
+
+        @event.listens_for(engine.sync_engine, "after_cursor_execute")
+        def _stop(conn, cursor, statement, parameters, context, executemany):
+            start = conn.info.pop("replica_query_start", None)
+            if start is not None:
+                self.record_latency(index, time.perf_counter() - start)
+
+    def record_latency(self, index: int, seconds: float):
+        with self._lock:
+            current = self._latencies[index]
+            self._latencies[index] = seconds if current is None else current + self.smoothing * (seconds - current)
+
+    def choose(self) -> int:
+        with self._lock:
+            if self.selection == "least_latency":
+                return min(range(len(self.engines)), key=lambda i: (self._latencies[i] is not None, self._latencies[i] or 0.0))
+            return next(self._cycle)
+
+    def session(self) -> AsyncSession:
+        return self._sessionmakers[self.choose()]()
+
+    def status(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "url": engine.url.render_as_string(hide_password=True),
+                    "latency_ms": None if latency is None else round(latency * 1000, 3),
+                }
+                for engine, latency in zip(self.engines, self._latencies)
+            ]
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+
+class ReadYourWrites:
+    """
+    Recuerda por unos segundos a quién acaba de escribir para que sus lecturas
+    vayan a la primaria mientras las réplicas se ponen al día.
+
+    Los pines viven en memoria del proceso: con varios workers, una lectura
+    atendida por otro worker puede ir a una réplica.
+    """
+
+    def __init__(self, window: float = 5.0, max_entries: int = 10000):
+        self.window = window
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._pins: dict[str, float] = {}
+
+    def pin(self, key: str):
+        if self.window <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if len(self._pins) >= self.max_entries:
+                self._pins = {k: until for k, until in self._pins.items() if until > now}
+            self._pins[key] = now + self.window
+
+    def is_pinned(self, key: str | None) -> bool:
+        if key is None:
+            return False
+        with self._lock:
+            until = self._pins.get(key)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._pins[key]
+                return False
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._pins.clear()
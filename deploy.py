@@ -25,9 +25,11 @@ def compile_and_deploy():
     abi = contract_interface["abi"]
     bytecode = contract_interface["bin"]
 
-    # Guardar ABI
+    # Guardar ABI y bytecode juntos para que no queden desfasados
     with open("TicketManager.abi", "w") as f:
         json.dump(abi, f)
+    with open("TicketManager.bin", "w") as f:
+        f.write(bytecode)
 
     # Conectar a Ganache
     w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
@@ -0,0 +1,32 @@
+import orjson
+from fastapi import Response
+
+
+def dumps(content) -> bytes:
+    # orjson serializa datetime, enums y floats igual que el encoder de FastAPI
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def rows_to_dicts(fields: tuple[str, ...], rows) -> list[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+class RowsJSONResponse(Response):
+    """
+    Respuesta JSON para filas ya seleccionadas como tuplas (`db.query(*columnas)`).
+
+    Evita validar cada fila con Pydantic: las tuplas se convierten en objetos
+    con los nombres de `fields` y se codifican directamente con orjson. Sin
+    `fields`, el contenido se codifica tal cual.
+    """
+
+    media_type = "application/json"
+
+    def __init__(self, content=None, fields: tuple[str, ...] | None = None, **kwargs):
+        self.fields = fields
+        super().__init__(content=content, **kwargs)
+
+    def render(self, content) -> bytes:
+        if self.fields is None:
+            return dumps(content)
+        return dumps(rows_to_dicts(self.fields, content))
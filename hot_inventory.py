@@ -0,0 +1,190 @@
+import threading
+
+try:
+    import redis
+except ImportError:  # Dependencia opcional: solo se necesita con un backend Redis
+    redis = None
+
+
+class MemoryInventoryStore:
+    """
+    Contadores de inventario en memoria del proceso.
+
+    Por cada evento guarda los tickets disponibles y los acumulados (vendidos y
+    recaudación) que todavía no se escribieron en la tabla `events`. Sirve como
+    sustituto de Redis en pruebas o con un único proceso de la API.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: dict[int, list] = {}  # event_id -> [disponibles, vendidos, recaudación]
+
+    def load(self, event_id: int, available: int) -> bool:
+        # Solo el primero que carga el evento fija el valor inicial
+        with self._lock:
+            if event_id in self._events:
+                return False
+            self._events[event_id] = [available, 0, 0.0]
+            return True
+
+    def reserve(self, event_id: int) -> bool | None:
+        """Descuenta un ticket; None si el evento no está cargado."""
+        with self._lock:
+            counters = self._events.get(event_id)
+            if counters is None:
+                return None
+            if counters[0] <= 0:
+                return False
+            counters[0] -= 1
+            counters[1] += 1
+            return True
+
+    def release(self, event_id: int) -> bool:
+        with self._lock:
+            counters = self._events.get(event_id)
+            if counters is None:
+                return False
+            counters[0] += 1
+            counters[1] -= 1
+            return True
+
+    def add_revenue(self, event_id: int, amount: float) -> bool:
+        with self._lock:
+            counters = self._events.get(event_id)
+            if counters is None:
+                return False
+            counters[2] += amount
+            return True
+
+    def available(self, event_id: int) -> int | None:
+        with self._lock:
+            counters = self._events.get(event_id)
+            return None if counters is None else counters[0]
+
+    def drain(self) -> dict[int, tuple[int, float]]:
+        """Devuelve y pone en cero los acumulados pendientes de cada evento."""
+        with self._lock:
+            deltas = {}
+            for event_id, counters in self._events.items():
+                if counters[1] or counters[2]:
+                    deltas[event_id] = (counters[1], counters[2])
+                    counters[1], counters[2] = 0, 0.0
+            return deltas
+
+    def restore(self, event_id: int, sold: int, revenue: float):
+        # Devuelve acumulados que no se pudieron escribir en la base
+        with self._lock:
+            counters = self._events.get(event_id)
+            if counters is not None:
+                counters[1] += sold
+                counters[2] += revenue
+
+    def evict(self, event_id: int):
+        with self._lock:
+            self._events.pop(event_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+
+class RedisInventoryStore:
+    """
+    Misma interfaz que `MemoryInventoryStore` sobre un hash de Redis por evento,
+    compartido entre procesos. Cada operación es un script Lua atómico.
+    """
+
+    RESERVE = """
+    local available = redis.call('HGET', KEYS[1], 'available')
+    if not available then return -1 end
+    if tonumber(available) <= 0 then return 0 end
+    redis.call('HINCRBY', KEYS[1], 'available', -1)
+    redis.call('HINCRBY', KEYS[1], 'sold', 1)
+    return 1
+    """
+    RELEASE = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+    redis.call('HINCRBY', KEYS[1], 'available', 1)
+    redis.call('HINCRBY', KEYS[1], 'sold', -1)
+    return 1
+    """
+    ADD_REVENUE = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+    redis.call('HINCRBYFLOAT', KEYS[1], 'revenue', ARGV[1])
+    return 1
+    """
+    DRAIN = """
+    local sold = redis.call('HGET', KEYS[1], 'sold') or '0'
+    local revenue = redis.call('HGET', KEYS[1], 'revenue') or '0'
+    redis.call('HSET', KEYS[1], 'sold', 0, 'revenue', 0)
+    return {sold, revenue}
+    """
+
+    def __init__(self, client, prefix: str = "inventory"):
+        self.client = client
+        self.prefix = prefix
+        self._reserve = client.register_script(self.RESERVE)
+        self._release = client.register_script(self.RELEASE)
+        self._add_revenue = client.register_script(self.ADD_REVENUE)
+        self._drain = client.register_script(self.DRAIN)
+
+    @classmethod
+    def from_url(cls, url: str):
+        if redis is None:
+            raise RuntimeError("El paquete 'redis' es necesario para HOT_INVENTORY=redis://...")
+        return cls(redis.Redis.from_url(url))
+
+    def _key(self, event_id: int) -> str:
+        return f"{self.prefix}:{event_id}"
+
+    def load(self, event_id: int, available: int) -> bool:
+        loaded = self.client.hsetnx(self._key(event_id), "available", available)
+        if loaded:
+            self.client.sadd(f"{self.prefix}:events", event_id)
+        return bool(loaded)
+
+    def reserve(self, event_id: int) -> bool | None:
+        result = self._reserve(keys=[self._key(event_id)])
+        return None if result == -1 else bool(result)
+
+    def release(self, event_id: int) -> bool:
+        return bool(self._release(keys=[self._key(event_id)]))
+
+    def add_revenue(self, event_id: int, amount: float) -> bool:
+        return bool(self._add_revenue(keys=[self._key(event_id)], args=[amount]))
+
+    def available(self, event_id: int) -> int | None:
+        value = self.client.hget(self._key(event_id), "available")
+        return None if value is None else int(value)
+
+    def drain(self) -> dict[int, tuple[int, float]]:
+        deltas = {}
+        for member in self.client.smembers(f"{self.prefix}:events"):
+            event_id = int(member)
+            sold, revenue = self._drain(keys=[self._key(event_id)])
+            if int(sold) or float(revenue):
+                deltas[event_id] = (int(sold), float(revenue))
+        return deltas
+
+    def restore(self, event_id: int, sold: int, revenue: float):
+        pipe = self.client.pipeline()
+        pipe.hincrby(self._key(event_id), "sold", sold)
+        pipe.hincrbyfloat(self._key(event_id), "revenue", revenue)
+        pipe.execute()
+
+    def evict(self, event_id: int):
+        self.client.delete(self._key(event_id))
+        self.client.srem(f"{self.prefix}:events", event_id)
+
+    def clear(self):
+        for member in self.client.smembers(f"{self.prefix}:events"):
+            self.evict(int(member))
+
+
+def create_inventory_store(backend: str | None):
+    """`memory` para el sustituto en proceso, una URL redis:// para Redis, vacío para desactivar."""
+    if not backend:
+        return None
+    if backend == "memory":
+        return MemoryInventoryStore()
+    return RedisInventoryStore.from_url(backend)
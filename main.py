@@ -1,20 +1,54 @@
 import os
+import base64
+import csv
+import io
 import enum
+import hashlib
 import json
+import math
+import asyncio
+import queue
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING
 
 from dotenv import load_dotenv
 
-from fastapi import Depends, FastAPI, HTTPException, APIRouter
+from fastapi import Depends, FastAPI, HTTPException, APIRouter, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel
 from sqlalchemy import (Column, create_engine, DateTime, Enum, Float,
-                        ForeignKey, Integer, String, func, Boolean)
+                        ForeignKey, Integer, String, Text, func, Boolean, Index, UniqueConstraint,
+                        select, tuple_, update, event as sa_event)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
-from web3 import Web3
+from starlette.concurrency import run_in_threadpool
+
+from app_context import AppContext
+from copurchase import DEFAULT_MODEL_DIR as DEFAULT_COPURCHASE_MODEL_DIR, CoPurchaseRecommender
+from db_replicas import ReadYourWrites, ReplicaSet
+from db_pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool, pool_status
+from fast_json import RowsJSONResponse, dumps, rows_to_dicts
+from hot_inventory import create_inventory_store
+from migrate import check_schema
+from password_hashing import HasherBusy, PasswordHasher, hash_password
+from rate_limit import create_rate_limiter
+from recommender import EventIndex
+from response_cache import ResponseCache, create_response_cache
+from token_revocation import RevocationList
+from user_cache import CurrentUser, UserCache
+
+if TYPE_CHECKING:
+    from web3 import AsyncWeb3, Web3
 
 # Cargar variables de entorno
 load_dotenv(encoding='utf-8', override=True)
@@ -27,16 +61,128 @@ if not DATABASE_URL:
     raise ValueError("DATABASE_URL environment variable not set.")
 
 
-engine = create_engine(DATABASE_URL)
+# Pool de conexiones: el de por defecto (5 + 10 de overflow, sin pre-ping ni
+# reciclado) se queda corto con varios workers y entrega conexiones que
+# Render/Postgres ya cerraron por inactividad.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+def engine_options(database_url: str, asynchronous: bool = False) -> dict:
+    if database_url.startswith("sqlite"):
+        return {}  # SQLite (benchmarks) usa su propio pool
+    options = {
+        "poolclass": InstrumentedAsyncQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+    if DB_STATEMENT_TIMEOUT_MS and database_url.startswith("postgres"):
+        if asynchronous:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+def async_database_url(database_url: str):
+    """La misma base con el driver async: asyncpg para PostgreSQL, aiosqlite para SQLite."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite")
+    query = dict(url.query)
+    if "sslmode" in query:
+        query["ssl"] = query.pop("sslmode")  # asyncpg no entiende el parámetro de libpq
+    return url.set(drivername="postgresql+asyncpg", query=query)
+
+# Los handlers HTTP usan el engine async; el sync queda para los hilos de fondo
+# (mint worker, indexador, inventario), las exportaciones y las compras.
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **engine_options(DATABASE_URL, asynchronous=True))
+# Sin expire_on_commit: tras el commit no se puede recargar un atributo de forma implícita
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Réplicas de lectura (URLs separadas por comas) para los GET de catálogo y analítica
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+read_replicas = ReplicaSet(
+    [create_async_engine(async_database_url(url), **engine_options(url, asynchronous=True)) for url in DATABASE_REPLICA_URLS],
+    selection=os.getenv("DB_REPLICA_SELECTION", "round_robin")
+)
+# Segundos que un usuario lee de la primaria después de escribir (0 lo desactiva)
+read_your_writes = ReadYourWrites(float(os.getenv("READ_YOUR_WRITES_SECONDS", "5")))
 Base = declarative_base()
 
+# --- Caché de respuestas públicas ---
+response_cache = create_response_cache(
+    os.getenv("RESPONSE_CACHE_URL"),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "30")),
+    max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+)
+
+def mark_event_changed(db: Session | AsyncSession, event_id: int, details: bool = False):
+    """
+    Registra que un evento cambió; su caché se invalida cuando la sesión hace commit.
+
+    `details` indica cambios de datos del evento (no solo de inventario), que
+    también invalidan la metadata de sus tickets.
+    """
+    tags = db.info.setdefault("changed_cache_tags", set())
+    tags.update(("events", f"event:{event_id}"))
+    if details:
+        tags.add("metadata")
+        db.info.setdefault("changed_event_ids", set()).add(event_id)
+
+# Sobre la clase Session para cubrir también la sesión sync interna de cada AsyncSession
+@sa_event.listens_for(Session, "after_commit")
+def _invalidate_changed_events(session):
+    tags = session.info.pop("changed_cache_tags", None)
+    if tags:
+        response_cache.invalidate(*tags)
+    event_ids = session.info.pop("changed_event_ids", None)
+    if event_ids:
+        event_index.invalidate(event_ids)
+
+@sa_event.listens_for(Session, "after_rollback")
+def _discard_changed_events(session):
+    session.info.pop("changed_cache_tags", None)
+    session.info.pop("changed_event_ids", None)
+
 # --- Enums ---
 class UserRole(str, enum.Enum):
     COMPRADOR = "comprador"
     ORGANIZADOR = "organizador"
 
+class PurchaseStatus(str, enum.Enum):
+    PENDING = "pending"
+    MINTED = "minted"
+    FAILED = "failed"
+    EXPIRED = "expired"
+
+class Consistency(str, enum.Enum):
+    INDEXED = "indexed"
+    CHAIN = "chain"
+
+class EventSort(str, enum.Enum):
+    DATE = "date"
+    DATE_DESC = "-date"
+    PRICE = "price"
+    PRICE_DESC = "-price"
+
+class ExportFormat(str, enum.Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class PurchaseMode(str, enum.Enum):
+    SYNC = "sync"   # Espera el recibo de la transacción antes de responder
+    ASYNC = "async" # Reserva el ticket y delega el minteo al mint worker
+
 # --- Modelos de la Base de Datos (SQLAlchemy) ---
+# Cada cambio de esquema necesita su migración en migrations/ (test_migrations.py lo comprueba)
 class User(Base):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
@@ -55,12 +201,20 @@ class Event(Base):
     location = Column(String, nullable=False)
     price = Column(Float, nullable=False)
     total_tickets = Column(Integer, nullable=False)
+    capacity = Column(Integer, nullable=True) # Tickets a la venta; permite reconciliar el inventario
     category = Column(String, nullable=True) # Nueva columna para la categoría
     total_revenue = Column(Float, default=0.0) # To track revenue
     is_funds_withdrawn = Column(Boolean, default=False) # To simulate fund withdrawal
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="events")
     tickets = relationship("Ticket", back_populates="event") # Relación con tickets
+    # Índices para la paginación por cursor de GET /events
+    __table_args__ = (
+        Index("ix_events_date_id", "date", "id"),
+        Index("ix_events_category_date_id", "category", "date", "id"),
+        Index("ix_events_location_date_id", "location", "date", "id"),
+        Index("ix_events_price_id", "price", "id"),
+    )
 
 from datetime import datetime # Make sure this is at the top
 
@@ -75,9 +229,94 @@ class Ticket(Base):
     purchase_date = Column(DateTime, default=datetime.utcnow)
     is_paid = Column(Boolean, default=False) # To simulate payment status
     event = relationship("Event", back_populates="tickets")
+    __table_args__ = (
+        Index("ix_tickets_owner_wallet_ticket", "owner_wallet_address", "ticket_id_onchain"),
+        Index("ix_tickets_event_paid", "event_id", "is_paid"),
+    )
+
+class Purchase(Base):
+    __tablename__ = "purchases"
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(Integer, ForeignKey("events.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    wallet_address = Column(String, nullable=False)
+    status = Column(Enum(PurchaseStatus), default=PurchaseStatus.PENDING, nullable=False, index=True)
+    ticket_id_onchain = Column(Integer, nullable=True)
+    transaction_hash = Column(String, nullable=True)
+    error = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=True) # Vencimiento de la reserva mientras está pendiente
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    __table_args__ = (
+        Index("ix_purchases_status_expires_at", "status", "expires_at"),
+    )
 
-# Crear tablas en la base de datos
-Base.metadata.create_all(bind=engine)
+class TicketTransfer(Base):
+    # Copia local de los eventos Transfer del contrato, alimentada por el indexador
+    __tablename__ = "ticket_transfers"
+    id = Column(Integer, primary_key=True, index=True)
+    ticket_id_onchain = Column(Integer, nullable=False)
+    from_address = Column(String, nullable=False)
+    to_address = Column(String, nullable=False)
+    block_number = Column(Integer, nullable=False, index=True)
+    block_hash = Column(String, nullable=False)
+    transaction_hash = Column(String, nullable=False)
+    log_index = Column(Integer, nullable=False)
+    __table_args__ = (
+        UniqueConstraint("transaction_hash", "log_index", name="uq_ticket_transfers_tx_log"),
+        Index("ix_ticket_transfers_ticket_block", "ticket_id_onchain", "block_number", "log_index"),
+        Index("ix_ticket_transfers_to_ticket", "to_address", "ticket_id_onchain"),
+    )
+
+class TicketOwner(Base):
+    # Dueño actual de cada ticket según el último Transfer indexado
+    __tablename__ = "ticket_owners"
+    ticket_id_onchain = Column(Integer, primary_key=True)
+    owner_address = Column(String, nullable=False)
+    block_number = Column(Integer, nullable=False)
+    log_index = Column(Integer, nullable=False)
+    __table_args__ = (
+        Index("ix_ticket_owners_owner_ticket", "owner_address", "ticket_id_onchain"),
+    )
+
+class IdempotencyKey(Base):
+    # Resultado guardado de una compra para responder igual a los reintentos
+    __tablename__ = "idempotency_keys"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    key = Column(String, nullable=False)
+    fingerprint = Column(String, nullable=False)
+    response_status = Column(Integer, nullable=True) # None mientras la compra está en curso
+    response_body = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    __table_args__ = (
+        UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+    )
+
+class IndexerCheckpoint(Base):
+    __tablename__ = "indexer_checkpoints"
+    name = Column(String, primary_key=True)
+    block_number = Column(Integer, nullable=False)
+    block_hash = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class TokenFamily(Base):
+    # Un login: todos los refresh tokens que salen de él por rotación
+    __tablename__ = "token_families"
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    revoked_at = Column(DateTime, nullable=True, index=True)
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+    id = Column(String, primary_key=True) # jti del token
+    family_id = Column(String, ForeignKey("token_families.id"), nullable=False, index=True)
+    issued_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True) # Al rotarlo; presentarlo otra vez revoca la familia
+
+# Las tablas las crea `python migrate.py upgrade`; al arrancar solo se comprueba la versión
 
 # --- Schemas (Pydantic) ---
 class UserCreate(BaseModel):
@@ -110,6 +349,10 @@ class EventOut(EventCreate):
     class Config:
         from_attributes = True
 
+# Columnas de EventOut para las consultas que devuelven tuplas en vez de objetos ORM
+EVENT_OUT_FIELDS = tuple(EventOut.model_fields)
+EVENT_OUT_COLUMNS = tuple(getattr(Event, field) for field in EVENT_OUT_FIELDS)
+
 class EventUpdate(BaseModel):
     name: str | None = None
     description: str | None = None
@@ -122,22 +365,48 @@ class EventUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 class TokenData(BaseModel):
     email: str | None = None
+    # Los tokens emitidos antes de incluir estos claims solo traen el email
+    user_id: int | None = None
+    role: UserRole | None = None
+    wallet_address: str | None = None
+    family_id: str | None = None
 
 # --- Seguridad y Hashing ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt corre en un pool de procesos propio, fuera del threadpool de los handlers.
+# Al subir BCRYPT_ROUNDS, los hashes viejos se rehacen en el siguiente login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+password_hasher = PasswordHasher(BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING)
 SECRET_KEY = os.getenv("SECRET_KEY", "a_super_secret_key_that_should_be_in_env")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Usuarios autenticados recientes: evita consultar la base en cada request
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+user_cache = UserCache(ttl=USER_CACHE_TTL_SECONDS)
+# Sesiones revocadas (logout, refresh token reutilizado) mientras sus access tokens sigan vigentes
+revoked_tokens = RevocationList(
+    ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60, sync_interval=float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+)
+
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hash_password(password, BCRYPT_ROUNDS)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def run_password_operation(operation):
+    try:
+        return await operation
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="Too many logins in progress, retry shortly", headers={"Retry-After": "1"})
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -149,38 +418,179 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def access_token_for(user: User, family_id: str | None = None) -> str:
+    claims = {"sub": user.email, "uid": user.id, "role": user.role.value, "wallet": user.wallet_address}
+    if family_id is not None:
+        claims["fam"] = family_id
+    return create_access_token(data=claims, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+
+async def issue_tokens(db: AsyncSession, user: User, family_id: str | None = None) -> dict:
+    """Access token y refresh token nuevos; sin `family_id` abre una sesión nueva. El llamador hace commit."""
+    if family_id is None:
+        family_id = uuid.uuid4().hex
+        db.add(TokenFamily(id=family_id, user_id=user.id))
+        await db.flush()
+    token_id = uuid.uuid4().hex
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(id=token_id, family_id=family_id, expires_at=expires_at))
+    refresh_token = jwt.encode(
+        {"typ": "refresh", "jti": token_id, "fam": family_id, "exp": expires_at.replace(tzinfo=timezone.utc)},
+        SECRET_KEY, algorithm=ALGORITHM
+    )
+    return {"access_token": access_token_for(user, family_id), "token_type": "bearer", "refresh_token": refresh_token}
+
+def decode_refresh_token(refresh_token: str) -> dict:
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception()
+    if payload.get("typ") != "refresh" or not payload.get("jti") or not payload.get("fam"):
+        raise credentials_exception()
+    return payload
+
+async def revoke_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(TokenFamily).where(TokenFamily.id == family_id, TokenFamily.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+    await db.commit()
+    revoked_tokens.revoke(family_id)
+
 # --- Dependencias ---
-def get_db():
+async def get_db():
+    # La sesión toma una conexión del pool solo al ejecutar la primera consulta y
+    # la devuelve en cada commit/rollback. Los endpoints que llaman a la
+    # blockchain hacen commit (o close) antes, para no retenerla durante el RPC.
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_sync_db():
+    # Para los handlers síncronos (compras), que corren en el threadpool con web3 síncrono
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def token_claims(authorization: str | None) -> dict:
+    """Claims del token Bearer, si es válido; no consulta la base."""
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return {}
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return {}
+
+def token_subject(authorization: str | None) -> str | None:
+    """Email del token Bearer, si es válido; no consulta la base."""
+    return token_claims(authorization).get("sub")
+
+async def get_read_db(request: Request, primary: AsyncSession = Depends(get_db)):
+    """
+    Sesión para handlers de solo lectura: una réplica si hay configuradas, o la
+    primaria si el usuario del token escribió hace menos de READ_YOUR_WRITES_SECONDS.
+    """
+    if not read_replicas.enabled or read_your_writes.is_pinned(token_subject(request.headers.get("authorization"))):
+        primary.info["read_your_writes"] = read_replicas.enabled
+        yield primary
+        return
+    async with read_replicas.session() as db:
+        yield db
+
+def must_refresh(db: AsyncSession) -> bool:
+    # La caché pudo llenarse desde una réplica atrasada: quien acaba de escribir la reconstruye
+    return db.info.get("read_your_writes", False)
+
+def credentials_exception():
+    return HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    user = db.query(User).filter(User.email == token_data.email).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        raise credentials_exception()
+    if payload.get("sub") is None or payload.get("typ") == "refresh":
+        raise credentials_exception()
+    return TokenData(
+        email=payload["sub"], user_id=payload.get("uid"), role=payload.get("role"),
+        wallet_address=payload.get("wallet"), family_id=payload.get("fam")
+    )
+
+async def check_not_revoked(db: AsyncSession, token_data: TokenData):
+    if revoked_tokens.sync_due():
+        # Una consulta cada REVOCATION_SYNC_SECONDS trae las revocaciones hechas por otros workers
+        since = datetime.utcnow() - timedelta(seconds=revoked_tokens.ttl)
+        rows = (await db.execute(
+            select(TokenFamily.id, TokenFamily.revoked_at).where(TokenFamily.revoked_at >= since)
+        )).all()
+        await db.commit()
+        now = datetime.utcnow()
+        revoked_tokens.sync([(family_id, (now - revoked_at).total_seconds()) for family_id, revoked_at in rows])
+    if revoked_tokens.is_revoked(token_data.family_id):
+        raise credentials_exception()
+
+async def load_current_user(db: AsyncSession, token_data: TokenData) -> CurrentUser:
+    if token_data.user_id is not None:
+        user = await db.get(User, token_data.user_id)
+    else:
+        user = await db.scalar(select(User).where(User.email == token_data.email))
+    if user is None or user.email != token_data.email:
+        raise credentials_exception()
+    current_user = CurrentUser.from_user(user)
+    user_cache.set(current_user)
+    # Cerrar la transacción de lectura: el handler puede tardar (RPC) sin retener la conexión
+    await db.commit()
+    return current_user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    # Rol y wallet salen de la caché (o de la base al vencer), no del token:
+    # un cambio de rol se ve sin esperar a que el token expire
+    token_data = decode_token(token)
+    await check_not_revoked(db, token_data)
+    cached = user_cache.get(token_data.user_id)
+    if cached is not None and cached.email == token_data.email:
+        return cached
+    return await load_current_user(db, token_data)
+
+async def get_token_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    """
+    Para handlers que solo necesitan saber quién llama (id y email): usa los
+    claims del token sin tocar la base. Rol y wallet pueden estar desactualizados.
+    """
+    token_data = decode_token(token)
+    await check_not_revoked(db, token_data)
+    if token_data.user_id is None or token_data.role is None:
+        return await load_current_user(db, token_data)
+    return CurrentUser(token_data.user_id, token_data.email, token_data.role, token_data.wallet_address)
 
 # --- Aplicación Principal de FastAPI ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    check_schema(engine)
+    mint_worker.start()
+    transfer_indexer.start()
+    inventory_tier.start()
+    copurchase.load()
+    event_index.start()
+    yield
+    transfer_indexer.stop()
+    mint_worker.stop()
+    inventory_tier.stop()
+    password_hasher.shutdown()
+    await app_context.aclose()
+    await async_engine.dispose()
+    await read_replicas.dispose()
+
 app = FastAPI(
     title="Ticketera IA + Blockchain API",
     description="Backend para la gestión de eventos, tickets NFT y recomendaciones con IA.",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan
 )
 
 # --- CORS Middleware ---
@@ -192,21 +602,65 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def pin_writers_to_primary(request: Request, call_next):
+    response = await call_next(request)
+    if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        subject = token_subject(request.headers.get("authorization"))
+        if subject is not None:
+            read_your_writes.pin(subject)
+    return response
+
+# --- Límites de requests ---
+# Token bucket por IP, usuario y wallet, con límites "requests/segundos" por
+# router; las compras, que pueden terminar en una transacción con gas, tienen
+# uno propio más estricto. RATE_LIMIT_URL (Redis) los comparte entre workers.
+# La IP es la del cliente según uvicorn: detrás de un proxy, usar --proxy-headers.
+rate_limiter = create_rate_limiter(
+    os.getenv("RATE_LIMIT_URL"),
+    {
+        "auth": os.getenv("RATE_LIMIT_AUTH", "10/60"),
+        "events": os.getenv("RATE_LIMIT_EVENTS", "120/60"),
+        "web3": os.getenv("RATE_LIMIT_WEB3", "60/60"),
+        "purchase": os.getenv("RATE_LIMIT_PURCHASE", "5/60"),
+    },
+    enabled=os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+)
+
+def rate_limit(scope: str):
+    async def check_rate_limit(request: Request):
+        # Solo claims del token: un request rechazado no llega a la base
+        claims = token_claims(request.headers.get("authorization"))
+        keys = [f"ip:{request.client.host if request.client else 'unknown'}"]
+        if claims.get("uid") is not None:
+            keys.append(f"user:{claims['uid']}")
+        if claims.get("wallet"):
+            keys.append(f"wallet:{claims['wallet'].lower()}")
+        retry_after = await rate_limiter.acheck(scope, keys)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=429, detail="Too many requests", headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+    return check_rate_limit
+
 # --- Routers ---
-auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
+auth_router = APIRouter(prefix="/auth", tags=["Authentication"], dependencies=[Depends(rate_limit("auth"))])
 users_router = APIRouter(prefix="/users", tags=["Users"]) # Router para usuarios
-events_router = APIRouter(prefix="/events", tags=["Events"])
-web3_router = APIRouter(prefix="/tickets", tags=["Blockchain"])
+events_router = APIRouter(prefix="/events", tags=["Events"], dependencies=[Depends(rate_limit("events"))])
+web3_router = APIRouter(prefix="/tickets", tags=["Blockchain"], dependencies=[Depends(rate_limit("web3"))])
+purchases_router = APIRouter(prefix="/purchases", tags=["Blockchain"])
 metadata_router = APIRouter(prefix="/metadata", tags=["Metadata"])
 admin_router = APIRouter(prefix="/admin", tags=["Admin"])
+internal_router = APIRouter(prefix="/internal", tags=["Internal"])
 
 # --- Endpoints de Autenticación ---
 @auth_router.post("/register", response_model=UserOut)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(User).where(User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = get_password_hash(user.password)
+    # bcrypt es lento a propósito: fuera del event loop y del threadpool
+    hashed_password = await run_password_operation(password_hasher.hash(user.password))
     new_user = User(
         email=user.email, 
         hashed_password=hashed_password, 
@@ -214,81 +668,325 @@ def register_user(user: UserCreate, db: Session = Depends(get_db)):
         role=UserRole.COMPRADOR
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @auth_router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == form_data.username))
+    if not user:
+        raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
+    valid, new_hash = await run_password_operation(password_hasher.verify(form_data.password, user.hashed_password))
+    if not valid:
         raise HTTPException(status_code=401, detail="Incorrect email or password", headers={"WWW-Authenticate": "Bearer"})
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(data={"sub": user.email}, expires_delta=access_token_expires)
-    return {"access_token": access_token, "token_type": "bearer"}
+    if new_hash:
+        # Hash con otro costo (BCRYPT_ROUNDS cambió): se reemplaza ahora que tenemos la contraseña
+        user.hashed_password = new_hash
+    tokens = await issue_tokens(db, user)
+    await db.commit()
+    return tokens
+
+@auth_router.post("/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Cambia un refresh token por un access token y un refresh token nuevos, sin
+    bcrypt. Cada refresh token sirve una sola vez: si uno ya usado vuelve a
+    llegar (robado o reenviado), se revoca toda la sesión.
+    """
+    claims = decode_refresh_token(body.refresh_token)
+    family_id = claims["fam"]
+    family = await db.get(TokenFamily, family_id)
+    if family is None or family.revoked_at is not None:
+        raise credentials_exception()
+    rotated = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == claims["jti"], RefreshToken.family_id == family_id, RefreshToken.used_at.is_(None))
+        .values(used_at=datetime.utcnow())
+    )
+    if rotated.rowcount != 1:
+        await db.rollback()
+        await revoke_family(db, family_id)
+        raise credentials_exception()
+    user = await db.get(User, family.user_id)
+    tokens = await issue_tokens(db, user, family_id)
+    await db.commit()
+    return tokens
+
+@auth_router.post("/logout", status_code=204)
+async def logout(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Revoca la sesión del refresh token: sus access tokens dejan de valer
+    claims = decode_refresh_token(body.refresh_token)
+    await revoke_family(db, claims["fam"])
+    return Response(status_code=204)
 
 @auth_router.get("/users/me", response_model=UserOut)
-async def read_users_me(current_user: User = Depends(get_current_user)):
+async def read_users_me(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
 
-@users_router.get("/me/tickets", tags=["Blockchain"], response_model=list[dict])
-def get_my_tickets(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    if not current_user.wallet_address:
-        raise HTTPException(status_code=400, detail="User does not have a wallet address registered.")
+# --- Recomendaciones ---
+def load_recommendation_events(ids: list[int] | None):
+    # Siempre de la primaria: el índice se refresca justo después de los commits
+    stmt = select(Event.id, Event.name, Event.description, Event.category, Event.location)
+    if ids is not None:
+        stmt = stmt.where(Event.id.in_(ids))
+    with SessionLocal() as db:
+        return db.execute(stmt).all()
+
+event_index = EventIndex(
+    load_recommendation_events,
+    max_age=float(os.getenv("RECOMMENDATIONS_MAX_AGE_SECONDS", "600")),
+    rebuild_ratio=float(os.getenv("RECOMMENDATIONS_REBUILD_RATIO", "0.1"))
+)
 
-    tickets_db = db.query(Ticket).filter(Ticket.owner_wallet_address == current_user.wallet_address).all()
-    
-    tickets_out = []
-    for ticket in tickets_db:
-        tickets_out.append({"ticket_id": ticket.ticket_id_onchain, "owner": ticket.owner_wallet_address})
-            
-    return tickets_out
+# Modelo de co-compra construido por `python copurchase.py build`
+copurchase = CoPurchaseRecommender(
+    os.getenv("COPURCHASE_MODEL_DIR", DEFAULT_COPURCHASE_MODEL_DIR),
+    check_interval=float(os.getenv("COPURCHASE_CHECK_SECONDS", "30"))
+)
+# Candidatos pedidos al modelo por cada resultado, para que sobren tras descartar eventos pasados o agotados
+COPURCHASE_OVERFETCH = 4
+
+@users_router.get("/me/recommendations", tags=["AI"], response_model=list[EventOut], response_class=RowsJSONResponse)
+async def get_my_recommendations(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Eventos próximos con tickets disponibles, elegidos por lo que compraron
+    las wallets que compraron lo mismo que el usuario. Sin historial (o sin
+    modelo) se completa con los más vendidos y, al final, por fecha.
+    """
+    upcoming = (Event.date > datetime.utcnow(), Event.total_tickets > 0)
+    history = []
+    if current_user.wallet_address:
+        history = (await db.execute(
+            select(Ticket.event_id).where(Ticket.owner_wallet_address == current_user.wallet_address).distinct()
+        )).scalars().all()
+
+    model = copurchase.model
+    candidates = []
+    if model is not None:
+        wanted = limit * COPURCHASE_OVERFETCH
+        candidates = model.recommend(history, wanted) if history else []
+        if len(candidates) < wanted:
+            candidates += model.popular(wanted - len(candidates), exclude=set(history) | set(candidates))
+
+    recommendations = []
+    if candidates:
+        rows = (await db.execute(select(*EVENT_OUT_COLUMNS).where(Event.id.in_(candidates), *upcoming))).all()
+        by_id = {row.id: row for row in rows}
+        recommendations = [by_id[id_] for id_ in candidates if id_ in by_id][:limit]
+    if len(recommendations) < limit:
+        stmt = select(*EVENT_OUT_COLUMNS).where(*upcoming).order_by(Event.date, Event.id).limit(limit - len(recommendations))
+        seen = set(history) | {row.id for row in recommendations}
+        if seen:
+            stmt = stmt.where(Event.id.not_in(seen))
+        recommendations += (await db.execute(stmt)).all()
+    return RowsJSONResponse(recommendations, EVENT_OUT_FIELDS)
 
 # --- Endpoints de Eventos ---
-@events_router.get("/recommendations", tags=["AI"], response_model=list[EventOut])
-def get_event_recommendations(event_id: int | None = None, db: Session = Depends(get_db)):
+@events_router.get("/recommendations", tags=["AI"], response_model=list[EventOut], response_class=RowsJSONResponse)
+async def get_event_recommendations(
+    event_id: int | None = None,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Eventos parecidos a `event_id` (por nombre, descripción, categoría y
+    ubicación), del más al menos parecido; sin `event_id`, todos por fecha.
+    Si puede haber más resultados, el header `X-Next-Offset` trae el `offset`
+    de la página siguiente.
+    """
     if event_id:
-        event = db.query(Event).filter(Event.id == event_id).first()
-        if not event:
+        ranked = await run_in_threadpool(event_index.similar, event_id, offset + limit + 1)
+        if ranked is None:
             raise HTTPException(status_code=404, detail="Event not found")
-        recommendations = db.query(Event).filter(Event.category == event.category, Event.id != event_id).all()
+        page = ranked[offset:offset + limit]
+        rows = {row.id: row for row in (await db.execute(select(*EVENT_OUT_COLUMNS).where(Event.id.in_(page)))).all()}
+        recommendations = [rows[id_] for id_ in page if id_ in rows]
+        has_more = len(ranked) > offset + limit
     else:
-        recommendations = db.query(Event).all()
-    return recommendations
+        recommendations = (await db.execute(
+            select(*EVENT_OUT_COLUMNS).order_by(Event.date, Event.id).offset(offset).limit(limit + 1)
+        )).all()
+        has_more = len(recommendations) > limit
+        recommendations = recommendations[:limit]
+    headers = {"X-Next-Offset": str(offset + limit)} if has_more else None
+    return RowsJSONResponse(recommendations, EVENT_OUT_FIELDS, headers=headers)
+
+# --- Exportaciones ---
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+def export_stream(stmt, fields: tuple[str, ...], export_format: ExportFormat):
+    """
+    Genera la exportación por bloques de EXPORT_BATCH_SIZE filas leídas con un
+    cursor del servidor, de modo que la memoria no depende del tamaño de la tabla.
+
+    Abre su propia sesión: la de la request ya está cerrada cuando se envía el cuerpo.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if export_format == ExportFormat.CSV:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(fields)
+            for rows in result.partitions():
+                writer.writerows(
+                    [value.isoformat() if isinstance(value, datetime) else value for value in row]
+                    for row in rows
+                )
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue().encode()  # Solo el encabezado si no hubo filas
+        else:
+            for rows in result.partitions():
+                yield b"".join(dumps(item) + b"\n" for item in rows_to_dicts(fields, rows))
+    finally:
+        db.close()
+
+def export_response(stmt, fields: tuple[str, ...], export_format: ExportFormat, filename: str):
+    media_type = "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    return StreamingResponse(
+        export_stream(stmt, fields, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format.value}"'}
+    )
+
+@events_router.get("/export")
+def export_events(export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"), after_id: int = 0):
+    """
+    Exporta todos los eventos ordenados por id. Para reanudar una exportación
+    cortada, pasar en `after_id` el último id recibido.
+    """
+    stmt = select(*EVENT_OUT_COLUMNS).where(Event.id > after_id).order_by(Event.id)
+    return export_response(stmt, EVENT_OUT_FIELDS, export_format, "events")
 
 @events_router.post("", response_model=EventOut)
-def create_event(event: EventCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_event(event: EventCreate, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != UserRole.ORGANIZADOR:
         raise HTTPException(status_code=403, detail="Only organizers can create events")
-    new_event = Event(**event.model_dump(), owner=current_user)
+    new_event = Event(**event.model_dump(), capacity=event.total_tickets, owner_id=current_user.id)
     db.add(new_event)
-    db.commit()
-    db.refresh(new_event)
+    await db.flush()
+    mark_event_changed(db, new_event.id, details=True)
+    await db.commit()
+    await db.refresh(new_event)
     return new_event
 
+EVENTS_PAGE_SIZE = 100
+EVENTS_MAX_PAGE_SIZE = 500
+
+def encode_cursor(sort: EventSort, value, event_id: int) -> str:
+    payload = {"s": sort.value, "v": value.isoformat() if isinstance(value, datetime) else value, "id": event_id}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: EventSort):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if payload["s"] != sort.value:
+            raise ValueError("sort mismatch")
+        value = payload["v"]
+        if sort in (EventSort.DATE, EventSort.DATE_DESC):
+            value = datetime.fromisoformat(value)
+        else:
+            value = float(value)
+        return value, int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @events_router.get("", response_model=list[EventOut])
-def get_all_events(db: Session = Depends(get_db)):
-    events = db.query(Event).all()
-    return events
+async def get_all_events(
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(EVENTS_PAGE_SIZE, ge=1, le=EVENTS_MAX_PAGE_SIZE),
+    sort: EventSort = EventSort.DATE,
+    category: str | None = None,
+    location: str | None = None,
+    date_from: datetime | None = None,
+    date_to: datetime | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Lista eventos paginados por cursor sobre (columna de orden, id).
+
+    El cursor de la página siguiente va en el header `X-Next-Cursor` (y en `Link`);
+    si no está, no hay más resultados.
+    """
+    async def build():
+        events, headers = await list_events(request, cursor, limit, sort, category, location,
+                                            date_from, date_to, min_price, max_price, db)
+        return rows_to_dicts(EVENT_OUT_FIELDS, events), headers
+
+    # La misma consulta con los parámetros en otro orden comparte la entrada
+    key = "events?" + "&".join(sorted(str(request.query_params).split("&")))
+    entry = await response_cache.aget_or_build(("events",), key, build, refresh=must_refresh(db))
+    return ResponseCache.respond(request, entry)
+
+async def list_events(request, cursor, limit, sort, category, location, date_from, date_to, min_price, max_price, db):
+    query = select(*EVENT_OUT_COLUMNS)
+    if category is not None:
+        query = query.where(Event.category == category)
+    if location is not None:
+        query = query.where(Event.location == location)
+    if date_from is not None:
+        query = query.where(Event.date >= date_from)
+    if date_to is not None:
+        query = query.where(Event.date <= date_to)
+    if min_price is not None:
+        query = query.where(Event.price >= min_price)
+    if max_price is not None:
+        query = query.where(Event.price <= max_price)
+
+    column = Event.date if sort in (EventSort.DATE, EventSort.DATE_DESC) else Event.price
+    descending = sort in (EventSort.DATE_DESC, EventSort.PRICE_DESC)
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort)
+        key = tuple_(column, Event.id)
+        query = query.where(key < (value, last_id) if descending else key > (value, last_id))
+    if descending:
+        query = query.order_by(column.desc(), Event.id.desc())
+    else:
+        query = query.order_by(column, Event.id)
+
+    # Pedir una fila de más para saber si hay otra página
+    events = (await db.execute(query.limit(limit + 1))).all()
+    headers = {}
+    if len(events) > limit:
+        events = events[:limit]
+        last = events[-1]
+        next_cursor = encode_cursor(sort, getattr(last, column.key), last.id)
+        headers["X-Next-Cursor"] = next_cursor
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return events, headers
 
 @events_router.get("/{event_id}", response_model=EventOut)
-def get_event_by_id(event_id: int, db: Session = Depends(get_db)):
-    event = db.query(Event).filter(Event.id == event_id).first()
-    if not event:
-        raise HTTPException(status_code=404, detail="Event not found")
-    return event
+async def get_event_by_id(event_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def build():
+        event = (await db.execute(select(*EVENT_OUT_COLUMNS).where(Event.id == event_id))).first()
+        if not event:
+            raise HTTPException(status_code=404, detail="Event not found")
+        return dict(zip(EVENT_OUT_FIELDS, event)), None
+
+    entry = await response_cache.aget_or_build((f"event:{event_id}",), f"event:{event_id}", build, refresh=must_refresh(db))
+    return ResponseCache.respond(request, entry)
 
 @events_router.put("/{event_id}", response_model=EventOut)
-def update_event(
+async def update_event(
     event_id: int, 
     event_update: EventUpdate, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), 
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    update_data = event_update.model_dump(exclude_unset=True)
+    event = await db.get(Event, event_id)
 
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -296,42 +994,53 @@ def update_event(
     if event.owner_id != current_user.id or current_user.role != UserRole.ORGANIZADOR:
         raise HTTPException(status_code=403, detail="Not authorized to update this event")
 
-    update_data = event_update.model_dump(exclude_unset=True)
+    if "total_tickets" in update_data:
+        # El inventario en memoria se vuelve a cargar desde la fila actualizada
+        await run_in_threadpool(inventory_tier.flush)
+        inventory_tier.evict(event_id)
+        await db.refresh(event)
+
+    if "total_tickets" in update_data and event.capacity is not None:
+        event.capacity += update_data["total_tickets"] - event.total_tickets
     for key, value in update_data.items():
         setattr(event, key, value)
-    
-    db.commit()
-    db.refresh(event)
+    mark_event_changed(db, event_id, details=True)
+    await db.commit()
+    await db.refresh(event)
     return event
 
 @events_router.post("/{event_id}/simulate-withdrawal")
-def simulate_withdraw_funds(
+async def simulate_withdraw_funds(
     event_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(Event, event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     if event.owner_id != current_user.id or current_user.role != UserRole.ORGANIZADOR:
         raise HTTPException(status_code=403, detail="Not authorized to withdraw funds for this event")
+    # La recaudación pendiente en memoria debe estar en la fila
+    await run_in_threadpool(inventory_tier.flush)
+    await db.refresh(event)
     if event.is_funds_withdrawn:
         raise HTTPException(status_code=400, detail="Funds already withdrawn for this event")
 
     # Simulate fund withdrawal
     event.is_funds_withdrawn = True
-    db.commit()
+    mark_event_changed(db, event_id)
+    await db.commit()
     
     return {"message": f"Funds for event '{event.name}' marked as withdrawn (simulated).", "amount": event.total_revenue}
 
 
 @events_router.delete("/{event_id}")
-def delete_event(
+async def delete_event(
     event_id: int, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db), 
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    event = db.query(Event).filter(Event.id == event_id).first()
+    event = await db.get(Event, event_id)
 
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
@@ -339,17 +1048,375 @@ def delete_event(
     if event.owner_id != current_user.id or current_user.role != UserRole.ORGANIZADOR:
         raise HTTPException(status_code=403, detail="Not authorized to delete this event")
 
-    db.delete(event)
-    db.commit()
+    await db.delete(event)
+    mark_event_changed(db, event_id, details=True)
+    await db.commit()
+    inventory_tier.evict(event_id)
     return {"detail": "Event deleted successfully"}
 
-@events_router.post("/{event_id}/purchase", tags=["Blockchain"])
+# --- Reservas de inventario ---
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "300"))
+
+class InventoryTier:
+    """
+    Inventario opcional en memoria (o Redis) para eventos con mucha demanda.
+
+    Las compras descuentan tickets y suman recaudación en el `store` sin tocar
+    la fila de `events`; un hilo escribe los acumulados en la base cada
+    `flush_interval` segundos. Al cargar un evento (o tras perder el store) los
+    disponibles se reconcilian con `tickets` y las compras pendientes.
+    """
+
+    def __init__(self, session_factory, store=None, flush_interval: float = 1.0):
+        self.session_factory = session_factory
+        self.store = store
+        self.flush_interval = flush_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None
+
+    def reserve(self, db: Session, event_id: int) -> bool:
+        reserved = self.store.reserve(event_id)
+        if reserved is None:
+            self.load(db, event_id)
+            reserved = self.store.reserve(event_id)
+        return bool(reserved)
+
+    def release(self, db: Session, event_id: int):
+        # Si este hilo carga el evento, la reconciliación ya no cuenta la compra cerrada
+        if not self.store.release(event_id) and not self.load(db, event_id):
+            self.store.release(event_id)
+
+    def add_revenue(self, db: Session, event_id: int, amount: float):
+        # Si este hilo carga el evento, la reconciliación ya incluye el ticket registrado
+        if not self.store.add_revenue(event_id, amount) and not self.load(db, event_id):
+            self.store.add_revenue(event_id, amount)
+
+    def load(self, db: Session, event_id: int) -> bool:
+        """Carga el evento reconciliado; False si no existe o ya lo cargó otro hilo."""
+        reconciled = self.reconcile(db, event_id)
+        if reconciled is None:
+            return False
+        available, revenue = reconciled
+        if not self.store.load(event_id, available):
+            return False
+        # Corregir la fila por si se perdieron acumulados sin escribir
+        mark_event_changed(db, event_id)
+        db.execute(
+            update(Event)
+            .where(Event.id == event_id)
+            .values(total_tickets=available, total_revenue=revenue)
+            .execution_options(synchronize_session=False)
+        )
+        return True
+
+    def reconcile(self, db: Session, event_id: int) -> tuple[int, float] | None:
+        """Disponibles y recaudación calculados desde `tickets` y las compras pendientes."""
+        event = db.query(
+            Event.capacity, Event.total_tickets, Event.total_revenue, Event.price
+        ).filter(Event.id == event_id).first()
+        if event is None:
+            return None
+        if event.capacity is None:
+            # Eventos sin capacidad registrada: confiar en la fila
+            return event.total_tickets, event.total_revenue or 0.0
+        tickets = db.query(func.count(Ticket.id)).filter(Ticket.event_id == event_id).scalar()
+        paid = db.query(func.count(Ticket.id)).filter(Ticket.event_id == event_id, Ticket.is_paid.is_(True)).scalar()
+        pending = db.query(func.count(Purchase.id)).filter(
+            Purchase.event_id == event_id, Purchase.status == PurchaseStatus.PENDING
+        ).scalar()
+        return max(event.capacity - tickets - pending, 0), paid * event.price
+
+    def flush(self) -> int:
+        """Escribe en `events` los acumulados pendientes y devuelve cuántos eventos se actualizaron."""
+        if not self.enabled:
+            return 0
+        deltas = self.store.drain()
+        if not deltas:
+            return 0
+        db = self.session_factory()
+        try:
+            # Orden fijo para no provocar deadlocks entre procesos
+            for event_id, (sold, revenue) in sorted(deltas.items()):
+                mark_event_changed(db, event_id)
+                db.execute(
+                    update(Event)
+                    .where(Event.id == event_id)
+                    .values(
+                        total_tickets=Event.total_tickets - sold,
+                        total_revenue=func.coalesce(Event.total_revenue, 0) + revenue
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+        except Exception:
+            db.rollback()
+            for event_id, (sold, revenue) in deltas.items():
+                self.store.restore(event_id, sold, revenue)
+            raise
+        finally:
+            db.close()
+        return len(deltas)
+
+    def evict(self, event_id: int):
+        if self.enabled:
+            self.store.evict(event_id)
+
+    def start(self):
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="inventory-flusher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                pass  # Los acumulados se restauraron; reintentar en la siguiente vuelta
+
+inventory_tier = InventoryTier(
+    SessionLocal,
+    create_inventory_store(os.getenv("HOT_INVENTORY")),
+    flush_interval=float(os.getenv("HOT_INVENTORY_FLUSH_INTERVAL", "1"))
+)
+
+def reserve_ticket(db: Session, event_id: int, user_id: int, wallet_address: str) -> Purchase | None:
+    """
+    Descuenta un ticket con un único UPDATE condicional y crea la compra pendiente.
+
+    Devuelve None si el evento ya no tiene tickets. No hace commit.
+    """
+    if inventory_tier.enabled:
+        if not inventory_tier.reserve(db, event_id):
+            return None
+    else:
+        reserved = db.execute(
+            update(Event)
+            .where(Event.id == event_id, Event.total_tickets > 0)
+            .values(total_tickets=Event.total_tickets - 1)
+            .returning(Event.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if reserved is None:
+            return None
+    mark_event_changed(db, event_id)
+    purchase = Purchase(
+        event_id=event_id,
+        user_id=user_id,
+        wallet_address=wallet_address,
+        status=PurchaseStatus.PENDING,
+        expires_at=datetime.utcnow() + timedelta(seconds=RESERVATION_TTL_SECONDS)
+    )
+    db.add(purchase)
+    db.flush()
+    return purchase
+
+def release_reservation(db: Session, purchase_id: int, error: str, status: PurchaseStatus = PurchaseStatus.FAILED) -> bool:
+    """Cierra una compra pendiente y devuelve su ticket al inventario. No hace commit."""
+    released = db.execute(
+        update(Purchase)
+        .where(Purchase.id == purchase_id, Purchase.status == PurchaseStatus.PENDING)
+        .values(status=status, error=error, updated_at=datetime.utcnow())
+        .returning(Purchase.event_id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if released is None:
+        return False  # Ya se cerró en otro hilo
+    mark_event_changed(db, released.event_id)
+    if inventory_tier.enabled:
+        inventory_tier.release(db, released.event_id)
+        return True
+    db.execute(
+        update(Event)
+        .where(Event.id == released.event_id)
+        .values(total_tickets=Event.total_tickets + 1)
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+def mark_transaction_sent(db: Session, purchase_ids: list[int], tx_hash: str, error: str):
+    """
+    Guarda el hash de una transacción enviada cuyo resultado aún no se conoce.
+    La reserva deja de vencer: se confirma o se libera cuando el mint worker
+    concilia el recibo (ver `MintWorker.reconcile_sent`). No hace commit.
+    """
+    db.execute(
+        update(Purchase)
+        .where(Purchase.id.in_(purchase_ids), Purchase.status.in_((PurchaseStatus.PENDING, PurchaseStatus.EXPIRED)))
+        .values(transaction_hash=tx_hash, error=error, expires_at=None, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def confirm_reservation(db: Session, purchase_id: int, tx_hash: str, ticket_id: int) -> Ticket:
+    """Marca la compra como minteada, suma la recaudación y registra el ticket. No hace commit."""
+    purchase = db.query(Purchase).filter(Purchase.id == purchase_id).with_for_update().first()
+    if purchase.status != PurchaseStatus.PENDING:
+        # La reserva venció durante el minteo pero el ticket ya existe on-chain:
+        # se vuelve a descontar si aún queda inventario.
+        if inventory_tier.enabled:
+            reclaimed = inventory_tier.reserve(db, purchase.event_id)
+        else:
+            reclaimed = db.execute(
+                update(Event)
+                .where(Event.id == purchase.event_id, Event.total_tickets > 0)
+                .values(total_tickets=Event.total_tickets - 1)
+                .returning(Event.id)
+                .execution_options(synchronize_session=False)
+            ).first()
+        purchase.error = None if reclaimed else "Minted after the reservation expired; event is oversold"
+
+    ticket = Ticket(
+        ticket_id_onchain=ticket_id,
+        event_id=purchase.event_id,
+        owner_wallet_address=purchase.wallet_address,
+        is_paid=True, # Simulate payment
+        purchase_date=datetime.utcnow()
+    )
+    db.add(ticket)
+    purchase.status = PurchaseStatus.MINTED
+    purchase.ticket_id_onchain = ticket_id
+    purchase.transaction_hash = tx_hash
+    purchase.expires_at = None
+    mark_event_changed(db, purchase.event_id)
+
+    if inventory_tier.enabled:
+        # Con la compra ya registrada, una reconciliación incluye este ticket
+        db.flush()
+        price = db.query(Event.price).filter(Event.id == purchase.event_id).scalar()
+        inventory_tier.add_revenue(db, purchase.event_id, price)
+    else:
+        db.execute(
+            update(Event)
+            .where(Event.id == purchase.event_id)
+            .values(total_revenue=func.coalesce(Event.total_revenue, 0) + Event.price)
+            .execution_options(synchronize_session=False)
+        )
+    return ticket
+
+def expire_reservations(db: Session, purchase_ids: list[int] | None = None) -> int:
+    """Libera las reservas pendientes vencidas y devuelve cuántas se liberaron. No hace commit."""
+    query = db.query(Purchase.id).filter(
+        Purchase.status == PurchaseStatus.PENDING,
+        Purchase.expires_at < datetime.utcnow()
+    )
+    if purchase_ids is not None:
+        query = query.filter(Purchase.id.in_(purchase_ids))
+    return sum(
+        release_reservation(db, purchase_id, "Reservation expired", PurchaseStatus.EXPIRED)
+        for purchase_id, in query.all()
+    )
+
+# --- Idempotency-Key ---
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+
+def request_fingerprint(*parts) -> str:
+    return hashlib.sha256("|".join(str(part) for part in parts).encode()).hexdigest()
+
+def claim_idempotency_key(db: Session, user_id: int, key: str, fingerprint: str) -> IdempotencyKey | None:
+    """
+    Reserva la clave para esta petición. Devuelve None si la reservó, o la fila
+    existente si otra petición con la misma clave llegó antes. Hace commit.
+    """
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        IdempotencyKey.created_at < datetime.utcnow() - timedelta(hours=IDEMPOTENCY_KEY_TTL_HOURS)
+    ).delete(synchronize_session=False)
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    claimed = db.execute(
+        dialect.insert(IdempotencyKey)
+        .values(user_id=user_id, key=key, fingerprint=fingerprint, created_at=datetime.utcnow())
+        .on_conflict_do_nothing()
+        .returning(IdempotencyKey.id)
+    ).first()
+    db.commit()
+    if claimed is not None:
+        return None
+    return db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).first()
+
+def complete_idempotency_key(db: Session, user_id: int, key: str, status_code: int, body):
+    db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).update(
+        {"response_status": status_code, "response_body": json.dumps(jsonable_encoder(body))},
+        synchronize_session=False
+    )
+    db.commit()
+
+def release_idempotency_key(db: Session, user_id: int, key: str):
+    # La compra no llegó a completarse: un reintento con la misma clave vuelve a intentarlo
+    db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).delete(synchronize_session=False)
+    db.commit()
+
+def replay_idempotent_response(stored: IdempotencyKey, fingerprint: str):
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key already used for a different request")
+    if stored.response_status is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress",
+                            headers={"Retry-After": "1"})
+    return JSONResponse(
+        content=json.loads(stored.response_body),
+        status_code=stored.response_status,
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+@events_router.post("/{event_id}/purchase", tags=["Blockchain"], dependencies=[Depends(rate_limit("purchase"))])
 def purchase_ticket(
     event_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    response: Response,
+    mode: PurchaseMode = PurchaseMode.SYNC,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    db: Session = Depends(get_sync_db),
+    current_user: CurrentUser = Depends(get_current_user),
     contract_address: str = Depends(lambda: get_contract_address()),
-    w3: Web3 = Depends(lambda: get_w3())
+    w3 = Depends(lambda: get_w3())
+):
+    if idempotency_key is None:
+        return process_purchase(event_id, response, mode, db, current_user, contract_address, w3)
+
+    user_id = current_user.id
+    fingerprint = request_fingerprint("POST", f"/events/{event_id}/purchase", mode.value)
+    stored = claim_idempotency_key(db, user_id, idempotency_key, fingerprint)
+    if stored is not None:
+        return replay_idempotent_response(stored, fingerprint)
+
+    try:
+        result = process_purchase(event_id, response, mode, db, current_user, contract_address, w3)
+    except HTTPException as e:
+        db.rollback()
+        if e.status_code >= 500:
+            release_idempotency_key(db, user_id, idempotency_key)
+        else:
+            complete_idempotency_key(db, user_id, idempotency_key, e.status_code, {"detail": e.detail})
+        raise
+    except Exception:
+        db.rollback()
+        release_idempotency_key(db, user_id, idempotency_key)
+        raise
+    complete_idempotency_key(db, user_id, idempotency_key, response.status_code or 200, result)
+    return result
+
+def process_purchase(
+    event_id: int,
+    response: Response,
+    mode: PurchaseMode,
+    db: Session,
+    current_user: CurrentUser,
+    contract_address: str,
+    w3: "Web3"
 ):
     if current_user.role != UserRole.COMPRADOR:
         raise HTTPException(status_code=403, detail="Only buyers can purchase tickets")
@@ -358,128 +1425,823 @@ def purchase_ticket(
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
-    if event.total_tickets <= 0:
-        raise HTTPException(status_code=400, detail="No tickets left for this event")
-
     if not current_user.wallet_address:
         raise HTTPException(status_code=400, detail="User does not have a wallet address registered.")
 
-    contract = w3.eth.contract(address=contract_address, abi=abi)
-    nonce = w3.eth.get_transaction_count(ACCOUNT_ADDRESS)
-    
-    # Generar un ID de ticket único
-    token_uri = f"https://api.ticketera.com/metadata/tickets/{event.id}"
-
-    mint_function = contract.functions.safeMint(current_user.wallet_address, token_uri)
-    
-    tx_data = mint_function.build_transaction({
-        'from': ACCOUNT_ADDRESS,
-        'chainId': 80002,
-        'gas': 500000,  # Usar un valor de gas fijo y suficientemente alto
-        'gasPrice': w3.to_wei(30, 'gwei'),
-        'nonce': nonce,
-    })
-
-    signed_tx = w3.eth.account.sign_transaction(tx_data, private_key=PRIVATE_KEY)
-    tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-
-    event.total_tickets -= 1
-    # Simulate payment by tracking revenue
-    event.total_revenue += event.price
+    price = event.price
+    wallet_address = current_user.wallet_address
+    purchase = reserve_ticket(db, event.id, current_user.id, wallet_address)
+    if purchase is None:
+        raise HTTPException(status_code=400, detail="No tickets left for this event")
+    purchase_id = purchase.id
+    # El commit devuelve la conexión al pool antes de hablar con la blockchain
     db.commit()
 
-    transfer_events = contract.events.Transfer.process_receipt(tx_receipt)
-    mint_event = next((e for e in transfer_events if e['args']['from'] == "0x0000000000000000000000000000000000000000"), None)
-
-    if not mint_event:
-        raise HTTPException(status_code=500, detail="Minting Transfer event not found in transaction receipt")
+    if mode == PurchaseMode.ASYNC:
+        # Dejar el minteo en manos del mint worker
+        mint_worker.enqueue(purchase_id, w3, contract_address)
+        response.status_code = 202
+        return {"message": "Ticket reserved, minting in progress", "purchase_id": purchase_id, "status": PurchaseStatus.PENDING}
 
-    ticket_id = mint_event['args']['tokenId']
+    try:
+        tx_hash, ticket_id, transfer_events = mint_ticket(w3, contract_address, wallet_address, event_id)
+    except TransactionPending as e:
+        # La transacción pudo minarse: la compra sigue pendiente hasta que el mint worker concilie el recibo
+        mark_transaction_sent(db, [purchase_id], e.tx_hash, str(e))
+        db.commit()
+        response.status_code = 202
+        return {"message": "Transaction sent, confirmation pending", "purchase_id": purchase_id,
+                "status": PurchaseStatus.PENDING, "transaction_hash": e.tx_hash}
+    except Exception as e:
+        # Antes del envío, o revertida: el ticket no existe
+        release_reservation(db, purchase_id, str(e))
+        db.commit()
+        raise HTTPException(status_code=500, detail=str(e))
 
-    # Guardar el ticket en la base de datos with simulated payment
-    new_ticket_db = Ticket(
-        ticket_id_onchain=ticket_id,
-        event_id=event.id,
-        owner_wallet_address=current_user.wallet_address,
-        is_paid=True, # Simulate payment
-        purchase_date=datetime.utcnow()
-    )
-    db.add(new_ticket_db)
+    # Simulate payment by tracking revenue
+    new_ticket_db = confirm_reservation(db, purchase_id, tx_hash, ticket_id)
+    record_transfers(db, transfer_events)
     db.commit()
-    db.refresh(new_ticket_db)
 
     return {
         "message": "Ticket purchased and minted successfully", 
-        "transaction_hash": tx_hash.hex(),
+        "transaction_hash": tx_hash,
         "ticket_id": ticket_id,
-        "paid_amount": event.price,
+        "paid_amount": price,
         "purchase_date": new_ticket_db.purchase_date.isoformat()
     }
 
 # --- Blockchain (Web3) ---
-def get_w3():
-    # Usa la URL del RPC de la testnet desde las variables de entorno, con fallback al nodo local
-    rpc_url = os.getenv("TESTNET_RPC_URL", "http://127.0.0.1:8545")
-    return Web3(Web3.HTTPProvider(rpc_url))
+# Usa la URL del RPC de la testnet desde las variables de entorno, con fallback al nodo local
+RPC_URL = os.getenv("TESTNET_RPC_URL", "http://127.0.0.1:8545")
+WEB3_POOL_SIZE = int(os.getenv("WEB3_POOL_SIZE", "20"))
+WEB3_TIMEOUT = float(os.getenv("WEB3_TIMEOUT", "30"))
+
+# web3, el ABI y la cuenta firmante se crean en el primer uso (ver AppContext)
+app_context = AppContext(RPC_URL, WEB3_POOL_SIZE, WEB3_TIMEOUT, "TicketManager.abi")
 
-with open("TicketManager.abi", "r") as f:
-    abi = json.load(f)
+def get_w3() -> "Web3":
+    return app_context.w3
+
+async def get_async_w3() -> "AsyncWeb3":
+    return await app_context.async_w3()
+
+async def close_async_w3():
+    await app_context.aclose()
 
 def get_contract_address():
-    contract_address = os.environ.get("CONTRACT_ADDRESS")
+    contract_registry = app_context.contract_registry
+    contract_registry.reload_if_changed()
+    contract_address = contract_registry.address
     if not contract_address:
         raise HTTPException(status_code=500, detail="La dirección del contrato no está configurada.")
     return contract_address
 
-PRIVATE_KEY = os.getenv("PRIVATE_KEY")
-if not PRIVATE_KEY:
-    raise ValueError("No PRIVATE_KEY set for the application")
-ACCOUNT_ADDRESS = Web3().eth.account.from_key(PRIVATE_KEY).address
+# Nombres que antes se creaban al importar el módulo
+_LAZY_ATTRIBUTES = {
+    "contract_registry": "contract_registry",
+    "nonce_manager": "nonce_manager",
+    "PRIVATE_KEY": "private_key",
+    "ACCOUNT_ADDRESS": "account_address",
+}
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        return getattr(app_context, _LAZY_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+class MintError(Exception):
+    pass
+
+class TransactionPending(Exception):
+    """
+    La transacción se envió (o pudo enviarse) pero no se sabe si se minó: la
+    compra queda pendiente con su hash y el mint worker la concilia después.
+    """
+
+    def __init__(self, tx_hash: str, message: str):
+        super().__init__(message)
+        self.tx_hash = tx_hash
+
+# Rechazos del nodo por un nonce ya usado (geth/anvil, eth-tester, ganache): la
+# transacción no entró y se puede reintentar
+NONCE_ERRORS = (
+    "nonce too low", "replacement transaction underpriced", "replacement underpriced",
+    "invalid transaction nonce", "correct nonce",
+)
+
+def send_transaction(w3: "Web3", contract_function, gas: int = 500000, retries: int = 1):
+    """
+    Firma y envía una llamada al contrato usando un nonce local.
+
+    Solo reintenta cuando el nodo rechaza el nonce. Cualquier otro error puede
+    llegar después de que el nodo aceptó la transacción (p. ej. un timeout de
+    lectura), así que se informa con TransactionPending y el nonce no se reutiliza.
+    """
+    for attempt in range(retries + 1):
+        nonce = app_context.nonce_manager.allocate(w3)
+        try:
+            tx_data = contract_function.build_transaction({
+                'from': app_context.account_address,
+                'chainId': 80002,
+                'gas': gas,  # Usar un valor de gas fijo y suficientemente alto
+                'gasPrice': w3.to_wei(30, 'gwei'),
+                'nonce': nonce,
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx_data, private_key=app_context.private_key)
+        except Exception:
+            app_context.nonce_manager.release(nonce)
+            raise
+        try:
+            tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            message = str(e).lower()
+            if "already known" in message:
+                # El nodo ya la tenía: cuenta como enviada
+                app_context.nonce_manager.confirm(nonce)
+                return signed_tx.hash
+            if any(error in message for error in NONCE_ERRORS):
+                # El nonce local quedó desfasado (p. ej. transacciones enviadas
+                # desde otro proceso): resincronizar y reintentar.
+                app_context.nonce_manager.release(nonce)
+                app_context.nonce_manager.sync(w3)
+                if attempt < retries:
+                    continue
+                raise
+            # Se da por usado; si el nodo no la tiene, la próxima sincronización recupera el nonce
+            app_context.nonce_manager.confirm(nonce)
+            raise TransactionPending(signed_tx.hash.hex(), f"Transaction may have been sent: {e}") from e
+        app_context.nonce_manager.confirm(nonce)
+        return tx_hash
+
+def wait_for_receipt(w3: "Web3", tx_hash):
+    try:
+        return w3.eth.wait_for_transaction_receipt(tx_hash)
+    except Exception as e:
+        # La transacción pudo descartarse: recuperar el hueco de nonce
+        try:
+            app_context.nonce_manager.sync(w3)
+        except Exception:
+            pass
+        raise TransactionPending(tx_hash.hex(), f"Transaction sent, receipt not available yet: {e}") from e
+
+def get_token_uri(event_id: int):
+    return f"https://api.ticketera.com/metadata/tickets/{event_id}"
+
+def mint_ticket(w3: "Web3", contract_address: str, wallet_address: str, event_id: int):
+    """Mintea un ticket NFT y devuelve (transaction_hash, ticket_id, eventos Transfer)."""
+    ticket_manager = app_context.contract_registry.get(w3, contract_address)
+
+    mint_function = ticket_manager.safe_mint(wallet_address, get_token_uri(event_id))
+    tx_hash = send_transaction(w3, mint_function)
+    tx_receipt = wait_for_receipt(w3, tx_hash)
+
+    if tx_receipt['status'] != 1:
+        raise MintError("Mint transaction reverted")
+
+    transfer_events = ticket_manager.transfer.process_receipt(tx_receipt)
+    mint_event = next((e for e in transfer_events if e['args']['from'] == ZERO_ADDRESS), None)
+
+    if not mint_event:
+        raise MintError("Minting Transfer event not found in transaction receipt")
+
+    return tx_hash.hex(), mint_event['args']['tokenId'], transfer_events
+
+# Primeros 4 bytes de keccak("safeMintBatch(address[],string[])")
+BATCH_MINT_SELECTOR = bytes.fromhex("133898f3")
+_batch_mint_support = {}
+
+def supports_batch_mint(w3: "Web3", contract_address: str):
+    # Los contratos desplegados antes de safeMintBatch no incluyen su selector
+    if contract_address not in _batch_mint_support:
+        _batch_mint_support[contract_address] = BATCH_MINT_SELECTOR in bytes(w3.eth.get_code(contract_address))
+    return _batch_mint_support[contract_address]
+
+def mint_tickets_batch(w3: "Web3", contract_address: str, items: list[tuple[str, int]]):
+    """
+    Mintea varios tickets en una sola transacción con safeMintBatch.
+    `items` es una lista de (wallet_address, event_id); devuelve
+    (transaction_hash, [ticket_id, ...], eventos Transfer) en el mismo orden.
+    """
+    ticket_manager = app_context.contract_registry.get(w3, contract_address)
+
+    mint_function = ticket_manager.safe_mint_batch(
+        [wallet_address for wallet_address, _ in items],
+        [get_token_uri(event_id) for _, event_id in items]
+    )
+    tx_hash = send_transaction(w3, mint_function, gas=100000 + 200000 * len(items))
+    tx_receipt = wait_for_receipt(w3, tx_hash)
+
+    if tx_receipt['status'] != 1:
+        raise MintError("Batch mint transaction reverted")
+
+    # El contrato emite un Transfer por ticket en el orden de entrada
+    transfer_events = ticket_manager.transfer.process_receipt(tx_receipt)
+    mint_events = [e for e in transfer_events if e['args']['from'] == ZERO_ADDRESS]
+
+    # Los tickets ya existen on-chain: no se liberan, quedan pendientes para revisarlos
+    if len(mint_events) != len(items):
+        raise TransactionPending(tx_hash.hex(), "Batch mint Transfer events do not match the requested tickets")
+
+    for (wallet_address, _), mint_event in zip(items, mint_events):
+        if mint_event['args']['to'].lower() != wallet_address.lower():
+            raise TransactionPending(tx_hash.hex(), "Batch mint Transfer event does not match the purchase wallet")
+
+    return tx_hash.hex(), [e['args']['tokenId'] for e in mint_events], mint_events
+
+class MintWorker:
+    """
+    Procesa en segundo plano las compras reservadas en modo asíncrono.
+
+    Cada hilo agrupa las compras que llegan dentro de `batch_window` segundos
+    (hasta `batch_size`) y las mintea con una sola transacción safeMintBatch.
+    """
+
+    def __init__(self, session_factory, concurrency: int = 1, batch_size: int = 1, batch_window: float = 0.0,
+                 sweep_interval: float = 30.0, drop_after: float = 600.0):
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.sweep_interval = sweep_interval
+        # Segundos sin recibo ni rastro en el nodo para dar una transacción por descartada
+        self.drop_after = drop_after
+        self.queue = queue.Queue()
+        self._threads = []
+
+    def enqueue(self, purchase_id: int, w3: "Web3", contract_address: str):
+        self.queue.put((purchase_id, w3, contract_address))
+
+    def start(self):
+        # Con nonces locales varios hilos pueden enviar minteos en paralelo
+        if self._threads:
+            return
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, name=f"mint-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def run_pending(self):
+        # Procesa la cola en el hilo actual (útil en pruebas y scripts)
+        jobs = []
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                jobs.append(job)
+        for i in range(0, len(jobs), self.batch_size):
+            self.process_batch(jobs[i:i + self.batch_size])
+
+    def _run(self):
+        while True:
+            try:
+                job = self.queue.get(timeout=self.sweep_interval)
+            except queue.Empty:
+                # Sin trabajo: aprovechar para liberar reservas vencidas y conciliar envíos
+                self.expire_reservations()
+                self.reconcile_sent()
+                continue
+            if job is None:
+                return
+            jobs, stopping = self._collect_batch(job)
+            try:
+                self.process_batch(jobs)
+            except Exception:
+                pass
+            if stopping:
+                return
+
+    def _collect_batch(self, first_job):
+        jobs = [first_job]
+        deadline = time.monotonic() + self.batch_window
+        while len(jobs) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return jobs, True
+            jobs.append(job)
+        return jobs, False
+
+    def process_batch(self, jobs):
+        # Agrupar por contrato; cada grupo se mintea en una transacción
+        groups = {}
+        for purchase_id, w3, contract_address in jobs:
+            groups.setdefault(contract_address, (w3, []))[1].append(purchase_id)
+
+        for contract_address, (w3, purchase_ids) in groups.items():
+            if len(purchase_ids) == 1 or not supports_batch_mint(w3, contract_address):
+                for purchase_id in purchase_ids:
+                    self.process(purchase_id, w3, contract_address)
+            else:
+                self._mint_batch(purchase_ids, w3, contract_address)
+
+    def process(self, purchase_id: int, w3: "Web3", contract_address: str):
+        db = self.session_factory()
+        try:
+            pending = self._load_pending(db, [purchase_id])
+            if not pending:
+                return
+            _, wallet_address, event_id = pending[0]
+            try:
+                tx_hash, ticket_id, transfer_events = mint_ticket(w3, contract_address, wallet_address, event_id)
+            except TransactionPending as e:
+                mark_transaction_sent(db, [purchase_id], e.tx_hash, str(e))
+            except Exception as e:
+                # Antes del envío, o revertida: el ticket no existe
+                self._mark_failed(db, purchase_id, str(e))
+            else:
+                self._mark_minted(db, purchase_id, tx_hash, ticket_id)
+                record_transfers(db, transfer_events)
+            db.commit()
+        finally:
+            db.close()
+
+    def _mint_batch(self, purchase_ids: list[int], w3: "Web3", contract_address: str):
+        db = self.session_factory()
+        try:
+            pending = self._load_pending(db, purchase_ids)
+            if not pending:
+                return
+            items = [(wallet_address, event_id) for _, wallet_address, event_id in pending]
+            try:
+                tx_hash, ticket_ids, transfer_events = mint_tickets_batch(w3, contract_address, items)
+            except TransactionPending as e:
+                mark_transaction_sent(db, [purchase_id for purchase_id, _, _ in pending], e.tx_hash, str(e))
+            except MintError:
+                # Un solo ticket revierte el lote entero (p. ej. una wallet contrato que
+                # rechaza onERC721Received): se mintean de a uno para aislarlo
+                db.commit()
+                for purchase_id, _, _ in pending:
+                    self.process(purchase_id, w3, contract_address)
+                return
+            except Exception as e:
+                for purchase_id, _, _ in pending:
+                    self._mark_failed(db, purchase_id, str(e))
+            else:
+                for (purchase_id, _, _), ticket_id in zip(pending, ticket_ids):
+                    self._mark_minted(db, purchase_id, tx_hash, ticket_id)
+                record_transfers(db, transfer_events)
+            db.commit()
+        finally:
+            db.close()
+
+    def expire_reservations(self) -> int:
+        db = self.session_factory()
+        try:
+            expired = expire_reservations(db)
+            db.commit()
+            return expired
+        except Exception:
+            db.rollback()
+            return 0
+        finally:
+            db.close()
+
+    def reconcile_sent(self, w3: "Web3 | None" = None) -> int:
+        """Cierra las compras cuya transacción se envió sin conocer el resultado; devuelve cuántas se cerraron."""
+        db = self.session_factory()
+        closed = 0
+        try:
+            tx_hashes = [tx_hash for tx_hash, in db.query(Purchase.transaction_hash).filter(
+                Purchase.transaction_hash.isnot(None),
+                Purchase.status.in_((PurchaseStatus.PENDING, PurchaseStatus.EXPIRED))
+            ).distinct().all()]
+            db.commit()
+            if not tx_hashes:
+                return 0
+            w3 = w3 or get_w3()
+            retry = []
+            for tx_hash in tx_hashes:
+                try:
+                    closed += self._reconcile(db, w3, tx_hash, retry)
+                    db.commit()
+                except Exception:
+                    db.rollback()  # Se reintenta en el próximo barrido
+                    retry.clear()
+                    continue
+                for purchase_id, contract_address in retry:
+                    self.process(purchase_id, w3, contract_address)
+                retry.clear()
+            return closed
+        except Exception:
+            db.rollback()
+            return closed
+        finally:
+            db.close()
+
+    def _reconcile(self, db: Session, w3: "Web3", tx_hash: str, retry: list) -> int:
+        from web3.exceptions import TransactionNotFound
+
+        purchases = db.query(Purchase).filter(
+            Purchase.transaction_hash == tx_hash,
+            Purchase.status.in_((PurchaseStatus.PENDING, PurchaseStatus.EXPIRED))
+        ).order_by(Purchase.id).all()
+        transaction = bytes.fromhex(tx_hash.removeprefix("0x"))
+        try:
+            receipt = w3.eth.get_transaction_receipt(transaction)
+        except TransactionNotFound:
+            try:
+                w3.eth.get_transaction(transaction)
+                return 0  # Sigue en el mempool
+            except TransactionNotFound:
+                pass
+            if any(purchase.updated_at > datetime.utcnow() - timedelta(seconds=self.drop_after) for purchase in purchases):
+                return 0
+            error = f"Transaction {tx_hash} was dropped"
+        else:
+            if receipt['status'] != 1 and len(purchases) > 1:
+                # Lote revertido: las reservas vigentes se mintean de a uno, como en _mint_batch
+                for purchase in purchases:
+                    purchase.transaction_hash = None
+                    if purchase.status == PurchaseStatus.PENDING:
+                        purchase.error = None
+                        retry.append((purchase.id, receipt['to']))
+                    else:
+                        purchase.error = f"Transaction {tx_hash} reverted"
+                return 0
+            if receipt['status'] != 1:
+                error = f"Transaction {tx_hash} reverted"
+            else:
+                transfer_events = app_context.contract_registry.get(w3, receipt['to']).transfer.process_receipt(receipt)
+                mint_events = [e for e in transfer_events if e['args']['from'] == ZERO_ADDRESS]
+                if len(mint_events) != len(purchases) or any(
+                    e['args']['to'].lower() != purchase.wallet_address.lower() for e, purchase in zip(mint_events, purchases)
+                ):
+                    return 0  # No se puede asignar cada ticket a su compra: queda para revisión manual
+                for purchase, mint_event in zip(purchases, mint_events):
+                    confirm_reservation(db, purchase.id, tx_hash, mint_event['args']['tokenId'])
+                record_transfers(db, transfer_events)
+                return len(purchases)
+
+        # El ticket no llegó a existir: la reserva se libera
+        for purchase in purchases:
+            release_reservation(db, purchase.id, error)
+            purchase.transaction_hash = None
+            purchase.error = error
+        return len(purchases)
+
+    def _load_pending(self, db: Session, purchase_ids: list[int]):
+        # Las reservas que vencieron en la cola no se mintean
+        expire_reservations(db, purchase_ids)
+        pending = db.query(Purchase.id, Purchase.wallet_address, Purchase.event_id).filter(
+            Purchase.id.in_(purchase_ids),
+            Purchase.status == PurchaseStatus.PENDING,
+            Purchase.transaction_hash.is_(None)  # Ya enviada: la resuelve reconcile_sent
+        ).order_by(Purchase.id).all()
+        db.commit()  # No retener la conexión mientras se espera el recibo
+        return pending
+
+    def _mark_failed(self, db: Session, purchase_id: int, error: str):
+        release_reservation(db, purchase_id, error)
+
+    def _mark_minted(self, db: Session, purchase_id: int, tx_hash: str, ticket_id: int):
+        confirm_reservation(db, purchase_id, tx_hash, ticket_id)
+
+mint_worker = MintWorker(
+    SessionLocal,
+    concurrency=int(os.getenv("MINT_WORKER_THREADS", "4")),
+    batch_size=int(os.getenv("MINT_BATCH_SIZE", "20")),
+    batch_window=float(os.getenv("MINT_BATCH_WINDOW_MS", "200")) / 1000
+)
+
+def insert_ignore_duplicates(db: Session, model, rows: list[dict]):
+    # INSERT ... ON CONFLICT DO NOTHING en PostgreSQL y SQLite
+    if not rows:
+        return
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    db.execute(dialect.insert(model).values(rows).on_conflict_do_nothing())
+
+def record_transfers(db: Session, transfer_events):
+    """Guarda eventos Transfer decodificados; los ya registrados se ignoran."""
+    update_owners(db, transfer_events)
+    insert_ignore_duplicates(db, TicketTransfer, [
+        {
+            "ticket_id_onchain": e['args']['tokenId'],
+            "from_address": e['args']['from'],
+            "to_address": e['args']['to'],
+            "block_number": e['blockNumber'],
+            "block_hash": e['blockHash'].hex(),
+            "transaction_hash": e['transactionHash'].hex(),
+            "log_index": e['logIndex'],
+        }
+        for e in transfer_events
+    ])
+
+def update_owners(db: Session, transfer_events):
+    """Actualiza `ticket_owners` solo si el Transfer es posterior al ya registrado."""
+    latest = {}
+    for e in transfer_events:
+        position = (e['blockNumber'], e['logIndex'])
+        token_id = e['args']['tokenId']
+        if token_id not in latest or position > latest[token_id][0]:
+            latest[token_id] = (position, e['args']['to'])
+    if not latest:
+        return
+
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    stmt = dialect.insert(TicketOwner).values([
+        {"ticket_id_onchain": token_id, "owner_address": owner,
+         "block_number": block_number, "log_index": log_index}
+        for token_id, ((block_number, log_index), owner) in latest.items()
+    ])
+    # Comparación (bloque, log) para que eventos viejos o repetidos no retrocedan al dueño
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TicketOwner.ticket_id_onchain],
+        set_={
+            "owner_address": stmt.excluded.owner_address,
+            "block_number": stmt.excluded.block_number,
+            "log_index": stmt.excluded.log_index,
+        },
+        where=(TicketOwner.block_number < stmt.excluded.block_number) | (
+            (TicketOwner.block_number == stmt.excluded.block_number)
+            & (TicketOwner.log_index < stmt.excluded.log_index)
+        )
+    )
+    db.execute(stmt)
+
+def rebuild_owners(db: Session, ticket_ids):
+    """Recalcula el dueño de los tickets indicados a partir de `ticket_transfers`."""
+    ticket_ids = list(ticket_ids)
+    if not ticket_ids:
+        return
+    db.query(TicketOwner).filter(TicketOwner.ticket_id_onchain.in_(ticket_ids)).delete(synchronize_session=False)
+    latest = {}
+    transfers = db.query(TicketTransfer).filter(
+        TicketTransfer.ticket_id_onchain.in_(ticket_ids)
+    ).order_by(TicketTransfer.block_number, TicketTransfer.log_index)
+    for transfer in transfers:
+        latest[transfer.ticket_id_onchain] = transfer
+    db.add_all([
+        TicketOwner(ticket_id_onchain=t.ticket_id_onchain, owner_address=t.to_address,
+                    block_number=t.block_number, log_index=t.log_index)
+        for t in latest.values()
+    ])
+
+async def indexed_block(db: AsyncSession, contract_address: str | None) -> int | None:
+    """Último bloque que el indexador procesó para el contrato."""
+    if not contract_address:
+        return None
+    block_number = await db.scalar(
+        select(IndexerCheckpoint.block_number)
+        .where(IndexerCheckpoint.name == transfer_indexer.checkpoint_name(contract_address))
+    )
+    if block_number is None or block_number < 0:
+        return None
+    return block_number
+
+class TransferIndexer:
+    """
+    Sigue los eventos Transfer del contrato en rangos de `chunk_size` bloques y
+    los guarda en `ticket_transfers`, con el último bloque indexado como checkpoint.
+
+    Si el hash del bloque del checkpoint ya no coincide con el de la cadena hubo
+    una reorganización: se descartan los últimos `reorg_depth` bloques y se vuelven
+    a indexar.
+    """
+
+    def __init__(self, session_factory, chunk_size: int = 2000, reorg_depth: int = 12,
+                 poll_interval: float = 5.0, start_block: int = 0):
+        self.session_factory = session_factory
+        self.chunk_size = chunk_size
+        self.reorg_depth = reorg_depth
+        self.poll_interval = poll_interval
+        self.start_block = start_block
+        self._stop = threading.Event()
+        self._thread = None
+
+    def checkpoint_name(self, contract_address: str):
+        return f"transfers:{contract_address.lower()}"
+
+    def run_once(self, w3: "Web3", contract_address: str) -> int:
+        """Indexa hasta el último bloque y devuelve cuántos eventos se procesaron."""
+        ticket_manager = app_context.contract_registry.get(w3, contract_address)
+        name = self.checkpoint_name(contract_address)
+        indexed = 0
+        db = self.session_factory()
+        try:
+            checkpoint = db.query(IndexerCheckpoint).filter(IndexerCheckpoint.name == name).first()
+            if checkpoint is None:
+                checkpoint = IndexerCheckpoint(name=name, block_number=self.start_block - 1)
+                db.add(checkpoint)
+                db.commit()
+            else:
+                self._handle_reorg(db, w3, checkpoint)
+
+            head = w3.eth.block_number
+            while checkpoint.block_number < head:
+                from_block = checkpoint.block_number + 1
+                to_block = min(from_block + self.chunk_size - 1, head)
+                logs = ticket_manager.transfer.get_logs(from_block=from_block, to_block=to_block)
+                record_transfers(db, logs)
+                checkpoint.block_number = to_block
+                checkpoint.block_hash = w3.eth.get_block(to_block)['hash'].hex()
+                db.commit()
+                indexed += len(logs)
+            return indexed
+        finally:
+            db.close()
+
+    def _handle_reorg(self, db: Session, w3: "Web3", checkpoint: IndexerCheckpoint):
+        if checkpoint.block_hash is None or checkpoint.block_number < 0:
+            return
+        try:
+            chain_hash = w3.eth.get_block(checkpoint.block_number)['hash'].hex()
+        except Exception:
+            chain_hash = None  # El bloque ya no existe en la cadena
+        if chain_hash == checkpoint.block_hash:
+            return
+
+        rewind_to = max(checkpoint.block_number - self.reorg_depth, self.start_block - 1)
+        orphaned = db.query(TicketTransfer.ticket_id_onchain).filter(TicketTransfer.block_number > rewind_to).distinct()
+        ticket_ids = [ticket_id for ticket_id, in orphaned]
+        db.query(TicketTransfer).filter(TicketTransfer.block_number > rewind_to).delete(synchronize_session=False)
+        rebuild_owners(db, ticket_ids)
+        checkpoint.block_number = rewind_to
+        checkpoint.block_hash = None
+        db.commit()
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="transfer-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if app_context.contract_registry.address:
+                    self.run_once(get_w3(), app_context.contract_registry.address)
+            except Exception:
+                pass  # Reintentar en la siguiente vuelta
+            self._stop.wait(self.poll_interval)
+
+transfer_indexer = TransferIndexer(
+    SessionLocal,
+    chunk_size=int(os.getenv("INDEXER_CHUNK_SIZE", "2000")),
+    reorg_depth=int(os.getenv("INDEXER_REORG_DEPTH", "12")),
+    poll_interval=float(os.getenv("INDEXER_POLL_INTERVAL", "5")),
+    start_block=int(os.getenv("INDEXER_START_BLOCK", "0"))
+)
 
 @web3_router.get("/{ticket_id}/owner")
-def get_ticket_owner(ticket_id: int, contract_address: str = Depends(get_contract_address), w3: Web3 = Depends(get_w3)):
-    contract = w3.eth.contract(address=contract_address, abi=abi)
+async def get_ticket_owner(
+    ticket_id: int,
+    response: Response,
+    consistency: Consistency = Consistency.INDEXED,
+    db: AsyncSession = Depends(get_db),
+    contract_address: str = Depends(get_contract_address),
+    w3 = Depends(get_w3)
+):
+    if consistency == Consistency.INDEXED:
+        owner = await db.get(TicketOwner, ticket_id)
+        if owner:
+            # La respuesta es válida al menos hasta el bloque del último Transfer
+            block_number = max(await indexed_block(db, contract_address) or 0, owner.block_number)
+            await db.close()
+            response.headers["X-Block-Number"] = str(block_number)
+            return {"ticket_id": ticket_id, "owner": owner.owner_address, "block_number": block_number}
+    await db.close()
+
+    # Ticket aún no indexado o consistencia forzada: consultar el contrato
     try:
-        owner = contract.functions.ownerOf(ticket_id).call()
-        return {"ticket_id": ticket_id, "owner": owner}
+        block_number, owner = await run_in_threadpool(owner_on_chain, w3, contract_address, ticket_id)
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Ticket not found or error: {e}")
+    response.headers["X-Block-Number"] = str(block_number)
+    return {"ticket_id": ticket_id, "owner": owner, "block_number": block_number}
+
+def owner_on_chain(w3: "Web3", contract_address: str, ticket_id: int) -> tuple[int, str]:
+    ticket_manager = app_context.contract_registry.get(w3, contract_address)
+    block_number = w3.eth.block_number
+    return block_number, ticket_manager.owner_of(ticket_id).call(block_identifier=block_number)
+
+@users_router.get("/me/tickets", tags=["Blockchain"], response_model=list[dict], response_class=RowsJSONResponse)
+async def get_my_tickets(
+    response: Response,
+    consistency: Consistency = Consistency.INDEXED,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    w3 = Depends(get_w3)
+):
+    if not current_user.wallet_address:
+        raise HTTPException(status_code=400, detail="User does not have a wallet address registered.")
+    try:
+        wallet_address = w3.to_checksum_address(current_user.wallet_address)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid wallet address registered.")
+
+    contract_address = app_context.contract_registry.address
+    if consistency == Consistency.INDEXED:
+        owned = (await db.execute(
+            select(TicketOwner.ticket_id_onchain, TicketOwner.owner_address)
+            .where(TicketOwner.owner_address == wallet_address)
+            .order_by(TicketOwner.ticket_id_onchain)
+        )).all()
+        block_number = await indexed_block(db, contract_address)
+        headers = {"X-Block-Number": str(block_number)} if block_number is not None else None
+        return RowsJSONResponse(owned, ("ticket_id", "owner"), headers=headers)
+
+    # Candidatos: todo ticket que alguna vez llegó a la wallet; el contrato decide
+    candidates = (await db.execute(
+        select(TicketTransfer.ticket_id_onchain).where(TicketTransfer.to_address == wallet_address)
+        .union(select(Ticket.ticket_id_onchain).where(Ticket.owner_wallet_address == current_user.wallet_address))
+    )).all()
+    await db.close()
+
+    if not contract_address:
+        raise HTTPException(status_code=500, detail="La dirección del contrato no está configurada en el servidor.")
+    block_number, tickets_out = await run_in_threadpool(
+        owned_on_chain, w3, contract_address, wallet_address, sorted(ticket_id for ticket_id, in candidates)
+    )
+    response.headers["X-Block-Number"] = str(block_number)
+    return tickets_out
+
+def owned_on_chain(w3: "Web3", contract_address: str, wallet_address: str, ticket_ids: list[int]):
+    """Filtra con ownerOf, todo en el mismo bloque, los tickets que aún son de la wallet."""
+    ticket_manager = app_context.contract_registry.get(w3, contract_address)
+    block_number = w3.eth.block_number
+    tickets_out = []
+    for ticket_id in ticket_ids:
+        try:
+            owner = ticket_manager.owner_of(ticket_id).call(block_identifier=block_number)
+        except Exception:
+            continue  # Ticket quemado o de otro contrato
+        if owner == wallet_address:
+            tickets_out.append({"ticket_id": ticket_id, "owner": owner})
+    return block_number, tickets_out
 
 @web3_router.get("/{ticket_id}/history")
-def get_ticket_history(ticket_id: int, contract_address: str = Depends(get_contract_address), w3: Web3 = Depends(get_w3)):
-    contract = w3.eth.contract(address=contract_address, abi=abi)
-    try:
-        transfer_event_filter = contract.events.Transfer.create_filter(
-            from_block='earliest',
-            argument_filters={'tokenId': ticket_id}
-        )
-        logs = transfer_event_filter.get_all_entries()
-        
-        if not logs:
-             raise HTTPException(status_code=404, detail="No history found for this ticket.")
-
-        history = []
-        for log in logs:
-            event = log['args']
-            history.append({
-                "from": event["from"],
-                "to": event["to"],
-                "blockNumber": log["blockNumber"],
-                "transactionHash": log["transactionHash"].hex()
-            })
-        return {"ticket_id": ticket_id, "history": history}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error retrieving ticket history: {e}")
+async def get_ticket_history(ticket_id: int, db: AsyncSession = Depends(get_db)):
+    transfers = (await db.scalars(
+        select(TicketTransfer)
+        .where(TicketTransfer.ticket_id_onchain == ticket_id)
+        .order_by(TicketTransfer.block_number, TicketTransfer.log_index)
+    )).all()
+
+    if not transfers:
+        raise HTTPException(status_code=404, detail="No history found for this ticket.")
+
+    history = [
+        {
+            "from": transfer.from_address,
+            "to": transfer.to_address,
+            "blockNumber": transfer.block_number,
+            "transactionHash": transfer.transaction_hash
+        }
+        for transfer in transfers
+    ]
+    return {"ticket_id": ticket_id, "history": history}
+
+@purchases_router.get("/{purchase_id}")
+async def get_purchase_status(purchase_id: int, db: AsyncSession = Depends(get_db), current_user: CurrentUser = Depends(get_token_user)):
+    purchase = await db.get(Purchase, purchase_id)
+    if not purchase or purchase.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Purchase not found")
+    return {
+        "purchase_id": purchase.id,
+        "event_id": purchase.event_id,
+        "status": purchase.status,
+        "ticket_id": purchase.ticket_id_onchain,
+        "transaction_hash": purchase.transaction_hash,
+        "error": purchase.error
+    }
 
 
 @metadata_router.get("/tickets/{ticket_id}", tags=["Metadata"])
-def get_ticket_metadata(ticket_id: int, db: Session = Depends(get_db)):
-    ticket = db.query(Ticket).filter(Ticket.ticket_id_onchain == ticket_id).first()
+async def get_ticket_metadata(ticket_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def build():
+        return await build_ticket_metadata(ticket_id, db), None
+
+    entry = await response_cache.aget_or_build(("metadata",), f"metadata:{ticket_id}", build, refresh=must_refresh(db))
+    return ResponseCache.respond(request, entry)
+
+async def build_ticket_metadata(ticket_id: int, db: AsyncSession):
+    ticket = await db.scalar(select(Ticket).where(Ticket.ticket_id_onchain == ticket_id))
     if not ticket:
         raise HTTPException(status_code=404, detail="Ticket metadata not found")
 
-    event = db.query(Event).filter(Event.id == ticket.event_id).first()
+    event = await db.get(Event, ticket.event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found for this ticket")
 
@@ -499,33 +2261,92 @@ def get_ticket_metadata(ticket_id: int, db: Session = Depends(get_db)):
     return metadata
 
 @admin_router.get("/analytics/sales-by-category")
-def get_sales_by_category(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_sales_by_category(db: AsyncSession = Depends(get_read_db), current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != UserRole.ORGANIZADOR:
         raise HTTPException(status_code=403, detail="Not authorized to access analytics")
 
-    sales_data = db.query(
-        Event.category,
-        func.count(Ticket.id).label("tickets_sold")
-    ).join(Ticket, Event.id == Ticket.event_id).group_by(Event.category).all()
+    sales_data = (await db.execute(
+        select(Event.category, func.count(Ticket.id).label("tickets_sold"))
+        .join(Ticket, Event.id == Ticket.event_id)
+        .group_by(Event.category)
+    )).all()
 
     return [{"category": category, "tickets_sold": tickets_sold} for category, tickets_sold in sales_data]
 
+# --- Exportación de tickets ---
+TICKET_EXPORT_FIELDS = ("id", "ticket_id", "event_id", "owner", "original_owner", "is_paid", "purchase_date")
+
+@admin_router.get("/events/{event_id}/tickets/export")
+async def export_event_tickets(
+    event_id: int,
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    after_id: int = 0,
+    db: AsyncSession = Depends(get_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    """Exporta los tickets de un evento ordenados por id; `after_id` permite reanudar."""
+    event = (await db.execute(select(Event.owner_id).where(Event.id == event_id))).first()
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    if event.owner_id != current_user.id or current_user.role != UserRole.ORGANIZADOR:
+        raise HTTPException(status_code=403, detail="Not authorized to export tickets for this event")
+
+    stmt = (
+        select(
+            Ticket.id,
+            Ticket.ticket_id_onchain,
+            Ticket.event_id,
+            # Dueño actual según los Transfer indexados; si aún no se indexó, el comprador
+            func.coalesce(TicketOwner.owner_address, Ticket.owner_wallet_address),
+            Ticket.owner_wallet_address,
+            Ticket.is_paid,
+            Ticket.purchase_date,
+        )
+        .outerjoin(TicketOwner, TicketOwner.ticket_id_onchain == Ticket.ticket_id_onchain)
+        .where(Ticket.event_id == event_id, Ticket.id > after_id)
+        .order_by(Ticket.id)
+    )
+    return export_response(stmt, TICKET_EXPORT_FIELDS, export_format, f"event-{event_id}-tickets")
+
+# --- Endpoints internos (monitoreo) ---
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+def require_internal_token(x_internal_token: str | None = Header(default=None)):
+    # No usa la base de datos: debe responder aunque el pool esté agotado
+    if not INTERNAL_API_TOKEN or x_internal_token != INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+@internal_router.get("/metrics/db-pool", dependencies=[Depends(require_internal_token)])
+def get_db_pool_metrics():
+    # El pool sync arriba, por compatibilidad; el de los handlers async y las réplicas aparte
+    return {
+        **pool_status(engine.pool),
+        "async": pool_status(async_engine.pool),
+        "replicas": [{**replica, **pool_status(replica_engine.pool)}
+                     for replica, replica_engine in zip(read_replicas.status(), read_replicas.engines)],
+    }
+
+@internal_router.get("/metrics/password-hashing", dependencies=[Depends(require_internal_token)])
+def get_password_hashing_metrics():
+    return password_hasher.status()
+
 # --- Endpoint temporal para pruebas (NO USAR EN PRODUCCIÓN) ---
 @admin_router.post("/promote-to-organizer/{user_email}")
-def promote_to_organizer_temp(
+async def promote_to_organizer_temp(
     user_email: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     # No requerimos autenticación para este endpoint temporal
 ):
     # Buscar el usuario por email
-    user = db.query(User).filter(User.email == user_email).first()
+    user = await db.scalar(select(User).where(User.email == user_email))
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     # Promover a organizador
     user.role = UserRole.ORGANIZADOR
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    user_cache.invalidate(user.id)
     
     return {"message": f"User {user_email} promoted to organizer successfully", "user": user.email, "new_role": user.role}
 
@@ -534,8 +2355,10 @@ app.include_router(auth_router)
 app.include_router(users_router)
 app.include_router(events_router)
 app.include_router(web3_router)
+app.include_router(purchases_router)
 app.include_router(metadata_router)
 app.include_router(admin_router)
+app.include_router(internal_router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,139 @@
+"""
+Migraciones del esquema de la base.
+
+Uso:
+    python migrate.py upgrade [--to N]   aplica las migraciones pendientes
+    python migrate.py current            muestra la versión de la base y la esperada
+    python migrate.py check              termina con código 1 si faltan migraciones
+
+Cada archivo `migrations/NNNN_descripcion.py` define `upgrade(conn)`; NNNN es
+la versión. Cada migración corre en su propia transacción y queda registrada
+en la tabla `schema_version`. La API no crea tablas: al arrancar solo
+comprueba la versión (ver `check_schema`).
+"""
+import argparse
+import importlib
+import os
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, create_engine, func, inspect, select, text
+
+VERSION_TABLE = "schema_version"
+MIGRATIONS_PACKAGE = "migrations"
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), MIGRATIONS_PACKAGE)
+# Clave del advisory lock de PostgreSQL que serializa migraciones concurrentes
+LOCK_KEY = 73_212_018
+
+schema_version = Table(
+    VERSION_TABLE, MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration:
+    def __init__(self, version: int, name: str, module):
+        self.version = version
+        self.name = name
+        self.module = module
+
+    def upgrade(self, conn):
+        self.module.upgrade(conn)
+
+
+def load_migrations() -> list[Migration]:
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.fullmatch(r"(\d{4})_(\w+)\.py", filename)
+        if match:
+            module = importlib.import_module(f"{MIGRATIONS_PACKAGE}.{filename[:-3]}")
+            migrations.append(Migration(int(match[1]), match[2], module))
+    versions = [migration.version for migration in migrations]
+    if versions != list(range(1, len(versions) + 1)):
+        raise RuntimeError(f"Las migraciones deben numerarse 0001, 0002, ... sin huecos: {versions}")
+    return migrations
+
+
+def head_version() -> int:
+    return len(load_migrations())
+
+
+def current_version(conn) -> int | None:
+    """Versión aplicada en la base; None si nunca se migró."""
+    if not inspect(conn).has_table(VERSION_TABLE):
+        return None
+    return conn.execute(select(func.max(schema_version.c.version))).scalar()
+
+
+def upgrade(engine, target: int | None = None) -> list[int]:
+    """Aplica las migraciones pendientes hasta `target` (por defecto, todas) y devuelve las aplicadas."""
+    applied = []
+    for migration in load_migrations():
+        if target is not None and migration.version > target:
+            break
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                # Otro proceso migrando a la vez espera aquí y luego ve la versión nueva
+                conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": LOCK_KEY})
+            schema_version.create(conn, checkfirst=True)
+            if (current_version(conn) or 0) >= migration.version:
+                continue
+            migration.upgrade(conn)
+            conn.execute(schema_version.insert().values(
+                version=migration.version, name=migration.name, applied_at=datetime.utcnow()
+            ))
+        applied.append(migration.version)
+    return applied
+
+
+def check_schema(engine):
+    """Falla si a la base le faltan migraciones; una versión más nueva que el código se acepta."""
+    expected = head_version()
+    with engine.connect() as conn:
+        current = current_version(conn)
+    if current is None or current < expected:
+        raise RuntimeError(
+            f"El esquema de la base está en la versión {current}, se esperaba {expected}: "
+            "ejecutar `python migrate.py upgrade`"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migraciones del esquema")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    upgrade_parser = subcommands.add_parser("upgrade", help="aplica las migraciones pendientes")
+    upgrade_parser.add_argument("--to", type=int, default=None, help="versión final")
+    subcommands.add_parser("current", help="muestra la versión actual")
+    subcommands.add_parser("check", help="falla si faltan migraciones")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv(encoding='utf-8', override=True)
+    database_url = os.getenv("DATABASE_URL")
+    if not database_url:
+        raise ValueError("DATABASE_URL environment variable not set.")
+    engine = create_engine(database_url)
+    try:
+        if args.command == "upgrade":
+            applied = upgrade(engine, args.to)
+            print(f"Aplicadas: {applied}" if applied else "Sin migraciones pendientes")
+        elif args.command == "current":
+            with engine.connect() as conn:
+                print(f"Versión actual: {current_version(conn)} (esperada: {head_version()})")
+        else:
+            try:
+                check_schema(engine)
+            except RuntimeError as e:
+                print(e, file=sys.stderr)
+                return 1
+            print("Esquema al día")
+        return 0
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+Esquema inicial: las tablas tal como las creaba `Base.metadata.create_all`.
+
+Es una copia fija de los modelos a esta versión; no importar main.py, que
+seguirá cambiando. Sobre una base creada antes por create_all solo agrega lo
+que falte.
+"""
+from sqlalchemy import (Boolean, Column, DateTime, Enum, Float, ForeignKey, Integer, MetaData, String, Table, Text,
+                        UniqueConstraint, text)
+
+metadata = MetaData()
+
+Table(
+    "users", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("wallet_address", String, unique=True, index=True, nullable=True),
+    Column("role", Enum("COMPRADOR", "ORGANIZADOR", name="userrole"), nullable=False),
+)
+
+Table(
+    "events", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, index=True, nullable=False),
+    Column("description", String, nullable=True),
+    Column("date", DateTime, nullable=False),
+    Column("location", String, nullable=False),
+    Column("price", Float, nullable=False),
+    Column("total_tickets", Integer, nullable=False),
+    Column("capacity", Integer, nullable=True),
+    Column("category", String, nullable=True),
+    Column("total_revenue", Float),
+    Column("is_funds_withdrawn", Boolean),
+    Column("owner_id", Integer, ForeignKey("users.id")),
+)
+
+Table(
+    "tickets", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("ticket_id_onchain", Integer, unique=True, index=True, nullable=False),
+    Column("event_id", Integer, ForeignKey("events.id")),
+    Column("owner_wallet_address", String, nullable=False),
+    Column("purchase_date", DateTime),
+    Column("is_paid", Boolean),
+)
+
+Table(
+    "purchases", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("event_id", Integer, ForeignKey("events.id"), nullable=False),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("wallet_address", String, nullable=False),
+    Column("status", Enum("PENDING", "MINTED", "FAILED", "EXPIRED", name="purchasestatus"), nullable=False, index=True),
+    Column("ticket_id_onchain", Integer, nullable=True),
+    Column("transaction_hash", String, nullable=True),
+    Column("error", String, nullable=True),
+    Column("expires_at", DateTime, nullable=True),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+)
+
+Table(
+    "ticket_transfers", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("ticket_id_onchain", Integer, nullable=False),
+    Column("from_address", String, nullable=False),
+    Column("to_address", String, nullable=False),
+    Column("block_number", Integer, nullable=False, index=True),
+    Column("block_hash", String, nullable=False),
+    Column("transaction_hash", String, nullable=False),
+    Column("log_index", Integer, nullable=False),
+    UniqueConstraint("transaction_hash", "log_index", name="uq_ticket_transfers_tx_log"),
+)
+
+Table(
+    "ticket_owners", metadata,
+    Column("ticket_id_onchain", Integer, primary_key=True),
+    Column("owner_address", String, nullable=False, index=True),
+    Column("block_number", Integer, nullable=False),
+    Column("log_index", Integer, nullable=False),
+)
+
+Table(
+    "idempotency_keys", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("key", String, nullable=False),
+    Column("fingerprint", String, nullable=False),
+    Column("response_status", Integer, nullable=True),
+    Column("response_body", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),
+)
+
+Table(
+    "indexer_checkpoints", metadata,
+    Column("name", String, primary_key=True),
+    Column("block_number", Integer, nullable=False),
+    Column("block_hash", String, nullable=True),
+    Column("updated_at", DateTime),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
+    if conn.dialect.name == "postgresql":
+        # create_all no modifica tablas existentes: columnas y valores agregados después
+        conn.execute(text("ALTER TABLE events ADD COLUMN IF NOT EXISTS capacity INTEGER"))
+        conn.execute(text("ALTER TABLE purchases ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP WITHOUT TIME ZONE"))
+        conn.execute(text("ALTER TYPE purchasestatus ADD VALUE IF NOT EXISTS 'EXPIRED'"))
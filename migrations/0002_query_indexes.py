@@ -0,0 +1,32 @@
+"""
+Índices compuestos para las consultas frecuentes: listado de eventos por
+cursor, tickets por wallet, reservas vencidas y analítica de ventas.
+
+Los de eventos, compras y transfers ya estaban en los modelos pero create_all
+no los agrega a tablas existentes; por eso todo usa IF NOT EXISTS.
+"""
+from sqlalchemy import text
+
+INDEXES = {
+    # GET /events: orden (columna, id) con filtros opcionales
+    "ix_events_date_id": "events (date, id)",
+    "ix_events_category_date_id": "events (category, date, id)",
+    "ix_events_location_date_id": "events (location, date, id)",
+    "ix_events_price_id": "events (price, id)",
+    # Tickets por wallet (/users/me/tickets) y dueño actual ordenado por ticket
+    "ix_tickets_owner_wallet_ticket": "tickets (owner_wallet_address, ticket_id_onchain)",
+    "ix_ticket_transfers_to_ticket": "ticket_transfers (to_address, ticket_id_onchain)",
+    "ix_ticket_owners_owner_ticket": "ticket_owners (owner_address, ticket_id_onchain)",
+    "ix_ticket_transfers_ticket_block": "ticket_transfers (ticket_id_onchain, block_number, log_index)",
+    # Analítica por categoría y reconciliación del inventario
+    "ix_tickets_event_paid": "tickets (event_id, is_paid)",
+    # Barrido de reservas vencidas
+    "ix_purchases_status_expires_at": "purchases (status, expires_at)",
+}
+
+
+def upgrade(conn):
+    for name, target in INDEXES.items():
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+    # Lo cubre ix_ticket_owners_owner_ticket
+    conn.execute(text("DROP INDEX IF EXISTS ix_ticket_owners_owner_address"))
@@ -0,0 +1,30 @@
+"""
+Refresh tokens: una familia por login y un registro por token emitido, para
+rotarlos, detectar su reutilización y revocar la sesión completa.
+"""
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, MetaData, String, Table
+
+metadata = MetaData()
+
+Table("users", metadata, Column("id", Integer, primary_key=True))
+
+Table(
+    "token_families", metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False, index=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("revoked_at", DateTime, nullable=True, index=True),
+)
+
+Table(
+    "refresh_tokens", metadata,
+    Column("id", String, primary_key=True),
+    Column("family_id", String, ForeignKey("token_families.id"), nullable=False, index=True),
+    Column("issued_at", DateTime, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("used_at", DateTime, nullable=True),
+)
+
+
+def upgrade(conn):
+    metadata.create_all(conn, tables=[metadata.tables["token_families"], metadata.tables["refresh_tokens"]])
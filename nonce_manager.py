@@ -0,0 +1,71 @@
+import heapq
+import threading
+
+from web3 import Web3
+
+
+class NonceManager:
+    """
+    Asigna nonces para una cuenta sin consultar el nodo en cada transacción.
+
+    Se sincroniza con el conteo `pending` del nodo la primera vez que se usa y
+    cada vez que se llama a `sync` (por ejemplo, tras un error de envío). Los
+    nonces que nunca llegaron al nodo se devuelven con `release` y se reutilizan
+    antes que los nuevos, de modo que no quedan huecos que bloqueen la cuenta.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_nonce: int | None = None
+        self._in_flight: set[int] = set()
+        self._released: list[int] = []
+
+    def allocate(self, w3: Web3) -> int:
+        with self._lock:
+            if self._next_nonce is None:
+                self._sync_locked(w3)
+            if self._released:
+                nonce = heapq.heappop(self._released)
+            else:
+                nonce = self._next_nonce
+                self._next_nonce += 1
+            self._in_flight.add(nonce)
+            return nonce
+
+    def confirm(self, nonce: int):
+        # La transacción fue aceptada por el nodo
+        with self._lock:
+            self._in_flight.discard(nonce)
+
+    def release(self, nonce: int):
+        # La transacción no llegó al nodo: el nonce vuelve a estar disponible
+        with self._lock:
+            self._in_flight.discard(nonce)
+            if nonce not in self._released:
+                heapq.heappush(self._released, nonce)
+
+    def sync(self, w3: Web3):
+        with self._lock:
+            self._sync_locked(w3)
+
+    def reset(self):
+        # Fuerza una sincronización en la próxima asignación
+        with self._lock:
+            self._next_nonce = None
+            self._released.clear()
+
+    def _sync_locked(self, w3: Web3):
+        chain_nonce = w3.eth.get_transaction_count(self.address, 'pending')
+        next_nonce = max([chain_nonce, *(n + 1 for n in self._in_flight)])
+        if self._next_nonce is not None:
+            next_nonce = max(next_nonce, self._next_nonce)
+
+        # Todo nonce por debajo del siguiente que no esté en el nodo ni en vuelo
+        # corresponde a una transacción descartada: se recupera para reutilizarlo.
+        self._released = [
+            n for n in range(chain_nonce, next_nonce)
+            if n not in self._in_flight
+        ]
+        heapq.heapify(self._released)
+        self._next_nonce = next_nonce
@@ -0,0 +1,104 @@
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+_contexts: dict[int, CryptContext] = {}
+
+
+def crypt_context(rounds: int) -> CryptContext:
+    context = _contexts.get(rounds)
+    if context is None:
+        context = _contexts[rounds] = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+    return context
+
+
+def hash_password(password: str, rounds: int) -> str:
+    return crypt_context(rounds).hash(password)
+
+
+def verify_password(password: str, hashed_password: str, rounds: int) -> tuple[bool, str | None]:
+    """(válida, hash nuevo); el hash nuevo solo se devuelve si el guardado usa otro costo o esquema."""
+    return crypt_context(rounds).verify_and_update(password, hashed_password)
+
+
+class HasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    """
+    Hashea y verifica contraseñas con bcrypt en un pool de procesos propio.
+
+    bcrypt consume ~250 ms de CPU por llamada: en el threadpool de la API una
+    ola de logins deja sin hilos (y sin GIL) a las compras. Aquí la
+    concurrencia la limita `workers` y, con más de `max_pending` operaciones
+    esperando o en curso, se rechaza enseguida con `HasherBusy` en vez de
+    encolar sin límite. Con `workers=0` se ejecuta en el threadpool.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = 1, max_pending: int = 64):
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: los procesos no heredan los hilos ni las conexiones de la API
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HasherBusy(f"{self._pending} operaciones de contraseña en curso")
+            self._pending += 1
+
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+
+    async def _run(self, fn, *args):
+        self._acquire()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            return await asyncio.wrap_future(self._get_executor().submit(fn, *args))
+        finally:
+            self._release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> tuple[bool, str | None]:
+        return await self._run(verify_password, password, hashed_password, self.rounds)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "rounds": self.rounds,
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                # Las que esperan un proceso libre
+                "queued": max(self._pending - max(self.workers, 1), 0),
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import redis
+except ImportError:  # Dependencia opcional: solo se necesita con un backend Redis
+    redis = None
+
+
+class RateLimit:
+    """Token bucket: hasta `capacity` requests seguidos, que se recuperan en `period` segundos."""
+
+    def __init__(self, capacity: int, period: float):
+        if capacity <= 0 or period <= 0:
+            raise ValueError("capacity y period deben ser positivos")
+        self.capacity = capacity
+        self.period = period
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.period
+
+    @classmethod
+    def parse(cls, spec: str | None) -> "RateLimit | None":
+        """`"10/60"` son 10 requests por minuto; vacío u `"off"` desactiva el límite."""
+        if not spec or spec.strip().lower() in ("0", "off", "none"):
+            return None
+        capacity, _, period = spec.partition("/")
+        return cls(int(capacity), float(period or 1))
+
+
+class MemoryRateLimitBackend:
+    """Buckets en memoria del proceso; con varios workers, cada uno cuenta por separado."""
+
+    blocking = False
+
+    def __init__(self, max_keys: int = 100_000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        """Consume un token; devuelve 0 o los segundos hasta que haya uno."""
+        now = self.clock()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisRateLimitBackend:
+    """Buckets compartidos entre procesos sobre Redis; la recarga usa el reloj del servidor Redis."""
+
+    # Cliente sync: desde dependencias async se usa en el threadpool
+    blocking = True
+
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + (now - updated) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+    def __init__(self, client, prefix: str = "rate-limit"):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(self.SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str):
+        if redis is None:
+            raise RuntimeError("El paquete 'redis' es necesario para RATE_LIMIT_URL")
+        return cls(redis.Redis.from_url(url))
+
+    def take(self, key: str, capacity: int, rate: float) -> float:
+        return float(self._take(keys=[f"{self.prefix}:{key}"], args=[capacity, rate]))
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+
+class RateLimiter:
+    """
+    Límites por ámbito (un router o un endpoint). Cada request consume un
+    token del bucket de cada una de sus claves (IP, usuario, wallet) y se
+    rechaza si alguno está vacío.
+    """
+
+    def __init__(self, backend, limits: dict[str, RateLimit | None], enabled: bool = True):
+        self.backend = backend
+        self.limits = limits
+        self.enabled = enabled
+
+    def check(self, scope: str, keys: list[str]) -> float:
+        """0 si el request puede seguir; si no, los segundos a esperar."""
+        limit = self.limits.get(scope)
+        if not self.enabled or limit is None:
+            return 0.0
+        wait = 0.0
+        for key in keys:
+            wait = max(wait, self.backend.take(f"{scope}:{key}", limit.capacity, limit.rate))
+        return wait
+
+    async def acheck(self, scope: str, keys: list[str]) -> float:
+        """Igual que `check` para dependencias async, sin bloquear el event loop con un backend de red."""
+        if self.enabled and self.limits.get(scope) is not None and getattr(self.backend, "blocking", True):
+            return await run_in_threadpool(self.check, scope, keys)
+        return self.check(scope, keys)
+
+
+def create_rate_limiter(url: str | None, limits: dict[str, str | None], enabled: bool = True) -> RateLimiter:
+    backend = RedisRateLimitBackend.from_url(url) if url else MemoryRateLimitBackend()
+    return RateLimiter(backend, {scope: RateLimit.parse(spec) for scope, spec in limits.items()}, enabled)
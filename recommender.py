@@ -0,0 +1,347 @@
+"""
+Índice de similitud entre eventos para /events/recommendations.
+
+Cada evento es un vector TF-IDF (normalizado) sobre las palabras de su nombre,
+descripción, categoría y ubicación, más un término por categoría y por
+ubicación completas. Los vectores viven en arrays de NumPy como una matriz
+dispersa por filas (para leer el vector de un evento) y por columnas (las
+"postings" de cada término), así la similitud coseno de un evento contra todos
+se calcula con un solo `bincount` sobre las postings de sus términos, sin
+recorrer eventos que no comparten ninguno. Los términos muy comunes, que
+tendrían postings casi tan largas como el catálogo, se guardan como columnas
+densas y suman con una sola operación vectorizada.
+
+Los cambios se aplican de forma incremental: `invalidate` marca eventos y la
+siguiente consulta los vuelve a leer de la base. Los pesos IDF se recalculan
+en una reconstrucción completa, que corre en segundo plano cuando se acumulan
+muchos cambios o el índice envejece (los cambios hechos por otros workers solo
+llegan así); mientras tanto se sigue respondiendo con el índice anterior. La
+primera construcción se lanza al iniciar la app con `start`.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+STOPWORDS = frozenset("""
+a al algo ante con contra de del desde donde durante el ella en entre es esta este esto hasta la las le les lo los
+mas muy no nos o para pero por que se segun sin sobre su sus tambien un una uno unos unas y ya
+an and at by for from in of on or the to with
+""".split())
+WORD = re.compile(r"\w+")
+# Un término va en columna densa si aparece en más de esta fracción de los eventos
+DENSE_FRACTION = 0.05
+DENSE_MIN_EVENTS = 1000
+
+
+def tokenize(text: str | None) -> list[str]:
+    if not text:
+        return []
+    # Sin acentos ni mayúsculas: "Música" y "musica" son el mismo término
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [word for word in WORD.findall(text) if len(word) > 1 and word not in STOPWORDS]
+
+
+def event_terms(name: str | None, description: str | None, category: str | None, location: str | None) -> Counter:
+    terms = Counter(tokenize(name))
+    terms.update(tokenize(description))
+    for prefix, value in (("category", category), ("location", location)):
+        words = tokenize(value)
+        terms.update(words)
+        if words:
+            terms[f"{prefix}={' '.join(words)}"] += 1
+    return terms
+
+
+class _Postings:
+    """Filas y pesos de un término, en arrays que crecen al doble cuando se llenan."""
+
+    __slots__ = ("rows", "weights", "size")
+
+    def __init__(self, rows: np.ndarray | None = None, weights: np.ndarray | None = None):
+        self.rows = rows if rows is not None else np.empty(4, dtype=np.int32)
+        self.weights = weights if weights is not None else np.empty(4, dtype=np.float32)
+        self.size = 0 if rows is None else len(rows)
+
+    def append(self, row: int, weight: float):
+        if self.size == len(self.rows):
+            self.rows = np.resize(self.rows, max(4, 2 * self.size))
+            self.weights = np.resize(self.weights, max(4, 2 * self.size))
+        self.rows[self.size] = row
+        self.weights[self.size] = weight
+        self.size += 1
+
+
+class _Snapshot:
+    """Estado del índice; una reconstrucción arma uno nuevo y lo reemplaza entero."""
+
+    def __init__(self):
+        self.vocab: dict[str, int] = {}
+        self.df: list[int] = []
+        self.postings: list[_Postings] = []
+        self.row_ids = np.empty(0, dtype=np.int64)
+        self.alive = np.empty(0, dtype=bool)
+        self.rows: list[tuple[np.ndarray, np.ndarray]] = []
+        self.row_of: dict[int, int] = {}
+        self.dense: dict[int, np.ndarray] = {}  # Columna -> peso por fila, para los términos comunes
+        self.changes = 0  # Altas, bajas y ediciones desde que se construyó
+
+    @property
+    def size(self) -> int:
+        return len(self.row_of)
+
+    def idf(self, df: int) -> float:
+        return math.log((1 + self.size) / (1 + df)) + 1
+
+    def add(self, event_id: int, terms: Counter):
+        """Agrega un evento con los IDF actuales; uno que ya estaba queda reemplazado."""
+        self.remove(event_id)
+        row = len(self.rows)
+        cols = []
+        for term in terms:
+            col = self.vocab.get(term)
+            if col is None:
+                col = self.vocab[term] = len(self.df)
+                self.df.append(0)
+                self.postings.append(_Postings())
+            self.df[col] += 1
+            cols.append(col)
+        cols = np.array(cols, dtype=np.int32)
+        weights = np.array(
+            [(1 + math.log(count)) * self.idf(self.df[col]) for col, count in zip(cols, terms.values())],
+            dtype=np.float32
+        )
+        norm = float(np.linalg.norm(weights))
+        if norm:
+            weights /= norm
+        if row == len(self.row_ids):
+            self.row_ids = np.resize(self.row_ids, max(16, 2 * row))
+            self.alive = np.resize(self.alive, max(16, 2 * row))
+            for col, column in self.dense.items():
+                self.dense[col] = np.zeros(len(self.row_ids), dtype=np.float32)
+                self.dense[col][:len(column)] = column
+        for col, weight in zip(cols.tolist(), weights.tolist()):
+            if col in self.dense:
+                self.dense[col][row] = weight
+            else:
+                self.postings[col].append(row, weight)
+        self.rows.append((cols, weights))
+        self.row_ids[row] = event_id
+        self.alive[row] = True
+        self.row_of[event_id] = row
+        self.changes += 1
+
+    def remove(self, event_id: int):
+        row = self.row_of.pop(event_id, None)
+        if row is None:
+            return
+        # La fila queda en las postings, pero ya no cuenta
+        self.alive[row] = False
+        for col in self.rows[row][0].tolist():
+            self.df[col] -= 1
+        self.changes += 1
+
+    @classmethod
+    def build(cls, events) -> "_Snapshot":
+        """Construcción completa: pesos, normas y postings calculados con operaciones vectorizadas."""
+        snapshot = cls()
+        ids, row_index, cols, counts = [], [], [], []
+        for event_id, *fields in events:
+            terms = event_terms(*fields)
+            row = len(ids)
+            ids.append(event_id)
+            for term, count in terms.items():
+                col = snapshot.vocab.get(term)
+                if col is None:
+                    col = snapshot.vocab[term] = len(snapshot.vocab)
+                row_index.append(row)
+                cols.append(col)
+                counts.append(count)
+        n_rows, n_terms = len(ids), len(snapshot.vocab)
+        row_index = np.array(row_index, dtype=np.int32)
+        cols = np.array(cols, dtype=np.int32)
+        df = np.bincount(cols, minlength=n_terms)
+        idf = np.log((1 + n_rows) / (1 + df)) + 1
+        weights = (1 + np.log(np.array(counts, dtype=np.float64))) * idf[cols]
+        norms = np.sqrt(np.bincount(row_index, weights=weights ** 2, minlength=n_rows))
+        weights = (weights / np.where(norms > 0, norms, 1)[row_index]).astype(np.float32)
+
+        # Por filas: los términos de cada evento vienen contiguos
+        row_bounds = np.searchsorted(row_index, np.arange(n_rows + 1))
+        snapshot.rows = [
+            (cols[start:end], weights[start:end]) for start, end in zip(row_bounds[:-1], row_bounds[1:])
+        ]
+        # Por columnas: postings de cada término
+        order = np.argsort(cols, kind="stable")
+        col_bounds = np.searchsorted(cols[order], np.arange(n_terms + 1))
+        by_col_rows, by_col_weights = row_index[order], weights[order]
+        dense = (df > DENSE_FRACTION * n_rows) & (df >= DENSE_MIN_EVENTS)
+        snapshot.postings = [
+            _Postings() if dense[col] else _Postings(by_col_rows[start:end].copy(), by_col_weights[start:end].copy())
+            for col, (start, end) in enumerate(zip(col_bounds[:-1], col_bounds[1:]))
+        ]
+        for col in np.flatnonzero(dense).tolist():
+            column = snapshot.dense[col] = np.zeros(n_rows, dtype=np.float32)
+            start, end = col_bounds[col], col_bounds[col + 1]
+            column[by_col_rows[start:end]] = by_col_weights[start:end]
+        snapshot.df = df.tolist()
+        snapshot.row_ids = np.array(ids, dtype=np.int64)
+        snapshot.alive = np.ones(n_rows, dtype=bool)
+        snapshot.row_of = {event_id: row for row, event_id in enumerate(ids)}
+        return snapshot
+
+    def similar(self, event_id: int, k: int) -> list[int] | None:
+        row = self.row_of.get(event_id)
+        if row is None:
+            return None
+        cols, query = self.rows[row]
+        if not len(cols):
+            return []
+        n_rows = len(self.rows)
+        terms = list(zip(cols.tolist(), query.tolist()))
+        postings = [(self.postings[col], w) for col, w in terms if col not in self.dense]
+        if postings:
+            rows = np.concatenate([p.rows[:p.size] for p, _ in postings])
+            weights = np.concatenate([p.weights[:p.size] * w for p, w in postings])
+            scores = np.bincount(rows, weights=weights, minlength=n_rows)
+        else:
+            scores = np.zeros(n_rows)
+        for col, w in terms:
+            if col in self.dense:
+                scores += self.dense[col][:n_rows] * w
+        scores[~self.alive[:n_rows]] = 0
+        scores[row] = 0
+        candidates = np.flatnonzero(scores > 1e-6)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # Empates por id para que las páginas sean estables
+        order = np.lexsort((self.row_ids[candidates], -scores[candidates]))
+        return self.row_ids[candidates[order]].tolist()
+
+
+class EventIndex:
+    """
+    `load_events(ids)` devuelve tuplas (id, name, description, category,
+    location) de los eventos pedidos, o de todos si `ids` es None.
+    """
+
+    def __init__(self, load_events, max_age: float = 600.0, rebuild_ratio: float = 0.1, min_rebuild_changes: int = 1000):
+        self.load_events = load_events
+        self.max_age = max_age
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild_changes = min_rebuild_changes
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # Una sola construcción completa a la vez
+        self._snapshot: _Snapshot | None = None
+        self._built_at = 0.0
+        self._stale: set[int] = set()
+        self._rebuilding = False
+        self._generation = 0  # Cuenta las invalidaciones, para no perder las que llegan durante una reconstrucción
+        self._invalidated_at: dict[int, int] = {}
+        self._resets = 0  # Una construcción que empezó antes de un `reset` se descarta
+
+    def invalidate(self, event_ids):
+        with self._lock:
+            for event_id in event_ids:
+                self._generation += 1
+                self._stale.add(event_id)
+                self._invalidated_at[event_id] = self._generation
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+            self._stale.clear()
+            self._invalidated_at.clear()
+            self._resets += 1
+
+    def start(self):
+        """Lanza la primera construcción en segundo plano, para que no la pague una consulta."""
+        with self._lock:
+            if self._snapshot is not None or self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(target=self._rebuild, name="recommendations-rebuild", daemon=True).start()
+
+    def _build(self, only_if_missing: bool = False):
+        """Construcción completa, fuera de `_lock`: las consultas siguen con el índice anterior."""
+        with self._build_lock:
+            with self._lock:
+                if only_if_missing and self._snapshot is not None:
+                    return
+                started, resets = self._generation, self._resets
+            snapshot = _Snapshot.build(self.load_events(None))
+            with self._lock:
+                if resets != self._resets:
+                    return
+                # Lo invalidado mientras se leía la base se vuelve a leer en la próxima consulta
+                self._stale = {event_id for event_id, at in self._invalidated_at.items() if at > started}
+                self._invalidated_at = {event_id: self._invalidated_at[event_id] for event_id in self._stale}
+                self._snapshot = snapshot
+                self._built_at = time.monotonic()
+
+    def _refresh(self) -> _Snapshot:
+        while True:
+            with self._lock:
+                if self._snapshot is not None:
+                    break
+            # Sin índice todavía (o tras un `reset`): se espera a la construcción en curso o se hace una
+            self._build(only_if_missing=True)
+
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        if stale:
+            found = {event_id: fields for event_id, *fields in self.load_events(sorted(stale))}
+            with self._lock:
+                snapshot = self._snapshot
+                if snapshot is not None:
+                    for event_id in stale:
+                        if event_id in found:
+                            snapshot.add(event_id, event_terms(*found[event_id]))
+                        else:
+                            snapshot.remove(event_id)
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None:
+                return self._refresh()
+            due = (snapshot.changes >= max(self.min_rebuild_changes, self.rebuild_ratio * snapshot.size)
+                   or time.monotonic() - self._built_at > self.max_age)
+            if due and not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild, name="recommendations-rebuild", daemon=True).start()
+            return snapshot
+
+    def _rebuild(self):
+        try:
+            self._build()
+        finally:
+            self._rebuilding = False
+
+    def similar(self, event_id: int, k: int) -> list[int] | None:
+        """Ids de los `k` eventos más parecidos, de mayor a menor similitud; None si el evento no existe."""
+        snapshot = self._refresh()
+        with self._lock:
+            ranked = snapshot.similar(event_id, k)
+        if ranked is None:
+            # Puede ser un evento creado por otro worker: se busca en la base antes de darlo por inexistente
+            self.invalidate([event_id])
+            snapshot = self._refresh()
+            with self._lock:
+                ranked = snapshot.similar(event_id, k)
+        return ranked
+
+    def status(self) -> dict:
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                "built": snapshot is not None,
+                "events": snapshot.size if snapshot else 0,
+                "terms": len(snapshot.vocab) if snapshot else 0,
+                "changes_since_build": snapshot.changes if snapshot else 0,
+                "stale": len(self._stale),
+            }
@@ -0,0 +1,246 @@
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from fast_json import dumps
+
+try:
+    import redis
+except ImportError:  # Dependencia opcional: solo se necesita con un backend Redis
+    redis = None
+
+
+class MemoryCacheBackend:
+    """LRU en memoria del proceso con vencimiento por entrada."""
+
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[float | None, bytes]] = OrderedDict()
+        self._counters: dict[str, int] = {}
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: float | None):
+        with self._lock:
+            expires_at = time.monotonic() + ttl if ttl else None
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def counter(self, key: str) -> int:
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+class RedisCacheBackend:
+    """Backend compartido entre procesos sobre Redis."""
+
+    # Cliente sync: desde handlers async se usa en el threadpool
+    blocking = True
+
+    def __init__(self, client, prefix: str = "response-cache"):
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str):
+        if redis is None:
+            raise RuntimeError("El paquete 'redis' es necesario para RESPONSE_CACHE_URL")
+        return cls(redis.Redis.from_url(url))
+
+    def get(self, key: str) -> bytes | None:
+        return self.client.get(f"{self.prefix}:{key}")
+
+    def set(self, key: str, value: bytes, ttl: float | None):
+        self.client.set(f"{self.prefix}:{key}", value, ex=int(ttl) if ttl else None)
+
+    def counter(self, key: str) -> int:
+        return int(self.client.get(f"{self.prefix}:counter:{key}") or 0)
+
+    def incr(self, key: str) -> int:
+        return self.client.incr(f"{self.prefix}:counter:{key}")
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}:*"):
+            self.client.delete(key)
+
+
+class CachedResponse:
+    def __init__(self, body: bytes, headers: dict[str, str], last_modified: datetime):
+        self.body = body
+        self.headers = headers
+        self.last_modified = last_modified
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    def dumps(self) -> bytes:
+        return json.dumps({
+            "body": self.body.decode(),
+            "headers": self.headers,
+            "last_modified": self.last_modified.isoformat()
+        }).encode()
+
+    @classmethod
+    def loads(cls, raw: bytes):
+        data = json.loads(raw)
+        return cls(data["body"].encode(), data["headers"], datetime.fromisoformat(data["last_modified"]))
+
+
+class ResponseCache:
+    """
+    Caché de respuestas JSON agrupadas por etiquetas (por ejemplo `events` o
+    `event:5`). Invalidar una etiqueta incrementa su versión, que forma parte de
+    la clave, así que las entradas viejas dejan de encontrarse sin tener que
+    borrarlas una por una; el LRU o el TTL las terminan descartando.
+    """
+
+    def __init__(self, backend, ttl: float = 30.0, retry_interval: float = 1.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        # Invalidaciones encoladas para un backend de red; mientras una etiqueta
+        # está acá, este proceso no lee ni guarda sus entradas
+        self._lock = threading.Lock()
+        self._pending: Counter[str] = Counter()
+        self._invalidations: queue.Queue[tuple[str, ...]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def _key(self, tags: tuple[str, ...], key: str) -> str:
+        versions = ",".join(f"{tag}@{self.backend.counter(tag)}" for tag in tags)
+        return f"{versions}|{key}"
+
+    def _lookup(self, tags: tuple[str, ...], key: str) -> tuple[str, CachedResponse | None]:
+        cache_key = self._key(tags, key)
+        raw = self.backend.get(cache_key)
+        return cache_key, None if raw is None else CachedResponse.loads(raw)
+
+    def _store(self, tags: tuple[str, ...], key: str, cache_key: str, content, headers) -> CachedResponse:
+        body = dumps(content)
+        entry = CachedResponse(body, headers or {}, datetime.now(timezone.utc).replace(microsecond=0))
+        # Si algo se invalidó mientras se construía la respuesta, no guardarla
+        if self._key(tags, key) == cache_key:
+            self.backend.set(cache_key, entry.dumps(), self.ttl)
+        return entry
+
+    def get_or_build(self, tags: tuple[str, ...], key: str, build) -> CachedResponse:
+        """Devuelve la respuesta cacheada o llama a `build()` -> (contenido, headers) y la guarda."""
+        cache_key, entry = self._lookup(tags, key)
+        if entry is None:
+            entry = self._store(tags, key, cache_key, *build())
+        return entry
+
+    async def aget_or_build(self, tags: tuple[str, ...], key: str, build, refresh: bool = False) -> CachedResponse:
+        """
+        Igual que `get_or_build` para handlers async: `build` es una corrutina.
+
+        Con `refresh` no lee la entrada guardada: reconstruye y la reemplaza.
+        """
+        if self._is_pending(tags):
+            content, headers = await build()
+            return CachedResponse(dumps(content), headers or {}, datetime.now(timezone.utc).replace(microsecond=0))
+        cache_key, entry = await self._call(self._lookup, tags, key)
+        if entry is None or refresh:
+            entry = await self._call(self._store, tags, key, cache_key, *await build())
+        return entry
+
+    async def _call(self, function, *args):
+        # Un backend de red no debe bloquear el event loop
+        if getattr(self.backend, "blocking", True):
+            return await run_in_threadpool(function, *args)
+        return function(*args)
+
+    def invalidate(self, *tags: str):
+        """
+        Con un backend de red no bloquea: se llama desde `after_commit`, que en
+        una AsyncSession corre en el event loop. Los incrementos los hace un hilo.
+        """
+        if not getattr(self.backend, "blocking", True):
+            for tag in tags:
+                self.backend.incr(tag)
+            return
+        with self._lock:
+            self._pending.update(tags)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="response-cache-invalidator", daemon=True)
+                self._thread.start()
+        self._invalidations.put(tags)
+
+    def _is_pending(self, tags: tuple[str, ...]) -> bool:
+        with self._lock:
+            return any(self._pending[tag] for tag in tags)
+
+    def _run(self):
+        while True:
+            tags = self._invalidations.get()
+            while True:
+                try:
+                    for tag in tags:
+                        self.backend.incr(tag)
+                    break
+                except Exception:
+                    time.sleep(self.retry_interval)  # Backend caído: reintentar, la etiqueta sigue sin caché
+            with self._lock:
+                self._pending.subtract(tags)
+                self._pending += Counter()  # Descarta las que quedaron en cero
+
+    def clear(self):
+        self.backend.clear()
+
+    @staticmethod
+    def respond(request: Request, entry: CachedResponse) -> Response:
+        """Arma la respuesta, o un 304 si el cliente ya tiene la versión actual."""
+        headers = {
+            **entry.headers,
+            "ETag": entry.etag,
+            "Last-Modified": format_datetime(entry.last_modified, usegmt=True),
+            "Cache-Control": "public, max-age=0, must-revalidate",
+        }
+        if not_modified(request, entry):
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def not_modified(request: Request, entry: CachedResponse) -> bool:
+    # Solo por ETag: Last-Modified tiene precisión de segundos y una entrada
+    # reconstruida en el mismo segundo que la invalidación daría un 304 viejo
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or entry.etag in tags
+
+
+def create_response_cache(url: str | None, ttl: float, max_entries: int) -> ResponseCache:
+    backend = RedisCacheBackend.from_url(url) if url else MemoryCacheBackend(max_entries)
+    return ResponseCache(backend, ttl)
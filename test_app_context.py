@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from app_context import AppContext
+
+def test_main_imports_without_private_key_or_web3():
+    env = {key: value for key, value in os.environ.items() if key != "PRIVATE_KEY"}
+    code = (
+        "import sys, main\n"
+        "eager = [m for m in ('web3', 'eth_account', 'aiohttp', 'requests') if m in sys.modules]\n"
+        "assert not eager, eager\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    assert result.returncode == 0, result.stderr
+
+def test_resources_are_created_once_on_first_use(monkeypatch):
+    context = AppContext("http://127.0.0.1:8545", pool_size=2, timeout=5)
+    assert "_w3" not in vars(context) and "_contract_registry" not in vars(context)
+
+    assert context.w3 is context.w3
+    assert context.contract_registry is context.contract_registry
+    assert context.contract_registry.abi
+
+    monkeypatch.delenv("PRIVATE_KEY", raising=False)
+    with pytest.raises(ValueError):
+        context.nonce_manager
+    monkeypatch.setenv("PRIVATE_KEY", "0x" + "11" * 32)
+    assert context.nonce_manager.address == context.account_address
+    assert context.account_address == "0x19E7E376E7C213B7E7e7e46cc70A5dD086DAff2A"
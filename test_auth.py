@@ -64,4 +64,38 @@ def test_register_user():
     assert response.status_code == 200, response.text
     data = response.json()
     assert data["email"] == email
-    assert "id" in data
\ No newline at end of file
+    assert "id" in data
+
+
+def test_token_claims_and_cached_user(monkeypatch):
+    """
+    El token lleva id, rol y wallet; el usuario se lee de la base una vez y
+    la promoción a organizador invalida la caché.
+    """
+    import main
+    from jose import jwt
+
+    email = f"test_{random_string()}@example.com"
+    password = random_string(12)
+    wallet = "0x" + random_string(40).encode().hex()[:40]
+    user_id = client.post("/auth/register", json={"email": email, "password": password, "wallet_address": wallet}).json()["id"]
+    token = client.post("/auth/login", data={"username": email, "password": password}).json()["access_token"]
+
+    claims = jwt.decode(token, main.SECRET_KEY, algorithms=[main.ALGORITHM])
+    assert (claims["sub"], claims["uid"], claims["role"], claims["wallet"]) == (email, user_id, "comprador", wallet)
+
+    loads = []
+    load_current_user = main.load_current_user
+    async def counting_load(db, token_data):
+        loads.append(token_data.email)
+        return await load_current_user(db, token_data)
+    monkeypatch.setattr(main, "load_current_user", counting_load)
+
+    headers = {"Authorization": f"Bearer {token}"}
+    for _ in range(3):
+        assert client.get("/auth/users/me", headers=headers).json()["role"] == "comprador"
+    assert loads == [email]
+
+    assert client.post(f"/admin/promote-to-organizer/{email}").status_code == 200
+    assert client.get("/auth/users/me", headers=headers).json()["role"] == "organizador"
+    assert loads == [email, email]
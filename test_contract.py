@@ -110,3 +110,31 @@ def test_safe_mint(w3, deployed_contract, deployer_account):
     # Verificar que el tokenURI se haya establecido correctamente
     uri = deployed_contract.functions.tokenURI(token_id).call()
     assert uri == token_uri
+
+def test_safe_mint_batch(w3, deployed_contract, deployer_account):
+    """Prueba la función safeMintBatch para crear varios tickets en una transacción."""
+    selector = bytes(w3.keccak(text="safeMintBatch(address[],string[])")[:4])
+    assert selector in bytes(w3.eth.get_code(deployed_contract.address)), \
+        "TicketManager.bin no incluye safeMintBatch: recompila con compile_contract.py"
+
+    recipients = [w3.eth.accounts[1], w3.eth.accounts[2], w3.eth.accounts[1]]
+    uris = [f"https://api.ticketera.com/metadata/tickets/{i}" for i in range(len(recipients))]
+
+    mint_tx = deployed_contract.functions.safeMintBatch(recipients, uris).build_transaction({
+        'from': deployer_account.address,
+        'nonce': w3.eth.get_transaction_count(deployer_account.address),
+        'gasPrice': w3.eth.gas_price,
+    })
+    mint_tx['gas'] = 1000000
+
+    signed_mint_tx = w3.eth.account.sign_transaction(mint_tx, private_key=deployer_account.key)
+    tx_hash = w3.eth.send_raw_transaction(signed_mint_tx.raw_transaction)
+    tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    # Un evento Transfer por ticket, en el mismo orden de entrada
+    transfer_events = deployed_contract.events.Transfer().process_receipt(tx_receipt)
+    assert len(transfer_events) == len(recipients)
+    for recipient, uri, event in zip(recipients, uris, transfer_events):
+        token_id = event['args']['tokenId']
+        assert deployed_contract.functions.ownerOf(token_id).call() == recipient
+        assert deployed_contract.functions.tokenURI(token_id).call() == uri
@@ -0,0 +1,51 @@
+import json
+import os
+import shutil
+
+from web3 import Web3
+from contract_registry import ContractRegistry
+
+ADDRESS = "0x000000000000000000000000000000000000dEaD"
+OTHER_ADDRESS = "0x000000000000000000000000000000000000bEEF"
+
+def make_registry(tmp_path, monkeypatch):
+    abi_path = tmp_path / "TicketManager.abi"
+    shutil.copy("TicketManager.abi", abi_path)
+    monkeypatch.setenv("CONTRACT_ADDRESS", ADDRESS)
+    return ContractRegistry(str(abi_path), reload_interval=0), abi_path
+
+def test_contracts_are_cached_per_web3(tmp_path, monkeypatch):
+    registry, _ = make_registry(tmp_path, monkeypatch)
+    w3 = Web3()
+
+    handles = registry.get(w3)
+    assert registry.get(w3) is handles
+    assert handles.contract.address == ADDRESS
+    assert registry.get(w3, OTHER_ADDRESS).contract.address == OTHER_ADDRESS
+
+    # Otra instancia de Web3 (p. ej. un override en pruebas) tiene su propio contrato
+    assert registry.get(Web3()) is not handles
+
+def test_reload_when_address_changes(tmp_path, monkeypatch):
+    registry, _ = make_registry(tmp_path, monkeypatch)
+    w3 = Web3()
+    handles = registry.get(w3)
+
+    monkeypatch.setenv("CONTRACT_ADDRESS", OTHER_ADDRESS)
+
+    assert registry.get(w3) is not handles
+    assert registry.address == OTHER_ADDRESS
+
+def test_reload_when_abi_changes(tmp_path, monkeypatch):
+    registry, abi_path = make_registry(tmp_path, monkeypatch)
+    handles = registry.get(Web3())
+
+    abi = [entry for entry in json.loads(abi_path.read_text()) if entry.get("name") != "safeMintBatch"]
+    abi_path.write_text(json.dumps(abi))
+    stat = os.stat(abi_path)
+    os.utime(abi_path, (stat.st_atime, stat.st_mtime + 1))
+
+    assert registry.reload_if_changed()
+    assert registry.get(Web3()) is not handles
+    assert all(entry.get("name") != "safeMintBatch" for entry in registry.abi)
+    assert registry.get(Web3()).safe_mint_batch is None
@@ -0,0 +1,69 @@
+import os
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+
+import main
+from copurchase import CoPurchaseRecommender, build_arrays, save_model
+from main import app, Event, Ticket, UserRole
+from test_main import setup_database, get_test_db, create_user_and_get_token
+
+client = TestClient(app)
+
+
+def test_model_ranks_co_purchases_and_reloads_new_versions(tmp_path):
+    purchases = [(1, "0xA"), (2, "0xA"), (1, "0xB"), (3, "0xB"), (1, "0xC"), (3, "0xc"), (4, "0xD")]
+    save_model(str(tmp_path), build_arrays(purchases))
+    recommender = CoPurchaseRecommender(str(tmp_path), check_interval=0)
+
+    model = recommender.model
+    # 3 lo compraron dos de las wallets que compraron 1; a 2, solo una
+    assert model.recommend([1], 10) == [3, 2]
+    assert model.recommend([1, 3], 10) == [2]
+    assert model.recommend([99], 10) == []
+    assert model.popular(2, exclude={1}) == [3, 2]
+
+    for version in range(3):
+        save_model(str(tmp_path), build_arrays(purchases + [(5, "0xA")] * version))
+    assert recommender.model is not model
+    assert recommender.model.recommend([2], 10) == [5, 1]
+    # Solo quedan la versión publicada y la anterior
+    assert len([entry for entry in os.listdir(tmp_path) if os.path.isdir(tmp_path / entry)]) == 2
+
+
+def test_my_recommendations_skip_past_and_sold_out_events(tmp_path, monkeypatch):
+    db: Session = next(get_test_db())
+    setup_database(db)
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    token, wallet = create_user_and_get_token(db)
+
+    def new_event(name, days):
+        data = {"name": name, "description": "", "date": (datetime.utcnow() + timedelta(days=days)).isoformat(),
+                "location": "Monterrey", "price": 10.0, "total_tickets": 100, "category": "Música"}
+        return client.post("/events", json=data, headers={"Authorization": f"Bearer {org_token}"}).json()["id"]
+
+    bought, often_with, sometimes_with, past, sold_out, unrelated = (
+        new_event(name, days) for name, days in
+        (("Comprado", 10), ("Afín", 20), ("Menos afín", 30), ("Pasado", 40), ("Agotado", 50), ("Sin compras", 60))
+    )
+    db.query(Event).filter(Event.id == past).update({Event.date: datetime.utcnow() - timedelta(days=1)})
+    db.query(Event).filter(Event.id == sold_out).update({Event.total_tickets: 0})
+    purchases = [(bought, wallet), (bought, "0x1"), (sometimes_with, "0x1"), (past, "0x1"),
+                 (bought, "0x2"), (often_with, "0x2"), (sold_out, "0x2"), (bought, "0x3"), (often_with, "0x3")]
+    db.add_all(Ticket(ticket_id_onchain=90_000 + i, event_id=event_id, owner_wallet_address=owner, is_paid=True)
+               for i, (event_id, owner) in enumerate(purchases))
+    db.commit()
+
+    save_model(str(tmp_path), build_arrays(db.query(Ticket.event_id, Ticket.owner_wallet_address).all()))
+    monkeypatch.setattr(main, "copurchase", CoPurchaseRecommender(str(tmp_path)))
+
+    response = client.get("/users/me/recommendations?limit=3", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert [e["id"] for e in response.json()] == [often_with, sometimes_with, unrelated]
+
+    # Sin modelo publicado, los próximos eventos por fecha
+    monkeypatch.setattr(main, "copurchase", CoPurchaseRecommender(str(tmp_path / "missing")))
+    response = client.get("/users/me/recommendations", headers={"Authorization": f"Bearer {token}"})
+    assert [e["id"] for e in response.json()] == [often_with, sometimes_with, unrelated]
+    db.close()
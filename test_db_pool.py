@@ -0,0 +1,43 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+import main
+from main import app, engine, UserRole
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="Con SQLite, engine_options no configura el pool instrumentado")
+def test_pool_metrics_require_internal_token(monkeypatch):
+    assert client.get("/internal/metrics/db-pool").status_code == 403
+
+    monkeypatch.setattr(main, "INTERNAL_API_TOKEN", "secreto")
+    assert client.get("/internal/metrics/db-pool", headers={"X-Internal-Token": "otro"}).status_code == 403
+
+    response = client.get("/internal/metrics/db-pool", headers={"X-Internal-Token": "secreto"})
+    assert response.status_code == 200
+    metrics = response.json()
+    assert metrics["size"] == main.DB_POOL_SIZE
+    assert metrics["checkouts"] > 0
+    assert {"checked_out", "overflow", "avg_wait_ms", "max_wait_ms"} <= metrics.keys()
+
+def test_purchase_does_not_hold_connection_during_mint(monkeypatch):
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    db.close()
+
+    checked_out_during_mint = []
+    mint_ticket = main.mint_ticket
+
+    def observed_mint_ticket(*args):
+        checked_out_during_mint.append(engine.pool.checkedout())
+        return mint_ticket(*args)
+
+    monkeypatch.setattr(main, "mint_ticket", observed_mint_ticket)
+    response = client.post(f"/events/{event.id}/purchase", headers={"Authorization": f"Bearer {buyer_token}"})
+    assert response.status_code == 200, response.text
+    assert checked_out_during_mint == [0]
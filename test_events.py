@@ -1,7 +1,8 @@
 import pytest
 from fastapi.testclient import TestClient
-from main import app, UserRole, User, get_db
+from main import app, UserRole, User
 from test_auth import random_string # Reutilizamos la función para datos aleatorios
+from test_main import get_test_db
 from sqlalchemy.orm import Session
 
 client = TestClient(app)
@@ -16,7 +17,7 @@ def create_user_and_get_token(role: UserRole = UserRole.COMPRADOR):
     
     # Actualiza el rol a Organizador si es necesario
     if role == UserRole.ORGANIZADOR:
-        db: Session = next(get_db())
+        db: Session = next(get_test_db())
         user = db.query(User).filter(User.email == email).first()
         if user:
             user.role = UserRole.ORGANIZADOR
@@ -219,4 +220,58 @@ def test_delete_event_as_comprador():
     comprador_token = create_user_and_get_token(role=UserRole.COMPRADOR)
     response = client.delete(f"/events/{event_id}", headers={"Authorization": f"Bearer {comprador_token}"})
     
-    assert response.status_code == 403
\ No newline at end of file
+    assert response.status_code == 403
+
+
+def test_get_events_paginated_with_cursor():
+    """
+    Prueba que la paginación por cursor recorre todos los eventos sin repetir.
+    """
+    token = create_user_and_get_token(role=UserRole.ORGANIZADOR)
+    headers = {"Authorization": f"Bearer {token}"}
+    category = f"Paginada {random_string(6)}"
+    created = []
+    for i in range(7):
+        event_data = {"name": f"Evento {i}", "date": f"2026-06-0{i % 3 + 1}T20:00:00", "location": "Arena",
+                      "price": 10.0 + i, "total_tickets": 10, "category": category}
+        created.append(client.post("/events", json=event_data, headers=headers).json()["id"])
+
+    seen = []
+    params = {"category": category, "limit": 3}
+    while True:
+        response = client.get("/events", params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= 3
+        seen.extend(page)
+        if "X-Next-Cursor" not in response.headers:
+            break
+        params["cursor"] = response.headers["X-Next-Cursor"]
+
+    assert sorted(event["id"] for event in seen) == sorted(created)
+    keys = [(event["date"], event["id"]) for event in seen]
+    assert keys == sorted(keys)
+
+def test_get_events_filters_and_sort():
+    """
+    Prueba los filtros por precio, fecha y ubicación y el orden descendente por precio.
+    """
+    token = create_user_and_get_token(role=UserRole.ORGANIZADOR)
+    headers = {"Authorization": f"Bearer {token}"}
+    location = f"Sala {random_string(6)}"
+    for i, price in enumerate([5.0, 20.0, 35.0, 50.0]):
+        event_data = {"name": f"Filtro {i}", "date": f"2026-07-1{i}T20:00:00", "location": location,
+                      "price": price, "total_tickets": 10}
+        client.post("/events", json=event_data, headers=headers)
+
+    response = client.get("/events", params={"location": location, "min_price": 10, "max_price": 40, "sort": "-price"})
+    assert [event["price"] for event in response.json()] == [35.0, 20.0]
+
+    response = client.get("/events", params={"location": location, "date_from": "2026-07-12T00:00:00"})
+    assert [event["name"] for event in response.json()] == ["Filtro 2", "Filtro 3"]
+
+    # Un cursor de otro orden no es válido
+    response = client.get("/events", params={"location": location, "limit": 1})
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/events", params={"location": location, "sort": "-price", "cursor": cursor})
+    assert response.status_code == 400
@@ -0,0 +1,77 @@
+import csv
+import io
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import app, UserRole
+import main
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+def test_export_events_ndjson_resumable(monkeypatch):
+    db: Session = next(get_test_db())
+    setup_database(db)
+    monkeypatch.setattr(main, "EXPORT_BATCH_SIZE", 2)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event_ids = [create_event(db, org_token).id for _ in range(5)]
+
+    response = client.get("/events/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == event_ids
+    assert lines[0]["total_tickets"] == 5
+
+    # Reanudar desde el segundo evento
+    response = client.get("/events/export", params={"after_id": event_ids[1]})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == event_ids[2:]
+
+    db.close()
+
+def test_export_events_csv():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    response = client.get("/events/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert list(csv.reader(io.StringIO(response.text)))[0][0] == "name"
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    rows = list(csv.DictReader(io.StringIO(client.get("/events/export?format=csv").text)))
+    assert [row["id"] for row in rows] == [str(event.id)]
+    assert rows[0]["date"] == "2027-01-01T12:00:00"
+
+    db.close()
+
+def test_export_event_tickets():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    other_org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, buyer = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    ticket_ids = [
+        client.post(f"/events/{event.id}/purchase", headers={"Authorization": f"Bearer {buyer_token}"}).json()["ticket_id"]
+        for _ in range(2)
+    ]
+
+    url = f"/admin/events/{event.id}/tickets/export"
+    assert client.get(url, headers={"Authorization": f"Bearer {other_org_token}"}).status_code == 403
+
+    response = client.get(url, headers={"Authorization": f"Bearer {org_token}"})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["ticket_id"] for line in lines] == ticket_ids
+    assert all(line["owner"] == buyer for line in lines)
+
+    response = client.get(url, params={"after_id": lines[0]["id"], "format": "csv"},
+                          headers={"Authorization": f"Bearer {org_token}"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["ticket_id"]) for row in rows] == ticket_ids[1:]
+
+    db.close()
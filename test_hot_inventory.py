@@ -0,0 +1,144 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import (app, Event, Ticket, Purchase, PurchaseStatus, UserRole, SessionLocal, inventory_tier,
+                  mint_worker, reserve_ticket, release_reservation)
+from hot_inventory import MemoryInventoryStore
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+@pytest.fixture(autouse=True)
+def memory_inventory():
+    inventory_tier.store = MemoryInventoryStore()
+    yield inventory_tier.store
+    inventory_tier.store = None
+
+def create_hot_event(db: Session, capacity: int) -> int:
+    event = Event(name="Final del torneo", date=datetime(2027, 1, 1), location="Estadio",
+                  price=10.0, total_tickets=capacity, capacity=capacity, total_revenue=0.0)
+    db.add(event)
+    db.commit()
+    return event.id
+
+def test_hot_event_does_not_oversell_and_writes_behind():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_hot_event(db, 25)
+    buyers = 300
+    barrier = threading.Barrier(buyers)
+
+    def buy(i):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            purchase = reserve_ticket(session, event_id, 1, f"0xbuyer{i}")
+            session.commit()
+            return purchase is not None
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=buyers) as pool:
+        results = list(pool.map(buy, range(buyers)))
+
+    assert sum(results) == 25
+    assert inventory_tier.store.available(event_id) == 0
+
+    # La fila solo cambia al escribir los acumulados
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 25
+    assert inventory_tier.flush() == 1
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 0
+
+    db.close()
+
+def test_release_returns_ticket_to_hot_tier():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_hot_event(db, 1)
+
+    purchase_id = reserve_ticket(db, event_id, 1, "0xbuyer").id
+    db.commit()
+    assert reserve_ticket(db, event_id, 1, "0xother") is None
+
+    release_reservation(db, purchase_id, "boom")
+    db.commit()
+    assert inventory_tier.store.available(event_id) == 1
+
+    inventory_tier.flush()
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 1
+    db.close()
+
+def test_lost_store_is_reconciled_from_tickets():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_hot_event(db, 10)
+
+    # Tres tickets vendidos y una reserva pendiente cuyos acumulados nunca llegaron a la fila
+    for i in range(3):
+        db.add(Ticket(ticket_id_onchain=900000 + i, event_id=event_id, owner_wallet_address="0xbuyer", is_paid=True))
+    db.add(Purchase(event_id=event_id, user_id=1, wallet_address="0xbuyer", status=PurchaseStatus.PENDING))
+    db.commit()
+
+    # Tras una caída el store está vacío: la primera compra lo reconstruye
+    assert reserve_ticket(db, event_id, 1, "0xbuyer") is not None
+    db.commit()
+
+    assert inventory_tier.store.available(event_id) == 5
+    db.expire_all()
+    event = db.query(Event).filter(Event.id == event_id).first()
+    assert event.total_tickets == 6
+    assert event.total_revenue == 30.0
+
+    inventory_tier.flush()
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 5
+    db.close()
+
+def test_async_purchase_through_hot_tier():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    response = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+    assert response.status_code == 202, response.text
+    mint_worker.run_pending()
+
+    status = client.get(f"/purchases/{response.json()['purchase_id']}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.MINTED
+
+    inventory_tier.flush()
+    db.expire_all()
+    event = db.query(Event).filter(Event.id == event.id).first()
+    assert event.total_tickets == 4
+    assert event.total_revenue == 10.0
+
+    db.close()
+
+def test_unauthorized_update_does_not_touch_hot_tier():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_hot_event(db, 5)
+    assert reserve_ticket(db, event_id, 1, "0xbuyer") is not None
+    db.commit()
+    buyer_token, _ = create_user_and_get_token(db)
+
+    response = client.put(f"/events/{event_id}", json={"total_tickets": 50},
+                          headers={"Authorization": f"Bearer {buyer_token}"})
+    assert response.status_code == 403
+    # Sin escribir acumulados ni descartar el inventario en memoria
+    assert inventory_tier.store.available(event_id) == 4
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 5
+
+    db.close()
@@ -0,0 +1,95 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import app, Event, Ticket, IdempotencyKey, UserRole, mint_worker
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+def test_retried_purchase_returns_stored_response():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}", "Idempotency-Key": "compra-1"}
+
+    first = client.post(f"/events/{event.id}/purchase", headers=headers)
+    assert first.status_code == 200, first.text
+
+    retry = client.post(f"/events/{event.id}/purchase", headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+
+    # Solo se minteó un ticket
+    db.expire_all()
+    assert db.query(Ticket).filter(Ticket.event_id == event.id).count() == 1
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 4
+
+    # Otra clave es otra compra
+    other = client.post(f"/events/{event.id}/purchase", headers={**headers, "Idempotency-Key": "compra-2"})
+    assert other.status_code == 200
+    assert other.json()["ticket_id"] != first.json()["ticket_id"]
+
+    db.close()
+
+def test_async_purchase_retry_returns_same_purchase():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}", "Idempotency-Key": "compra-async"}
+
+    first = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+    retry = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+    assert first.status_code == retry.status_code == 202
+    assert retry.json()["purchase_id"] == first.json()["purchase_id"]
+    assert mint_worker.queue.qsize() == 1
+
+    mint_worker.run_pending()
+    db.close()
+
+def test_idempotency_key_reused_for_other_request():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    other_event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}", "Idempotency-Key": "compra-1"}
+
+    assert client.post(f"/events/{event.id}/purchase", headers=headers).status_code == 200
+    response = client.post(f"/events/{other_event.id}/purchase", headers=headers)
+    assert response.status_code == 422
+
+    db.close()
+
+def test_idempotency_key_in_progress_and_client_errors():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    # Un evento inexistente devuelve 404 y el reintento recibe lo mismo
+    missing = client.post("/events/999999/purchase", headers={**headers, "Idempotency-Key": "k-404"})
+    replay = client.post("/events/999999/purchase", headers={**headers, "Idempotency-Key": "k-404"})
+    assert missing.status_code == replay.status_code == 404
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+    # Una compra con la misma clave que sigue en curso
+    first = client.post(f"/events/{event.id}/purchase", headers={**headers, "Idempotency-Key": "k-busy"})
+    db.query(IdempotencyKey).filter(IdempotencyKey.key == "k-busy").update({"response_status": None})
+    db.commit()
+    busy = client.post(f"/events/{event.id}/purchase", headers={**headers, "Idempotency-Key": "k-busy"})
+    assert first.status_code == 200
+    assert busy.status_code == 409
+    assert "Retry-After" in busy.headers
+
+    db.close()
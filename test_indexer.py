@@ -0,0 +1,111 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import (app, TicketTransfer, IndexerCheckpoint, TransferIndexer, mint_ticket,
+                  get_w3, get_contract_address, SessionLocal, contract_registry, UserRole)
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+def test_indexer_stores_transfers_and_serves_history():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    w3 = next(app.dependency_overrides[get_w3]())
+    contract_address = get_contract_address()
+    buyer = w3.eth.account.create().address
+    _, ticket_id, _ = mint_ticket(w3, contract_address, buyer, 1)
+
+    indexer = TransferIndexer(SessionLocal, chunk_size=3)
+    assert indexer.run_once(w3, contract_address) > 0
+
+    rows = db.query(TicketTransfer).filter(TicketTransfer.ticket_id_onchain == ticket_id).all()
+    assert len(rows) == 1
+    assert rows[0].to_address == buyer
+
+    checkpoint = db.query(IndexerCheckpoint).one()
+    assert checkpoint.block_number == w3.eth.block_number
+
+    # Volver a indexar no duplica registros
+    indexer.run_once(w3, contract_address)
+    assert db.query(TicketTransfer).filter(TicketTransfer.ticket_id_onchain == ticket_id).count() == 1
+
+    response = client.get(f"/tickets/{ticket_id}/history")
+    assert response.status_code == 200, response.text
+    history = response.json()["history"]
+    assert history[0]["from"] == "0x0000000000000000000000000000000000000000"
+    assert history[0]["to"] == buyer
+
+    db.close()
+
+def test_indexer_rewinds_on_reorg():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    w3 = next(app.dependency_overrides[get_w3]())
+    contract_address = get_contract_address()
+    indexer = TransferIndexer(SessionLocal, reorg_depth=2)
+    indexer.run_once(w3, contract_address)
+    indexed = db.query(TicketTransfer).count()
+
+    # Simular un bloque huérfano: el hash del checkpoint no coincide y hay un
+    # Transfer que ya no existe en la cadena
+    checkpoint = db.query(IndexerCheckpoint).one()
+    checkpoint.block_hash = "00" * 32
+    db.add(TicketTransfer(
+        ticket_id_onchain=999999, from_address="0x0", to_address="0x0",
+        block_number=checkpoint.block_number, block_hash="00" * 32,
+        transaction_hash="ff" * 32, log_index=0
+    ))
+    db.commit()
+
+    indexer.run_once(w3, contract_address)
+    db.expire_all()
+    assert db.query(TicketTransfer).filter(TicketTransfer.ticket_id_onchain == 999999).count() == 0
+    assert db.query(TicketTransfer).count() == indexed
+    assert db.query(IndexerCheckpoint).one().block_hash == w3.eth.get_block(w3.eth.block_number)['hash'].hex()
+
+    db.close()
+
+def test_owner_projection_follows_transfers():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    seller_token, seller = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    buyer_token, buyer = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+
+    response = client.post(f"/events/{event.id}/purchase", headers={"Authorization": f"Bearer {seller_token}"})
+    ticket_id = response.json()["ticket_id"]
+
+    # El minteo se refleja al instante, sin esperar al indexador
+    response = client.get(f"/tickets/{ticket_id}/owner")
+    assert response.json()["owner"] == seller
+    assert "X-Block-Number" in response.headers
+
+    # Reventa por fuera de la API: solo el indexador la ve
+    w3 = next(app.dependency_overrides[get_w3]())
+    contract = contract_registry.get(w3, get_contract_address()).contract
+    tx_hash = contract.functions.transferFrom(seller, buyer, ticket_id).transact({"from": seller})
+    w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    assert client.get(f"/tickets/{ticket_id}/owner").json()["owner"] == seller
+    chain = client.get(f"/tickets/{ticket_id}/owner?consistency=chain").json()
+    assert chain["owner"] == buyer
+    assert chain["block_number"] == w3.eth.block_number
+
+    TransferIndexer(SessionLocal).run_once(w3, get_contract_address())
+
+    indexed = client.get(f"/tickets/{ticket_id}/owner").json()
+    assert indexed["owner"] == buyer
+    assert indexed["block_number"] == w3.eth.block_number
+
+    seller_tickets = client.get("/users/me/tickets", headers={"Authorization": f"Bearer {seller_token}"}).json()
+    buyer_tickets = client.get("/users/me/tickets", headers={"Authorization": f"Bearer {buyer_token}"}).json()
+    assert ticket_id not in [t["ticket_id"] for t in seller_tickets]
+    assert {"ticket_id": ticket_id, "owner": buyer} in buyer_tickets
+
+    response = client.get("/users/me/tickets?consistency=chain", headers={"Authorization": f"Bearer {buyer_token}"})
+    assert {"ticket_id": ticket_id, "owner": buyer} in response.json()
+
+    db.close()
@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import (app, Event, Purchase, PurchaseStatus, UserRole, SessionLocal, mint_worker,
+                  reserve_ticket, release_reservation, expire_reservations)
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+def create_event_with_tickets(db: Session, total_tickets: int) -> int:
+    event = Event(name="Evento con alta demanda", date=datetime(2027, 1, 1), location="Estadio",
+                  price=10.0, total_tickets=total_tickets, total_revenue=0.0)
+    db.add(event)
+    db.commit()
+    return event.id
+
+def test_no_oversell_with_parallel_buyers():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_event_with_tickets(db, 25)
+    buyers = 300
+    barrier = threading.Barrier(buyers)
+
+    def buy(i):
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            purchase = reserve_ticket(session, event_id, 1, f"0xbuyer{i}")
+            session.commit()
+            return purchase is not None
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=buyers) as pool:
+        results = list(pool.map(buy, range(buyers)))
+
+    db.expire_all()
+    assert sum(results) == 25
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 0
+    assert db.query(Purchase).filter(Purchase.status == PurchaseStatus.PENDING).count() == 25
+
+    db.close()
+
+def test_parallel_purchase_requests_do_not_oversell():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    with ThreadPoolExecutor(max_workers=50) as pool:
+        statuses = list(pool.map(
+            lambda _: client.post(f"/events/{event.id}/purchase?mode=async", headers=headers).status_code,
+            range(100)
+        ))
+
+    assert statuses.count(202) == 5
+    assert statuses.count(400) == 95
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 0
+
+    mint_worker.run_pending()
+    assert db.query(Purchase).filter(Purchase.status == PurchaseStatus.MINTED).count() == 5
+
+    db.close()
+
+def test_release_is_applied_once():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_event_with_tickets(db, 1)
+
+    purchase_id = reserve_ticket(db, event_id, 1, "0xbuyer").id
+    db.commit()
+
+    assert release_reservation(db, purchase_id, "boom")
+    assert not release_reservation(db, purchase_id, "boom")
+    db.commit()
+
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 1
+    db.close()
+
+def test_expired_reservations_are_released():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    event_id = create_event_with_tickets(db, 2)
+
+    stale = reserve_ticket(db, event_id, 1, "0xstale")
+    stale.expires_at = datetime.utcnow() - timedelta(seconds=1)
+    fresh = reserve_ticket(db, event_id, 1, "0xfresh")
+    db.commit()
+
+    assert expire_reservations(db) == 1
+    db.commit()
+
+    db.expire_all()
+    assert db.query(Purchase).filter(Purchase.id == stale.id).first().status == PurchaseStatus.EXPIRED
+    assert db.query(Purchase).filter(Purchase.id == fresh.id).first().status == PurchaseStatus.PENDING
+    assert db.query(Event).filter(Event.id == event_id).first().total_tickets == 1
+
+    db.close()
@@ -1,14 +1,29 @@
 import pytest
 import os
 from fastapi.testclient import TestClient
-from main import app, UserRole, get_db, User, Event, Ticket, get_w3, SessionLocal, Base, engine, get_password_hash
+from main import (app, UserRole, get_db, User, Event, Ticket, Purchase, get_w3, SessionLocal, Base, engine,
+                  get_password_hash, response_cache, async_database_url, RefreshToken, TokenFamily,
+                  event_index)
 from test_auth import random_string
+import migrate
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
 from web3 import Web3
 
+# TestClient ejecuta cada request en un event loop distinto y una conexión async
+# no puede pasar de un loop a otro: en las pruebas cada sesión abre la suya.
+test_async_engine = create_async_engine(async_database_url(os.environ["DATABASE_URL"]), poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(test_async_engine, autoflush=False, expire_on_commit=False)
+
 def setup_database(db):
     Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {migrate.VERSION_TABLE}"))
+    migrate.upgrade(engine)
+    response_cache.clear()
+    event_index.reset()
 
     # Create a default organizer user
     organizer_email = "organizer@test.com"
@@ -24,12 +39,19 @@ def setup_database(db):
     db.refresh(organizer_user)
 
 def get_test_db():
+    # Sesión sync para preparar y revisar datos desde las pruebas, fuera de cualquier event loop
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_test_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = get_test_async_db
+
 # Override the get_w3 dependency for testing
 def get_w3_override():
     yield Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
@@ -94,7 +116,10 @@ def clean_db(db_session):
     setup_database(db_session)
     yield
     db_session.query(Ticket).delete()
+    db_session.query(Purchase).delete()
     db_session.query(Event).delete()
+    db_session.query(RefreshToken).delete()
+    db_session.query(TokenFamily).delete()
     db_session.query(User).delete()
     db_session.commit()
 
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, inspect, insert, select
+import migrate
+from main import Base, Event
+
+
+def sqlite_engine(tmp_path, name="schema.db"):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+def assert_matches_models(engine):
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        assert inspector.has_table(table.name), table.name
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        assert {column.name for column in table.columns} <= columns, table.name
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        assert {index.name for index in table.indexes} <= indexes, table.name
+
+def test_upgrade_builds_the_model_schema(tmp_path, monkeypatch):
+    engine = sqlite_engine(tmp_path)
+    monkeypatch.setenv("DATABASE_URL", str(engine.url))
+    with pytest.raises(RuntimeError):
+        migrate.check_schema(engine)
+    assert migrate.main(["check"]) == 1
+
+    assert migrate.upgrade(engine, target=1) == [1]
+    with engine.connect() as conn:
+        assert migrate.current_version(conn) == 1
+    with pytest.raises(RuntimeError):
+        migrate.check_schema(engine)
+
+    head = migrate.head_version()
+    assert migrate.upgrade(engine) == list(range(2, head + 1))
+    assert migrate.upgrade(engine) == []
+    migrate.check_schema(engine)
+    assert migrate.main(["check"]) == 0
+    assert_matches_models(engine)
+
+def test_upgrade_adopts_database_created_by_create_all(tmp_path):
+    # Bases anteriores a las migraciones: tablas creadas por create_all, sin versión
+    engine = sqlite_engine(tmp_path)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(insert(Event).values(
+            name="Existente", date=datetime(2027, 1, 1), location="Sala", price=10.0, total_tickets=5
+        ))
+
+    assert migrate.upgrade(engine) == list(range(1, migrate.head_version() + 1))
+    migrate.check_schema(engine)
+    assert_matches_models(engine)
+    with engine.connect() as conn:
+        assert conn.execute(select(Event.name)).scalars().all() == ["Existente"]
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from web3 import Web3
+from nonce_manager import NonceManager
+
+w3 = Web3(Web3.HTTPProvider("http://127.0.0.1:8545"))
+
+def test_concurrent_allocations_are_unique():
+    # Una cuenta nueva empieza en el nonce 0
+    manager = NonceManager(w3.eth.account.create().address)
+
+    with ThreadPoolExecutor(max_workers=20) as pool:
+        nonces = list(pool.map(lambda _: manager.allocate(w3), range(200)))
+
+    assert sorted(nonces) == list(range(200))
+
+def test_released_nonce_is_reused_first():
+    manager = NonceManager(w3.eth.account.create().address)
+
+    first = manager.allocate(w3)
+    second = manager.allocate(w3)
+    manager.release(first)
+
+    assert manager.allocate(w3) == first
+    assert manager.allocate(w3) == second + 1
+
+def test_sync_recovers_dropped_transactions():
+    manager = NonceManager(w3.eth.account.create().address)
+
+    # Tres transacciones "enviadas" que el nodo nunca registró
+    for _ in range(3):
+        manager.confirm(manager.allocate(w3))
+    in_flight = manager.allocate(w3)
+
+    manager.sync(w3)
+
+    recovered = [manager.allocate(w3) for _ in range(3)]
+    assert recovered == [0, 1, 2]
+    assert in_flight == 3
+    assert manager.allocate(w3) == 4
+
+def test_sync_catches_up_with_external_transactions():
+    sender = w3.eth.accounts[3]
+    manager = NonceManager(sender)
+    start = manager.allocate(w3)
+    manager.release(start)
+
+    # Transacción enviada por fuera del gestor
+    tx_hash = w3.eth.send_transaction({"from": sender, "to": w3.eth.accounts[4], "value": 1})
+    w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    manager.sync(w3)
+    assert manager.allocate(w3) == start + 1
@@ -0,0 +1,53 @@
+import asyncio
+import random
+import string
+
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+import main
+from main import app, SessionLocal, User
+from password_hashing import HasherBusy, PasswordHasher
+
+client = TestClient(app)
+
+def random_email():
+    return "test_" + "".join(random.choice(string.ascii_lowercase) for _ in range(10)) + "@example.com"
+
+def stored_hash(email: str) -> str:
+    with SessionLocal() as db:
+        return db.scalar(select(User.hashed_password).where(User.email == email))
+
+def test_login_rehashes_when_cost_changes(monkeypatch):
+    hasher = PasswordHasher(rounds=5, workers=1)
+    monkeypatch.setattr(main, "password_hasher", hasher)
+    try:
+        email, password = random_email(), "clave-secreta"
+        assert client.post("/auth/register", json={"email": email, "password": password}).status_code == 200
+        assert stored_hash(email).startswith("$2b$05$")
+
+        hasher.rounds = 4
+        assert client.post("/auth/login", data={"username": email, "password": "otra"}).status_code == 401
+        assert stored_hash(email).startswith("$2b$05$")
+        assert client.post("/auth/login", data={"username": email, "password": password}).status_code == 200
+        assert stored_hash(email).startswith("$2b$04$")
+        assert client.post("/auth/login", data={"username": email, "password": password}).status_code == 200
+
+        monkeypatch.setattr(main, "INTERNAL_API_TOKEN", "secreto")
+        metrics = client.get("/internal/metrics/password-hashing", headers={"X-Internal-Token": "secreto"}).json()
+        assert metrics == {"rounds": 4, "workers": 1, "max_pending": 64, "pending": 0, "queued": 0,
+                           "completed": 4, "rejected": 0}
+    finally:
+        hasher.shutdown()
+
+def test_hasher_rejects_when_full(monkeypatch):
+    monkeypatch.setattr(main, "password_hasher", PasswordHasher(rounds=4, workers=0, max_pending=0))
+    response = client.post("/auth/register", json={"email": random_email(), "password": "clave"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+    hasher = PasswordHasher(rounds=4, workers=0, max_pending=1)
+    async def flood():
+        return await asyncio.gather(*(hasher.hash("clave") for _ in range(3)), return_exceptions=True)
+    results = asyncio.run(flood())
+    assert sum(isinstance(result, HasherBusy) for result in results) == 2
+    assert hasher.status()["rejected"] == 2
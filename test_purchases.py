@@ -0,0 +1,271 @@
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import app, Event, Purchase, PurchaseStatus, UserRole, mint_worker, supports_batch_mint, get_w3, get_contract_address
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+def test_async_purchase_is_minted_by_worker():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, buyer_address = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    # La compra asíncrona responde de inmediato con el id de la compra
+    response = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+    assert response.status_code == 202, response.text
+    purchase_id = response.json()["purchase_id"]
+
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.PENDING
+    assert status["ticket_id"] is None
+
+    # El ticket queda reservado antes del minteo
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 4
+
+    mint_worker.run_pending()
+
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.MINTED
+    assert status["ticket_id"] is not None
+
+    owner = client.get(f"/tickets/{status['ticket_id']}/owner").json()
+    assert owner["owner"] == buyer_address
+
+    db.close()
+
+def test_failed_mint_releases_reservation():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    response = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+    assert response.status_code == 202, response.text
+    purchase_id = response.json()["purchase_id"]
+
+    # Reemplazar el trabajo encolado por uno contra un contrato inexistente
+    job_purchase_id, w3, _ = mint_worker.queue.get_nowait()
+    mint_worker.enqueue(job_purchase_id, w3, "0x000000000000000000000000000000000000dEaD")
+    mint_worker.run_pending()
+
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.FAILED
+    assert status["error"]
+
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 5
+    assert db.query(Purchase).count() == 1
+
+    db.close()
+
+def test_purchase_status_of_other_user_not_found():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    other_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+
+    response = client.post(f"/events/{event.id}/purchase?mode=async", headers={"Authorization": f"Bearer {buyer_token}"})
+    purchase_id = response.json()["purchase_id"]
+
+    response = client.get(f"/purchases/{purchase_id}", headers={"Authorization": f"Bearer {other_token}"})
+    assert response.status_code == 404
+
+    mint_worker.run_pending()
+    db.close()
+
+def test_worker_threads_mint_in_parallel():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    purchase_ids = [
+        client.post(f"/events/{event.id}/purchase?mode=async", headers=headers).json()["purchase_id"]
+        for _ in range(5)
+    ]
+
+    # Los hilos procesan la cola completa antes de recibir la señal de parada
+    mint_worker.start()
+    mint_worker.stop()
+
+    statuses = [client.get(f"/purchases/{purchase_id}", headers=headers).json() for purchase_id in purchase_ids]
+    assert all(status["status"] == PurchaseStatus.MINTED for status in statuses)
+    assert len({status["ticket_id"] for status in statuses}) == 5
+
+    db.close()
+
+def test_queued_purchases_are_minted_as_a_batch():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyers = [create_user_and_get_token(db, role=UserRole.COMPRADOR) for _ in range(3)]
+
+    purchases = []
+    for token, wallet in buyers:
+        headers = {"Authorization": f"Bearer {token}"}
+        response = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+        purchases.append((response.json()["purchase_id"], headers, wallet))
+
+    mint_worker.run_pending()
+
+    statuses = []
+    for purchase_id, headers, wallet in purchases:
+        status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+        assert status["status"] == PurchaseStatus.MINTED
+        # Cada Transfer del recibo se asigna a la compra correcta
+        owner = client.get(f"/tickets/{status['ticket_id']}/owner").json()
+        assert owner["owner"] == wallet
+        statuses.append(status)
+
+    # Cerrar antes de los asserts: una transacción abierta bloquearía el drop_all del siguiente test
+    db.close()
+    w3 = next(app.dependency_overrides[get_w3]())
+    assert supports_batch_mint(w3, get_contract_address()), "El contrato desplegado no tiene safeMintBatch"
+    assert len({status["transaction_hash"] for status in statuses}) == 1
+
+def test_mint_without_receipt_stays_pending_until_reconciled(monkeypatch):
+    from web3.exceptions import TimeExhausted
+
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    purchase_id = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers).json()["purchase_id"]
+    _, w3, _ = mint_worker.queue.queue[0]
+
+    # La transacción se envía, pero el recibo no llega a tiempo
+    def timeout(tx_hash, *args, **kwargs):
+        raise TimeExhausted("receipt timeout")
+    monkeypatch.setattr(w3.eth, "wait_for_transaction_receipt", timeout)
+    mint_worker.run_pending()
+
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.PENDING
+    assert status["transaction_hash"]
+    db.expire_all()
+    purchase = db.query(Purchase).filter(Purchase.id == purchase_id).first()
+    # El asiento sigue reservado y la reserva ya no vence
+    assert purchase.expires_at is None
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 4
+
+    monkeypatch.undo()
+    assert mint_worker.reconcile_sent(w3) == 1
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.MINTED
+    assert status["ticket_id"] is not None
+
+    db.close()
+
+def test_send_error_after_node_accepted_is_not_resent(monkeypatch):
+    import requests
+    from main import app_context
+
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    purchase_id = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers).json()["purchase_id"]
+    _, w3, _ = mint_worker.queue.queue[0]
+    sent_before = w3.eth.get_transaction_count(app_context.account_address, "pending")
+
+    # El nodo recibe la transacción, pero la respuesta se pierde
+    send = w3.eth.send_raw_transaction
+    def send_then_timeout(raw_transaction):
+        send(raw_transaction)
+        raise requests.exceptions.ReadTimeout("read timed out")
+    monkeypatch.setattr(w3.eth, "send_raw_transaction", send_then_timeout)
+    mint_worker.run_pending()
+    monkeypatch.undo()
+
+    assert w3.eth.get_transaction_count(app_context.account_address, "pending") == sent_before + 1
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.PENDING
+
+    assert mint_worker.reconcile_sent(w3) == 1
+    assert client.get(f"/purchases/{purchase_id}", headers=headers).json()["status"] == PurchaseStatus.MINTED
+
+    db.close()
+
+def test_reverted_batch_is_minted_one_by_one():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    # Un contrato sin onERC721Received como wallet hace revertir safeMint
+    buyers = [
+        create_user_and_get_token(db, role=UserRole.COMPRADOR),
+        create_user_and_get_token(db, role=UserRole.COMPRADOR, wallet_address=get_contract_address()),
+        create_user_and_get_token(db, role=UserRole.COMPRADOR),
+    ]
+    purchases = []
+    for token, _ in buyers:
+        headers = {"Authorization": f"Bearer {token}"}
+        response = client.post(f"/events/{event.id}/purchase?mode=async", headers=headers)
+        purchases.append((response.json()["purchase_id"], headers))
+
+    mint_worker.run_pending()
+
+    statuses = [client.get(f"/purchases/{purchase_id}", headers=headers).json()["status"] for purchase_id, headers in purchases]
+    assert statuses == [PurchaseStatus.MINTED, PurchaseStatus.FAILED, PurchaseStatus.MINTED]
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 3
+
+    db.close()
+
+def test_sync_purchase_without_receipt_is_reconciled(monkeypatch):
+    from web3.exceptions import TimeExhausted
+    from main import app_context
+
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+    headers = {"Authorization": f"Bearer {buyer_token}"}
+
+    # La transacción se envía, pero el recibo no llega a tiempo
+    w3 = app_context.w3
+    def timeout(tx_hash, *args, **kwargs):
+        raise TimeExhausted("receipt timeout")
+    monkeypatch.setattr(w3.eth, "wait_for_transaction_receipt", timeout)
+    response = client.post(f"/events/{event.id}/purchase", headers=headers)
+    monkeypatch.undo()
+
+    assert response.status_code == 202, response.text
+    purchase_id = response.json()["purchase_id"]
+    assert response.json()["transaction_hash"]
+    status = client.get(f"/purchases/{purchase_id}", headers=headers).json()
+    assert status["status"] == PurchaseStatus.PENDING
+
+    assert mint_worker.reconcile_sent(w3) == 1
+    assert client.get(f"/purchases/{purchase_id}", headers=headers).json()["status"] == PurchaseStatus.MINTED
+    db.expire_all()
+    assert db.query(Event).filter(Event.id == event.id).first().total_tickets == 4
+
+    db.close()
@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+from main import app, access_token_for, User, UserRole
+from rate_limit import MemoryRateLimitBackend, RateLimit, RateLimiter
+
+client = TestClient(app)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def limiter(monkeypatch):
+    clock = FakeClock()
+    limiter = RateLimiter(MemoryRateLimitBackend(clock=clock), {
+        "auth": RateLimit(2, 60), "events": None, "web3": RateLimit(3, 3), "purchase": RateLimit(1, 60),
+    })
+    monkeypatch.setattr(main, "rate_limiter", limiter)
+    return clock
+
+def test_login_limited_without_touching_database(limiter):
+    async def no_database():
+        raise AssertionError("un request rechazado no debe pedir sesión")
+        yield
+
+    form = {"username": "nadie@example.com", "password": "x"}
+    assert client.post("/auth/login", data=form).status_code == 401
+    assert client.post("/auth/login", data=form).status_code == 401
+
+    app.dependency_overrides[main.get_db], previous = no_database, app.dependency_overrides[main.get_db]
+    try:
+        response = client.post("/auth/login", data=form)
+    finally:
+        app.dependency_overrides[main.get_db] = previous
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "30"
+
+    limiter.now += 30
+    assert client.post("/auth/login", data=form).status_code == 401
+
+def test_buckets_per_router_user_and_wallet(limiter):
+    # /events no tiene límite configurado
+    for _ in range(5):
+        assert client.get("/events/999999").status_code == 404
+
+    # La compra cuenta por usuario y wallet aunque cambie la IP
+    token = access_token_for(User(id=999999, email="bot@example.com", role=UserRole.COMPRADOR, wallet_address="0xABC"))
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/events/999999/purchase", headers=headers).status_code != 429
+    other_ip = TestClient(app, client=("10.0.0.2", 50000))
+    response = other_ip.post("/events/999999/purchase", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "60"
+
+def test_token_bucket_refill():
+    clock = FakeClock()
+    backend = MemoryRateLimitBackend(clock=clock)
+    assert [backend.take("k", 3, 1.0) for _ in range(4)] == [0, 0, 0, 1.0]
+    clock.now += 0.5
+    assert backend.take("k", 3, 1.0) == pytest.approx(0.5)
+    clock.now += 10
+    assert [backend.take("k", 3, 1.0) for _ in range(3)] == [0, 0, 0]
+    assert backend.take("otra", 3, 1.0) == 0
+
+    assert RateLimit.parse("10/60").rate == pytest.approx(10 / 60)
+    assert RateLimit.parse("off") is None and RateLimit.parse("") is None
+
+def test_blocking_backend_runs_off_the_event_loop():
+    import asyncio
+    import threading
+
+    class BlockingBackend(MemoryRateLimitBackend):
+        blocking = True
+
+        def take(self, key, capacity, rate):
+            backend_threads.add(threading.get_ident())
+            return super().take(key, capacity, rate)
+
+    backend_threads = set()
+    limiter = RateLimiter(BlockingBackend(clock=FakeClock()), {"auth": RateLimit(1, 60)})
+    assert asyncio.run(limiter.acheck("auth", ["ip:1"])) == 0
+    assert asyncio.run(limiter.acheck("auth", ["ip:1"])) == pytest.approx(60)
+    assert backend_threads and threading.get_ident() not in backend_threads
@@ -0,0 +1,91 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+import main
+import migrate
+from main import app, Event, UserRole, read_your_writes
+from db_replicas import ReadYourWrites, ReplicaSet
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+@pytest.fixture
+def sqlite_replica(tmp_path, monkeypatch):
+    # Una base SQLite hace de réplica atrasada de la primaria PostgreSQL
+    path = tmp_path / "replica.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    migrate.upgrade(sync_engine)
+    replicas = ReplicaSet([create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)])
+    monkeypatch.setattr(main, "read_replicas", replicas)
+    read_your_writes.clear()
+    yield sync_engine
+    read_your_writes.clear()
+    sync_engine.dispose()
+
+def copy_event_to_replica(replica_engine, event: Event, **changes):
+    row = {column: getattr(event, column) for column in main.EVENT_OUT_FIELDS}
+    row.update(changes)
+    with replica_engine.begin() as conn:
+        conn.execute(insert(Event), [row])
+
+def test_reads_go_to_replica_until_user_writes(sqlite_replica):
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    read_your_writes.clear()  # Crear el evento de prueba no cuenta como escritura del test
+    event = create_event(db, org_token)
+    read_your_writes.clear()
+    copy_event_to_replica(sqlite_replica, event, name="Nombre en la réplica")
+    headers = {"Authorization": f"Bearer {org_token}"}
+
+    assert client.get(f"/events/{event.id}").json()["name"] == "Nombre en la réplica"
+    assert client.get(f"/events/{event.id}", headers=headers).json()["name"] == "Nombre en la réplica"
+
+    # Tras escribir, el organizador lee de la primaria aunque la réplica siga atrasada
+    response = client.put(f"/events/{event.id}", json={"name": "Nombre nuevo"}, headers=headers)
+    assert response.status_code == 200, response.text
+    assert client.get(f"/events/{event.id}", headers=headers).json()["name"] == "Nombre nuevo"
+    recommendations = client.get("/events/recommendations", headers=headers).json()
+    assert [e["name"] for e in recommendations if e["id"] == event.id] == ["Nombre nuevo"]
+
+    # Los demás siguen leyendo de la réplica
+    recommendations = client.get("/events/recommendations").json()
+    assert [e["name"] for e in recommendations if e["id"] == event.id] == ["Nombre en la réplica"]
+
+    db.close()
+
+def test_replica_selection():
+    engines = [create_async_engine(f"sqlite+aiosqlite:///replica-{i}.db", poolclass=NullPool) for i in range(3)]
+    round_robin = ReplicaSet(engines[:2])
+    assert [round_robin.choose() for _ in range(4)] == [0, 1, 0, 1]
+
+    least_latency = ReplicaSet(engines, selection="least_latency")
+    least_latency.record_latency(0, 0.030)
+    least_latency.record_latency(1, 0.005)
+    assert least_latency.choose() == 2  # Sin mediciones: se prueba primero
+    least_latency.record_latency(2, 0.050)
+    assert least_latency.choose() == 1
+    least_latency.record_latency(1, 0.500)
+    assert least_latency.choose() == 0
+
+    with pytest.raises(ValueError):
+        ReplicaSet(engines, selection="random")
+
+def test_read_your_writes_window():
+    pins = ReadYourWrites(window=0.05)
+    pins.pin("ana@example.com")
+    assert pins.is_pinned("ana@example.com")
+    assert not pins.is_pinned("otro@example.com")
+    assert not pins.is_pinned(None)
+    time.sleep(0.1)
+    assert not pins.is_pinned("ana@example.com")
+
+    disabled = ReadYourWrites(window=0)
+    disabled.pin("ana@example.com")
+    assert not disabled.is_pinned("ana@example.com")
@@ -34,3 +34,75 @@ def test_get_event_recommendations_by_category():
     assert len(recommendations_all) == 3 # All events should be returned
 
     db.close()
+
+def test_recommendations_ranking_updates_and_pages():
+    db: Session = next(get_test_db())
+    setup_database(db)
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    headers = {"Authorization": f"Bearer {org_token}"}
+
+    def new_event(name, category, location=""):
+        data = {"name": name, "description": "", "date": "2025-12-01T20:00:00", "location": location, "price": 10.0, "total_tickets": 100, "category": category}
+        return client.post("/events", json=data, headers=headers).json()
+
+    base = new_event("Festival de Jazz", "Música", "Monterrey")
+    same_words = new_event("Noche de Jazz", "Música", "Monterrey")
+    same_category = new_event("Concierto Sinfónico", "Musica")
+    unrelated = new_event("Obra de Teatro", "Teatro")
+
+    ranked = client.get(f"/events/recommendations?event_id={base['id']}").json()
+    assert [e["id"] for e in ranked] == [same_words["id"], same_category["id"]]
+
+    # Los cambios de un evento se ven en la siguiente consulta
+    client.put(f"/events/{unrelated['id']}", json={"name": "Festival de Jazz y Teatro", "category": "Música", "location": "Monterrey"}, headers=headers)
+    ranked = client.get(f"/events/recommendations?event_id={base['id']}").json()
+    assert ranked[0]["id"] == unrelated["id"]
+    assert ranked[0]["name"] == "Festival de Jazz y Teatro"
+
+    first_page = client.get(f"/events/recommendations?event_id={base['id']}&limit=2")
+    assert first_page.headers["X-Next-Offset"] == "2"
+    rest = client.get(f"/events/recommendations?event_id={base['id']}&limit=2&offset=2")
+    assert "X-Next-Offset" not in rest.headers
+    assert [e["id"] for e in first_page.json() + rest.json()] == [e["id"] for e in ranked]
+
+    assert client.get("/events/recommendations?event_id=999999").status_code == 404
+    db.close()
+
+def test_index_serves_previous_snapshot_while_rebuilding(monkeypatch):
+    import threading
+    import recommender
+    from recommender import EventIndex
+
+    catalog = {
+        1: (1, "Festival de Jazz", "", "Música", "Monterrey"),
+        2: (2, "Noche de Jazz", "", "Música", "Monterrey"),
+        3: (3, "Concierto Sinfónico", "", "Música", ""),
+        4: (4, "Obra de Teatro", "", "Teatro", ""),
+    }
+    release = threading.Event()
+    full_loads = []
+
+    def load_events(ids):
+        if ids is not None:
+            return [catalog[i] for i in ids if i in catalog]
+        full_loads.append(1)
+        if len(full_loads) > 1:
+            release.wait(5)
+        return list(catalog.values())
+
+    index = EventIndex(load_events, max_age=0)
+    index.start()
+    assert index.similar(1, 10) == [2, 3]
+
+    # Con max_age=0 la consulta anterior lanzó una reconstrucción, que queda frenada
+    # en la base; las consultas siguen con el índice anterior sin esperarla
+    index.invalidate([4])
+    catalog[4] = (4, "Festival de Jazz y Teatro", "", "Música", "Monterrey")
+    assert index.similar(1, 10)[0] == 4
+    release.set()
+
+    # Términos comunes en columnas densas: mismo ranking que con postings
+    monkeypatch.setattr(recommender, "DENSE_MIN_EVENTS", 1)
+    dense = EventIndex(load_events)
+    assert dense.similar(1, 10) == index.similar(1, 10)
+    assert dense._snapshot.dense
@@ -0,0 +1,69 @@
+import random
+import string
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+import main
+from main import app, SessionLocal, TokenFamily
+from token_revocation import RevocationList
+
+client = TestClient(app)
+
+def login():
+    email = "test_" + "".join(random.choice(string.ascii_lowercase) for _ in range(10)) + "@example.com"
+    client.post("/auth/register", json={"email": email, "password": "clave-secreta"})
+    response = client.post("/auth/login", data={"username": email, "password": "clave-secreta"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+def me(access_token: str) -> int:
+    return client.get("/auth/users/me", headers={"Authorization": f"Bearer {access_token}"}).status_code
+
+def test_refresh_rotates_and_detects_reuse(monkeypatch):
+    tokens = login()
+    assert tokens["refresh_token"]
+
+    # Sin bcrypt: rotar no pasa por el hasher
+    async def no_hashing(*args):
+        raise AssertionError("refresh no debe verificar la contraseña")
+    monkeypatch.setattr(main.password_hasher, "verify", no_hashing)
+
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200, response.text
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert me(rotated["access_token"]) == 200
+
+    # Un access token no sirve como refresh token ni al revés
+    assert client.post("/auth/refresh", json={"refresh_token": rotated["access_token"]}).status_code == 401
+    assert me(rotated["refresh_token"]) == 401
+
+    # Reusar el refresh token ya rotado revoca la sesión completa
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    assert me(rotated["access_token"]) == 401
+    assert me(tokens["access_token"]) == 401
+    assert client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+
+def test_logout_and_revocations_from_other_workers():
+    tokens = login()
+    assert client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert me(tokens["access_token"]) == 401
+
+    # Revocación hecha por otro worker: aquí solo se ve tras sincronizar con la base
+    other = login()
+    family_id = main.jwt.get_unverified_claims(other["access_token"])["fam"]
+    with SessionLocal() as db:
+        db.execute(update(TokenFamily).where(TokenFamily.id == family_id).values(revoked_at=main.datetime.utcnow()))
+        db.commit()
+    main.revoked_tokens.clear()  # Fuerza la sincronización en el próximo request
+    assert me(other["access_token"]) == 401
+    assert main.revoked_tokens.is_revoked(family_id)
+
+def test_revocation_list_expires_entries():
+    revoked = RevocationList(ttl=60, sync_interval=60)
+    revoked.revoke("a")
+    revoked.sync([("b", 10.0), ("c", 120.0)])
+    assert revoked.is_revoked("a") and revoked.is_revoked("b")
+    assert not revoked.is_revoked("c") and not revoked.is_revoked(None)
+    assert revoked.sync_due()
+    assert not revoked.sync_due()
@@ -0,0 +1,148 @@
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy.orm import Session
+from main import app, UserRole, mint_worker
+from response_cache import MemoryCacheBackend, ResponseCache
+from test_main import setup_database, get_test_db, create_user_and_get_token, create_event
+
+client = TestClient(app)
+
+def test_event_detail_conditional_requests():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+
+    first = client.get(f"/events/{event.id}")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert client.get(f"/events/{event.id}").headers["ETag"] == etag
+
+    response = client.get(f"/events/{event.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Last-Modified es informativo: con precisión de segundos no sirve para revalidar
+    response = client.get(f"/events/{event.id}", headers={"If-Modified-Since": first.headers["Last-Modified"]})
+    assert response.status_code == 200
+
+    # Editar el evento invalida la entrada
+    client.put(f"/events/{event.id}", json={"name": "Nuevo nombre"}, headers={"Authorization": f"Bearer {org_token}"})
+    response = client.get(f"/events/{event.id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["name"] == "Nuevo nombre"
+    assert response.headers["ETag"] != etag
+
+    db.close()
+
+def test_purchase_invalidates_event_listing():
+    db: Session = next(get_test_db())
+    setup_database(db)
+
+    org_token, _ = create_user_and_get_token(db, role=UserRole.ORGANIZADOR)
+    event = create_event(db, org_token)
+    buyer_token, _ = create_user_and_get_token(db, role=UserRole.COMPRADOR)
+
+    listing = client.get("/events").json()
+    assert [e["total_tickets"] for e in listing if e["id"] == event.id] == [5]
+    assert client.get(f"/events/{event.id}").json()["total_tickets"] == 5
+
+    client.post(f"/events/{event.id}/purchase?mode=async", headers={"Authorization": f"Bearer {buyer_token}"})
+    mint_worker.run_pending()
+
+    listing = client.get("/events").json()
+    assert [e["total_tickets"] for e in listing if e["id"] == event.id] == [4]
+    detail = client.get(f"/events/{event.id}").json()
+    assert detail["total_tickets"] == 4
+    assert detail["total_revenue"] == 10.0
+
+    db.close()
+
+def test_memory_backend_lru_and_ttl():
+    backend = MemoryCacheBackend(max_entries=2)
+    backend.set("a", b"1", None)
+    backend.set("b", b"2", None)
+    backend.get("a")
+    backend.set("c", b"3", None)
+    assert backend.get("b") is None  # La menos usada recientemente
+    assert backend.get("a") == b"1"
+
+    backend.set("d", b"4", 0.01)
+    time.sleep(0.02)
+    assert backend.get("d") is None
+
+def test_invalidation_changes_cache_key():
+    cache = ResponseCache(MemoryCacheBackend())
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {"n": len(calls)}, None
+
+    assert cache.get_or_build(("events",), "k", build).body == b'{"n":1}'
+    assert cache.get_or_build(("events",), "k", build).body == b'{"n":1}'
+    cache.invalidate("events")
+    assert cache.get_or_build(("events",), "k", build).body == b'{"n":2}'
+
+def test_blocking_backend_runs_off_the_event_loop():
+    import asyncio
+    import threading
+
+    class BlockingBackend(MemoryCacheBackend):
+        blocking = True
+
+        def get(self, key):
+            backend_threads.add(threading.get_ident())
+            return super().get(key)
+
+        def set(self, key, value, ttl):
+            backend_threads.add(threading.get_ident())
+            super().set(key, value, ttl)
+
+    async def build():
+        return {"ok": True}, None
+
+    backend_threads = set()
+    cache = ResponseCache(BlockingBackend())
+    entry = asyncio.run(cache.aget_or_build(("events",), "key", build))
+    assert entry.body == b'{"ok":true}'
+    # asyncio.run corre el loop en este hilo; Redis se usaría desde el threadpool
+    assert backend_threads and threading.get_ident() not in backend_threads
+
+def test_invalidation_does_not_block_and_skips_pending_tags():
+    import asyncio
+    import threading
+
+    release = threading.Event()
+
+    class SlowBackend(MemoryCacheBackend):
+        blocking = True
+
+        def incr(self, key):
+            release.wait(5)
+            return super().incr(key)
+
+    calls = []
+
+    async def build():
+        calls.append(1)
+        return {"n": len(calls)}, None
+
+    cache = ResponseCache(SlowBackend())
+    assert asyncio.run(cache.aget_or_build(("events",), "k", build)).body == b'{"n":1}'
+
+    started = time.monotonic()
+    cache.invalidate("events")
+    assert time.monotonic() - started < 1
+    # Mientras el incremento no llega al backend, no se lee ni se guarda la entrada vieja
+    assert asyncio.run(cache.aget_or_build(("events",), "k", build)).body == b'{"n":2}'
+    assert asyncio.run(cache.aget_or_build(("events",), "k", build)).body == b'{"n":3}'
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while cache._is_pending(("events",)) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert asyncio.run(cache.aget_or_build(("events",), "k", build)).body == b'{"n":4}'
+    assert asyncio.run(cache.aget_or_build(("events",), "k", build)).body == b'{"n":4}'
@@ -0,0 +1,36 @@
+import asyncio
+
+import threading
+
+from main import get_w3, get_async_w3, close_async_w3, WEB3_POOL_SIZE
+
+def test_get_w3_reuses_provider_and_session():
+    w3 = get_w3()
+    assert get_w3() is w3
+
+    session_manager = w3.provider._request_session_manager
+    session = session_manager.cache_and_return_session(w3.provider.endpoint_uri)
+    adapter = session.get_adapter(w3.provider.endpoint_uri)
+    assert adapter._pool_maxsize == WEB3_POOL_SIZE
+
+    # Todos los hilos comparten la misma sesión HTTP y su pool de conexiones
+    sessions = []
+    def request_from_thread():
+        w3.eth.block_number
+        sessions.append(session_manager.cache_and_return_session(w3.provider.endpoint_uri))
+    threads = [threading.Thread(target=request_from_thread) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(s is session for s in sessions)
+
+def test_get_async_w3():
+    async def check():
+        w3 = await get_async_w3()
+        assert await get_async_w3() is w3
+        block_number = await w3.eth.block_number
+        await close_async_w3()
+        return block_number
+
+    assert asyncio.run(check()) >= 0
@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class RevocationList:
+    """
+    Familias de tokens revocadas, en un set en memoria que se consulta en cada
+    request autenticado sin ir a la base.
+
+    Una familia solo necesita estar aquí mientras pueda quedar vivo algún
+    access token emitido con ella, así que cada entrada vence a los `ttl`
+    segundos. Las revocaciones hechas por otro worker llegan con `sync`, que
+    el llamador ejecuta cuando `sync_due` lo indica (cada `sync_interval`).
+    """
+
+    def __init__(self, ttl: float, sync_interval: float = 5.0):
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._revoked: dict[str, float] = {}
+        self._next_sync = 0.0
+
+    def revoke(self, family_id: str, revoked_at: float | None = None):
+        """`revoked_at` en tiempo monotónico; por defecto, ahora."""
+        until = (time.monotonic() if revoked_at is None else revoked_at) + self.ttl
+        with self._lock:
+            if until > self._revoked.get(family_id, 0.0):
+                self._revoked[family_id] = until
+
+    def is_revoked(self, family_id: str | None) -> bool:
+        if family_id is None:
+            return False
+        with self._lock:
+            until = self._revoked.get(family_id)
+            if until is None:
+                return False
+            if until <= time.monotonic():
+                del self._revoked[family_id]
+                return False
+            return True
+
+    def sync_due(self) -> bool:
+        # Solo un request por intervalo se encarga de sincronizar
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_sync:
+                return False
+            self._next_sync = now + self.sync_interval
+            return True
+
+    def sync(self, revoked: list[tuple[str, float]]):
+        """`revoked`: pares (familia, segundos desde la revocación) leídos de la base."""
+        now = time.monotonic()
+        for family_id, age in revoked:
+            self.revoke(family_id, now - age)
+        with self._lock:
+            self._revoked = {family_id: until for family_id, until in self._revoked.items() if until > now}
+
+    def clear(self):
+        with self._lock:
+            self._revoked.clear()
+            self._next_sync = 0.0
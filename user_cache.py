@@ -0,0 +1,64 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class CurrentUser:
+    """Datos del usuario autenticado que usan los handlers; no es un objeto de la sesión."""
+
+    def __init__(self, id: int, email: str, role, wallet_address: str | None):
+        self.id = id
+        self.email = email
+        self.role = role
+        self.wallet_address = wallet_address
+
+    @classmethod
+    def from_user(cls, user) -> "CurrentUser":
+        return cls(user.id, user.email, user.role, user.wallet_address)
+
+
+class UserCache:
+    """
+    Usuarios autenticados por id, en memoria del proceso y por `ttl` segundos.
+
+    Quien cambia el rol o la wallet de un usuario llama a `invalidate`. Con
+    varios workers la invalidación solo llega al proceso que hizo el cambio;
+    los demás ven el dato nuevo cuando vence su entrada.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, tuple[float, CurrentUser]] = OrderedDict()
+
+    def get(self, user_id: int | None) -> CurrentUser | None:
+        if user_id is None:
+            return None
+        with self._lock:
+            item = self._entries.get(user_id)
+            if item is None:
+                return None
+            expires_at, user = item
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return user
+
+    def set(self, user: CurrentUser):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[user.id] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(user.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,45 @@
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import AsyncWeb3, HTTPProvider, Web3
+from web3._utils.http_session_manager import HTTPSessionManager
+
+
+class SharedSessionManager(HTTPSessionManager):
+    # web3 cachea una sesión por hilo; aquí todos los hilos comparten el mismo pool
+    def __init__(self, session: requests.Session):
+        super().__init__()
+        self.session = session
+
+    def cache_and_return_session(self, endpoint_uri, session=None, request_timeout=None):
+        return self.session
+
+
+class PooledHTTPProvider(HTTPProvider):
+    def __init__(self, endpoint_uri: str, pool_size: int, timeout: float):
+        super().__init__(endpoint_uri, request_kwargs={"timeout": timeout})
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        self._request_session_manager = SharedSessionManager(session)
+
+
+def create_w3(rpc_url: str, pool_size: int, timeout: float) -> Web3:
+    return Web3(PooledHTTPProvider(rpc_url, pool_size, timeout))
+
+
+def create_async_w3(rpc_url: str) -> AsyncWeb3:
+    return AsyncWeb3(AsyncWeb3.AsyncHTTPProvider(rpc_url))
+
+
+def create_async_session(pool_size: int, timeout: float) -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=pool_size),
+        timeout=aiohttp.ClientTimeout(total=timeout),
+        raise_for_status=True
+    )
+
+
+def account_address(private_key: str) -> str:
+    return Web3().eth.account.from_key(private_key).address